@@ -0,0 +1,29 @@
+# Multi-worker serving: gunicorn -c gunicorn.conf.py main:app (from the backend directory)
+#
+# The master loads the embedding model (and the reranker) once and forks the workers, which share the
+# weights copy-on-write. Each worker opens its own Chroma client after the fork and only reads; index writes
+# go through a single ingestion owner (ingest.py or the ingestion job) holding the collection's write lock,
+# and the workers reload the index when the owner publishes its flush (INDEX_REFRESH_SECONDS).
+import os
+import multiprocessing
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", max(2, multiprocessing.cpu_count() // 2)))
+worker_class = "uvicorn_worker.UvicornWorker"
+# Importing main (and preloading the models) in the master, before the fork
+preload_app = os.getenv("PRELOAD_MODELS", "1") == "1"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+def on_starting(server):
+    if preload_app:
+        from src.services import serving
+        serving.preload()
+
+def post_fork(server, worker):
+    from src.services import serving
+    serving.after_fork(server.cfg.workers)
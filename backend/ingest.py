@@ -0,0 +1,57 @@
+import argparse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from src.services.tenants import tenant_collection
+from src.services.vector_store import VectorDB
+from src.services.ingestion_pipeline import IngestionPipeline
+from src.services.ingestion_manifest import IngestionManifest
+
+def main():
+    parser = argparse.ArgumentParser(description="Support Brain - ingest a directory of PDF manuals")
+    parser.add_argument("directory", help="Directory containing the PDF manuals (searched recursively)")
+    parser.add_argument("--collection", default="technical_manuals", help="ChromaDB collection name")
+    parser.add_argument("--tenant", help="Tenant whose collection is used instead of --collection")
+    parser.add_argument("--workers", type=int, default=None, help="Extraction processes (default: CPU count - 1)")
+    parser.add_argument("--chunker", choices=["structured", "window"], default="structured",
+                        help="Structure-aware chunks sized in tokens, or the character sliding window")
+    parser.add_argument("--chunk-tokens", type=int, default=160, help="Max tokens per chunk (structured)")
+    parser.add_argument("--overlap-tokens", type=int, default=32, help="Tokens of overlap between chunks (structured)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Max characters per chunk (window)")
+    parser.add_argument("--overlap", type=int, default=200, help="Characters of overlap between chunks (window)")
+    parser.add_argument("--pages-per-task", type=int, default=25, help="Pages per extraction task")
+    parser.add_argument("--queue-size", type=int, default=1000, help="Max extracted pages waiting to be embedded")
+    parser.add_argument("--embed-batch-size", type=int, default=256, help="Chunks per embedding/upsert batch")
+    parser.add_argument("--full", action="store_true", help="Ignore the manifest and re-embed every file")
+    parser.add_argument("--no-prune", action="store_true", help="Keep chunks of files removed from the directory")
+    args = parser.parse_args()
+    collection = tenant_collection(args.tenant) if args.tenant else args.collection
+
+    vector_db = VectorDB(collection_name=collection, max_batch_size=1)
+    manifest = IngestionManifest.for_collection(vector_db.data_dir, collection)
+    pipeline = IngestionPipeline(
+        vector_db,
+        chunk_size=args.chunk_size,
+        overlap=args.overlap,
+        strategy=args.chunker,
+        chunk_tokens=args.chunk_tokens,
+        overlap_tokens=args.overlap_tokens,
+        workers=args.workers,
+        pages_per_task=args.pages_per_task,
+        queue_size=args.queue_size,
+        embed_batch_size=args.embed_batch_size,
+        manifest=manifest
+    )
+
+    try:
+        stats = pipeline.run(args.directory, prune=not args.no_prune, full=args.full)
+    finally:
+        vector_db.close()
+
+    print(f"Files: {stats['files']} ({stats['skipped_files']} unchanged) | Pages: {stats['pages']} | Failed tasks: {stats['failed_tasks']}")
+    print(f"Chunks embedded: {stats['chunks']} | Unchanged: {stats['unchanged_chunks']} | Deleted: {stats['deleted_chunks']}")
+    print(f"Elapsed: {stats['elapsed']:.1f}s | {stats['pages_per_sec']:.1f} pages/s | {stats['chunks_per_sec']:.1f} chunks/s")
+
+if __name__ == "__main__":
+    main()
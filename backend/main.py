@@ -1,31 +1,85 @@
+import os
 import time
+import json
+import asyncio
+from typing import List, Optional
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from src.models.schemas import ChatRequest, ChatResponse
-from src.services.chat_service import ChatService
+from src.models.schemas import ChatRequest, ChatResponse, BatchChatRequest, IngestDirectoryRequest, IngestJob
+from src.services.ingestion_jobs import IngestionJobManager, JobQueueFull, LoadGovernor
+from src.services.startup import Readiness, build_chat_service
+from src.services.tenants import TenantNotFound, TenantBusy, check_tenant
+from src.services import metrics
 
 # Global variable for service
 chat_service = None
+ingestion_jobs = None
+readiness = Readiness()
+
+# Chat requests in flight pause background ingestion, which is also capped to a share of the CPU
+load_governor = LoadGovernor(
+    cpu_share=float(os.getenv("INGEST_CPU_SHARE", "0.5")),
+    pause_threshold=int(os.getenv("INGEST_PAUSE_CHAT_REQUESTS", "4")),
+    max_pause=float(os.getenv("INGEST_MAX_PAUSE_SECONDS", "10"))
+)
+
+def _initialize():
+    """Loads the services (independent components concurrently) and publishes them once everything is ready."""
+    global chat_service, ingestion_jobs
+
+    service = build_chat_service(readiness)
+    vector_db = service.vector_db
+    ingestion_jobs = readiness.run("ingestion", lambda: IngestionJobManager(
+        vector_db,
+        os.path.join(vector_db.data_dir, "ingest_jobs"),
+        max_workers=int(os.getenv("INGEST_JOBS", "1")),
+        max_queued=int(os.getenv("INGEST_MAX_QUEUED", "8")),
+        allowed_dirs=[d for d in os.getenv("INGEST_ALLOWED_DIRS", "").split(",") if d.strip()],
+        max_upload_bytes=int(os.getenv("INGEST_MAX_UPLOAD_MB", "100")) * 1024 * 1024,
+        governor=load_governor,
+        tenants=service.tenants,
+        max_tenant_jobs=int(os.getenv("TENANT_MAX_INGEST_JOBS", "4")),
+        pipeline_options={
+            "workers": int(os.getenv("INGEST_WORKERS", "1")),
+            "embed_batch_size": int(os.getenv("INGEST_EMBED_BATCH_SIZE", "64")),
+            "strategy": os.getenv("CHUNK_STRATEGY", "structured"),
+            "chunk_tokens": int(os.getenv("CHUNK_TOKENS", "160")),
+            "overlap_tokens": int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+        }
+    ))
+    chat_service = service
+    readiness.done = True
+
+def _report_startup(future: asyncio.Future):
+    if future.exception():
+        print(f"Fatal error while loading the AI: {future.exception()}")
+    else:
+        print(f"AI system loaded and ready! ({time.time() - readiness.started_at:.1f}s)")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global chat_service
-    
     print("Support Brain AI Starting...")
-    try:
-        chat_service = ChatService()
-        print("AI system loaded and ready!")
-    except Exception as e:
-        print(f"Fatal error while loading the AI: {e}")
+    # STARTUP_MODE=background (default): the server accepts connections right away and /ready turns 200
+    # once the AI is loaded. STARTUP_MODE=blocking waits for it, and a loading error stops the server.
+    startup = asyncio.get_running_loop().run_in_executor(None, _initialize)
+    startup.add_done_callback(_report_startup)
+    if os.getenv("STARTUP_MODE", "background") == "blocking":
+        await startup
 
     yield
 
     print("Shutting Down Support Brain API...")
+    await asyncio.wait([startup])
+    if ingestion_jobs:
+        ingestion_jobs.close()
+    if chat_service:
+        chat_service.close()
 
 # App setup
 app = FastAPI(
@@ -44,6 +98,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def _search_options(request) -> dict:
+    """Per-request retrieval options forwarded to ChatService (search mode, metadata filters, reranking, MMR)."""
+    options = {"mode": request.retrieval_mode, "filters": request.filters, "rerank": request.rerank,
+               "mmr_lambda": request.mmr_lambda}
+    return {k: v for k, v in options.items() if v is not None}
+
+def _tenant_error(e: Exception) -> HTTPException:
+    """Unknown tenant: 404; tenant at its quota of queries in flight: 429."""
+    if isinstance(e, TenantBusy):
+        return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    return HTTPException(status_code=404, detail=str(e))
+
 # Chat/Main Endpoint
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat_endpont(request: ChatRequest):
@@ -51,23 +117,196 @@ async def chat_endpont(request: ChatRequest):
         raise HTTPException(status_code=503, detail="AI Service not initalized")
 
     try:
-        response_data = chat_service.ask(request.query, request.top_k)
+        with load_governor.chat_request():
+            response_data = await chat_service.aask(request.query, request.top_k, request.session_id, request.tenant,
+                                                    **_search_options(request))
 
         return ChatResponse(
             answer=response_data["answer"],
             sources=response_data["sources"],
-            processing_time=response_data["processing_time"]
+            processing_time=response_data["processing_time"],
+            cached=response_data.get("cached"),
+            timings=response_data["timings"] if request.include_timings else None,
+            session_id=response_data.get("session_id"),
+            rewritten_query=response_data.get("rewritten_query"),
+            fallback=response_data.get("fallback", False)
         )
 
+    except (TenantNotFound, TenantBusy) as e:
+        raise _tenant_error(e)
+    except ValueError as e:
+        # Invalid retrieval options (unknown mode or filter field), session ID or tenant
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error while processing: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-# Health Check Endpoint
+def _sse(event: str, data) -> str:
+    """Formats one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# Streaming Chat Endpoint (Server-Sent Events)
+@app.post("/api/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    if not chat_service:
+        raise HTTPException(status_code=503, detail="AI Service not initalized")
+
+    events = chat_service.astream(request.query, request.top_k, request.session_id, request.tenant, **_search_options(request))
+    try:
+        # Pulling the first event (after retrieval) here, so tenant errors and invalid requests still get
+        # their status code, like /api/chat
+        with load_governor.chat_request():
+            first = await events.__anext__()
+    except (TenantNotFound, TenantBusy) as e:
+        raise _tenant_error(e)
+    except ValueError as e:
+        # Invalid retrieval options (unknown mode or filter field), session ID or tenant
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error while streaming: {e}")
+        first = ("error", {"detail": str(e)})
+
+    async def event_stream():
+        yield _sse(*first)
+        if first[0] == "error":
+            return
+        try:
+            with load_governor.chat_request():
+                async for event, data in events:
+                    yield _sse(event, data)
+        except Exception as e:
+            print(f"Error while streaming: {e}")
+            yield _sse("error", {"detail": str(e)})
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Batch Chat Endpoint (offline evaluation, bulk triage): one NDJSON line per query, in completion order,
+# then a summary line. Failed queries are reported on their line ("status": "error") and don't stop the batch.
+@app.post("/api/chat/batch")
+async def chat_batch_endpoint(request: BatchChatRequest):
+    if not chat_service:
+        raise HTTPException(status_code=503, detail="AI Service not initalized")
+    max_queries = int(os.getenv("BATCH_MAX_QUERIES", "5000"))
+    if not request.queries or len(request.queries) > max_queries:
+        raise HTTPException(status_code=400, detail=f"A batch must have between 1 and {max_queries} queries")
+    if request.concurrency is not None and request.concurrency < 1:
+        raise HTTPException(status_code=400, detail="concurrency must be at least 1")
+
+    start_time = time.perf_counter()
+    results = chat_service.aask_many(request.queries, request.top_k, request.concurrency, request.tenant, **_search_options(request))
+    try:
+        # Pulling the first result here, so invalid options still get a 400 instead of a broken stream
+        first = await results.__anext__()
+    except (TenantNotFound, TenantBusy) as e:
+        raise _tenant_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def ndjson_stream():
+        counts = {"ok": 0, "error": 0}
+        try:
+            try:
+                result = first
+                while True:
+                    counts[result["status"]] += 1
+                    yield json.dumps(result, ensure_ascii=False) + "\n"
+                    try:
+                        result = await results.__anext__()
+                    except StopAsyncIteration:
+                        break
+            except Exception as e:
+                print(f"Error while answering the batch: {e}")
+                yield json.dumps({"error": str(e)}, ensure_ascii=False) + "\n"
+            yield json.dumps({
+                "done": True,
+                "total": len(request.queries),
+                "succeeded": counts["ok"],
+                "failed": len(request.queries) - counts["ok"],
+                "processing_time": time.perf_counter() - start_time
+            }) + "\n"
+        finally:
+            # Also when the client disconnects: cancels the LLM calls still in flight
+            await results.aclose()
+
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+# Chat Session Endpoint: forgets the conversation history of a session (of the tenant given as ?tenant=)
+@app.delete("/api/chat/sessions/{session_id}")
+def chat_session_delete_endpoint(session_id: str, tenant: Optional[str] = None):
+    if not chat_service or not chat_service.conversations:
+        raise HTTPException(status_code=503, detail="Conversation Service not initialized")
+    try:
+        if tenant is not None:
+            check_tenant(tenant)
+        deleted = chat_service.conversations.delete(session_id, namespace=tenant)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    return {"session_id": session_id, "deleted": True}
+
+# Runtime Statistics Endpoint
+@app.get("/api/stats")
+async def stats_endpoint():
+    if not chat_service:
+        raise HTTPException(status_code=503, detail="AI Service not initalized")
+    stats = chat_service.stats()
+    if ingestion_jobs:
+        stats["ingestion"] = ingestion_jobs.stats()
+    return stats
+
+def _submit_ingestion(submit) -> dict:
+    """Queues an ingestion job with `submit(manager)`, mapping a full queue to 429 and invalid input to 400."""
+    if not ingestion_jobs:
+        raise HTTPException(status_code=503, detail="Ingestion Service not initialized")
+    try:
+        return submit(ingestion_jobs)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Ingestion Endpoints (background jobs, progress at /api/ingest/{job_id})
+# Sync handlers: FastAPI runs them on its thread pool, so writing the uploads doesn't block the event loop
+@app.post("/api/ingest", response_model=IngestJob, status_code=202)
+def ingest_upload_endpoint(files: List[UploadFile] = File(...), tenant: Optional[str] = Form(None)):
+    return _submit_ingestion(lambda jobs: jobs.submit_upload([(f.filename, f.file) for f in files], tenant))
+
+@app.post("/api/ingest/directory", response_model=IngestJob, status_code=202)
+def ingest_directory_endpoint(request: IngestDirectoryRequest):
+    return _submit_ingestion(lambda jobs: jobs.submit_directory(request.path, request.prune, request.tenant))
+
+@app.get("/api/ingest/{job_id}", response_model=IngestJob)
+async def ingest_job_endpoint(job_id: str):
+    job = ingestion_jobs.get(job_id) if ingestion_jobs else None
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job
+
+# Prometheus Metrics Endpoint (per-stage latency histograms)
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Health Check Endpoint (liveness: fails only when loading failed, which needs a restart)
 @app.get("/health")
 async def health_check():
+    if readiness.failed:
+        return JSONResponse({"status": "failed", "service": "Support Brain API"}, status_code=503)
     return {"status": "ok", "service": "Support Brain API"}
 
+# Readiness Endpoint (per-component loading status and load times, 503 until every component is ready)
+@app.get("/ready")
+async def ready_check():
+    report = readiness.report()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
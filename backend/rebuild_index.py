@@ -0,0 +1,39 @@
+import argparse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from src.services.tenants import tenant_collection
+from src.services.vector_store import VectorDB, VECTOR_STORES, SPACES
+
+def main():
+    parser = argparse.ArgumentParser(description="Support Brain - rebuild a collection with new vector store or index settings")
+    parser.add_argument("--collection", default="technical_manuals", help="ChromaDB collection name")
+    parser.add_argument("--tenant", help="Tenant whose collection is used instead of --collection")
+    parser.add_argument("--vector-store", choices=VECTOR_STORES, help="Vector store (default: VECTOR_STORE)")
+    parser.add_argument("--compact-dtype", choices=["int8", "float16"], help="Codes of the compact store (default: COMPACT_DTYPE)")
+    parser.add_argument("--space", choices=SPACES, help="Distance space (default: VECTOR_SPACE)")
+    parser.add_argument("--m", type=int, help="HNSW graph degree (default: HNSW_M)")
+    parser.add_argument("--ef-construction", type=int, help="HNSW build beam width (default: HNSW_EF_CONSTRUCTION)")
+    parser.add_argument("--ef-search", type=int, help="HNSW search beam width (default: HNSW_EF_SEARCH)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Records copied per batch")
+    args = parser.parse_args()
+    collection = tenant_collection(args.tenant) if args.tenant else args.collection
+
+    index_config = {
+        key: value for key, value in
+        (("space", args.space), ("M", args.m), ("ef_construction", args.ef_construction), ("ef_search", args.ef_search))
+        if value is not None
+    }
+    vector_db = VectorDB(collection_name=collection, max_batch_size=1)
+    print(f"Before: {vector_db.count()} chunks | {vector_db.index_info()}")
+    try:
+        stats = vector_db.rebuild_index(args.vector_store, index_config, args.compact_dtype, batch_size=args.batch_size)
+    finally:
+        vector_db.close()
+
+    print(f"After:  {stats['chunks']} chunks in {stats['collections']} collection(s) | {stats['index']}")
+    print(f"Elapsed: {stats['seconds']:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Literal, Union
 
 # Source/Citation
 class SourceModel(BaseModel):
@@ -11,9 +11,51 @@ class SourceModel(BaseModel):
 class ChatRequest(BaseModel):
     query: str
     top_k: int = 3
+    retrieval_mode: Optional[Literal["dense", "lexical", "hybrid"]] = None    # Server default when omitted
+    filters: Optional[Dict[str, Union[str, int, List[Union[str, int]]]]] = None    # e.g. {"product": "X-1000", "page": [1, 2]}
+    rerank: Optional[bool] = None    # Cross-encoder reranking on/off (on whenever the reranker is loaded, if omitted)
+    mmr_lambda: Optional[float] = None    # MMR diversification, 0 (diversity) to 1 (relevance only); server default if omitted
+    include_timings: bool = False    # Adds per-stage latencies to the response
+    session_id: Optional[str] = None    # Chat session chosen by the client (1-128 of [A-Za-z0-9_-]); follow-ups are answered in its context
+    tenant: Optional[str] = None    # Tenant whose manuals are searched (1-32 of [a-z0-9-]); the default collection if omitted
 
 # System Response
 class ChatResponse(BaseModel):
     answer: str
     sources: List[SourceModel]
     processing_time: float    # Measuring latence
+    cached: Optional[str] = None    # "exact" or "semantic" when served from the query cache
+    timings: Optional[Dict[str, float]] = None    # Seconds per stage (embed, vector_query, llm_total...), on request
+    session_id: Optional[str] = None
+    rewritten_query: Optional[str] = None    # Standalone query searched for a follow-up, when it differs from the query
+    fallback: bool = False    # The LLM was unavailable: the answer comes from the local fallback (LLM_FALLBACK)
+
+# Batch of queries answered by /api/chat/batch (results streamed back as NDJSON)
+class BatchChatRequest(BaseModel):
+    queries: List[str]
+    top_k: int = 3
+    retrieval_mode: Optional[Literal["dense", "lexical", "hybrid"]] = None
+    filters: Optional[Dict[str, Union[str, int, List[Union[str, int]]]]] = None    # Applied to every query
+    rerank: Optional[bool] = None
+    mmr_lambda: Optional[float] = None
+    concurrency: Optional[int] = None    # LLM calls in flight for this batch (BATCH_LLM_CONCURRENCY if omitted)
+    tenant: Optional[str] = None
+
+# Ingestion of a server directory (must be under INGEST_ALLOWED_DIRS)
+class IngestDirectoryRequest(BaseModel):
+    path: str
+    prune: bool = False    # Also delete chunks of files previously ingested from this directory and now gone
+    tenant: Optional[str] = None    # Destination tenant (its collection is created on first ingestion); the default collection if omitted
+
+# Background Ingestion Job
+class IngestJob(BaseModel):
+    id: str
+    tenant: Optional[str] = None
+    kind: Literal["upload", "directory"]
+    status: Literal["queued", "running", "completed", "failed", "interrupted"]
+    files: List[str]    # Uploaded file names (empty for directory jobs)
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    progress: Dict[str, Any] = {}    # Pipeline statistics: files, pages, chunks (embedded), deleted_chunks...
+    error: Optional[str] = None
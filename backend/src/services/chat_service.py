@@ -1,44 +1,161 @@
-import google.generativeai as genai
 import os
+import json
 import time
+import asyncio
 import logging
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, AsyncIterator, Tuple, Any, Set
 from .vector_store import VectorDB
+from .query_cache import QueryCache
+from .reranker import CrossEncoderReranker, DEFAULT_RERANK_MODEL
+from .context_assembler import ContextAssembler
+from .conversation_store import ConversationStore
+from .llm_gateway import LLMGateway, create_llm_model, create_llm_gateway
+from .tenants import TenantIndex, TenantRegistry, TenantNotFound
+from . import metrics, serving
 
 logger = logging.getLogger("ChatService")
 logger.setLevel(logging.INFO)
 
+NO_CONTEXT_ANSWER = "I could not find relevant information within the given manuals to answer your question."
+LLM_ERROR_ANSWER = "Sorry, there was an error processing your response with the AI"
+
+def create_reranker() -> Optional[CrossEncoderReranker]:
+    """The cross-encoder reranker configured by RERANK_* (None unless RERANK_ENABLED=1)."""
+    if os.getenv("RERANK_ENABLED", "0") != "1":
+        return None
+    logger.info("Loading cross-encoder reranker...")
+    return CrossEncoderReranker(
+        model_name=os.getenv("RERANK_MODEL", DEFAULT_RERANK_MODEL),
+        batch_size=int(os.getenv("RERANK_BATCH_SIZE", "16")),
+        budget_ms=float(os.getenv("RERANK_BUDGET_MS", "200")),
+        model=serving.shared("rerank_model")
+    )
+
 class ChatService:
-    def __init__(self):
+    def __init__(self, vector_db: Optional[VectorDB] = None, model=None, reranker: Optional[CrossEncoderReranker] = None,
+                 llm: Optional[LLMGateway] = None):
+        """
+            Args:
+                vector_db (VectorDB): Optional pre-built VectorDB (a new one is created when omitted)
+                model: Optional generative model exposing generate_content/generate_content_async (LLM_BACKEND when omitted)
+                reranker (CrossEncoderReranker): Optional pre-built reranker (created when RERANK_ENABLED=1)
+                llm (LLMGateway): Optional pre-built gateway around the model (configured by LLM_* when omitted)
+        """
         # Initializing VectorDB once
         logger.info("Initializing VectorDB for Chat Service...")
-        self.vector_db = VectorDB(verbose=False)
+        # Under gunicorn the models come preloaded from the master (see serving.preload)
+        self.vector_db = vector_db or VectorDB(verbose=False, encoder=serving.shared("encoder"))
+
+        # Configuring Gemini, called through the gateway: concurrency cap (so bursts don't pile up on the Gemini quota),
+        # deadlines, retries, hedging, circuit breaker and a local fallback answer
+        if llm is None:
+            llm = create_llm_gateway(model if model is not None else create_llm_model())
+        self.llm = llm
+        self.model = llm.model
+
+        # Async pipeline limits: retrieval (embedding + Chroma) runs on a bounded thread pool
+        self.retrieval_pool = ThreadPoolExecutor(
+            max_workers=int(os.getenv("RETRIEVAL_WORKERS", "4")),
+            thread_name_prefix="retrieval"
+        )
+
+        # Batch answering (ask_many): queries retrieved per chunk, LLM calls bounded
+        self.batch_size = int(os.getenv("BATCH_RETRIEVAL_SIZE", "64"))
+        self.batch_concurrency = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+        self.batch_stats = {"queries": 0, "failed": 0}
+
+        # Exact + semantic answer cache, invalidated whenever the collection version changes
+        self.cache = self._new_cache()
+
+        # Tenant-scoped collections (requests without a tenant use the default one), opened on demand in a bounded
+        # LRU, each with its own answer cache and a quota of queries in flight
+        self.tenants = TenantRegistry(
+            self.vector_db,
+            default_cache=self.cache,
+            cache_factory=self._new_cache,
+            max_open=int(os.getenv("TENANT_MAX_OPEN", "32")),
+            max_queries=int(os.getenv("TENANT_MAX_QUERIES", "16")),
+            unload_after=int(os.getenv("TENANT_UNLOAD_AFTER")) if os.getenv("TENANT_UNLOAD_AFTER") else None
+        )
+
+        # Cross-encoder reranking of over-fetched candidates, so fewer and better chunks reach the prompt
+        self.reranker = reranker if reranker is not None else create_reranker()
+        self.rerank_candidates = int(os.getenv("RERANK_CANDIDATES", "30"))
+
+        # Merges overlapping chunks, drops near-duplicates and caps the prompt context size
+        self.assembler = ContextAssembler(
+            token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000")),
+            dedup_threshold=float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+        )
+
+        # Server-side chat sessions: follow-ups are rewritten from the history, which is added (compressed) to the prompt
+        self.conversations = None
+        if os.getenv("CONVERSATION_ENABLED", "1") == "1":
+            persist = os.getenv("CONVERSATION_PERSIST", "0") == "1"
+            self.conversations = ConversationStore(
+                max_sessions=int(os.getenv("CONVERSATION_MAX_SESSIONS", "10000")),
+                ttl_seconds=float(os.getenv("CONVERSATION_TTL_SECONDS", "86400")),
+                directory=os.path.join(self.vector_db.data_dir, "conversations") if persist else None,
+                recent_turns=int(os.getenv("CONVERSATION_RECENT_TURNS", "3")),
+                summary_tokens=int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "300")),
+                answer_tokens=int(os.getenv("CONVERSATION_ANSWER_TOKENS", "150")),
+                reuse_threshold=float(os.getenv("CONVERSATION_REUSE_THRESHOLD", "0.95"))
+            )
 
-        # Configuring Gemini
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY not found! Check .env file.")
-        genai.configure(api_key=api_key)
+    @staticmethod
+    def _new_cache() -> Optional[QueryCache]:
+        """An answer cache configured by CACHE_* (None when CACHE_ENABLED=0)."""
+        if os.getenv("CACHE_ENABLED", "1") != "1":
+            return None
+        return QueryCache(
+            max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "1024")),
+            ttl_seconds=float(os.getenv("CACHE_TTL_SECONDS", "3600")),
+            semantic_threshold=float(os.getenv("CACHE_SEMANTIC_THRESHOLD", "0.92"))
+        )
 
-        # Using Gemini Flash 2.5
-        # IMPORTANT: RUN "python notebooks/check_models.py" IF YOU'RE UNSURE WHICH MODELS ARE AVAILABLE FOR YOUR API KEY
-        self.model = genai.GenerativeModel('models/gemini-2.5-flash')
+    def close(self):
+        """Releases the retrieval thread pool, the LLM clients, the open tenants and the VectorDB helpers."""
+        self.retrieval_pool.shutdown(wait=False, cancel_futures=True)
+        self.llm.close()
+        self.tenants.close()
+        if hasattr(self.vector_db, "close"):
+            self.vector_db.close()
 
-    def _build_prompt(self, query: str, context_chunks: List[Dict]) -> str:
+    def stats(self) -> Dict:
+        """Runtime statistics for the /api/stats endpoint."""
+        return {
+            "retrieval": self.vector_db.stats() if hasattr(self.vector_db, "stats") else {},
+            "query_cache": self.cache.stats() if self.cache else None,
+            "reranker": self.reranker.stats() if self.reranker else None,
+            "context": self.assembler.stats(),
+            "conversations": self.conversations.stats() if self.conversations else None,
+            "tenants": self.tenants.stats(),
+            "llm": self.llm.stats(),
+            "batch": dict(self.batch_stats)
+        }
+
+    def _build_prompt(self, query: str, context_chunks: List[Dict], history: Optional[str] = None) -> str:
         """
             Promprt Engineering: building a rich context for Gemini.
+            `context_chunks` are the blocks produced by the ContextAssembler (or raw search results).
+            `history` is the conversation so far (see ConversationStore.history), for follow-up questions.
         """
         context_text = "\n\n".join([
-            f"[SOURCE: {c['metadata']['source']} - Page {c['metadata']['page']}]\n{c['content']}"
+            f"[SOURCE: {c['metadata']['source']} - {self._pages(c['metadata'])}]\n{c['content']}"
             for c in context_chunks
         ])
+        conversation = f"""
+            CONVERSATION SO FAR (the query may refer to it):
+            {history}
+""" if history else ""
 
         system_prompt = f"""
             You are the 'Support Brain', a senior technical assistant. Your goal is to answer technical questions STRICTLY based on the context given below.
 
             TECHNICAL CONTEXT (MANUALS):
             {context_text}
-
+{conversation}
             USER'S QUERY:
             {query}
 
@@ -51,43 +168,463 @@ class ChatService:
         """
         return system_prompt
 
-    def ask(self, query: str, top_k: int = 3) -> Dict:
-        start_time = time.time()
+    @staticmethod
+    def _pages(metadata: Dict) -> str:
+        """Page citation of a chunk; structured chunks can continue onto the next page ("page_end")."""
+        page_end = metadata.get("page_end")
+        if page_end and page_end != metadata["page"]:
+            return f"Pages {metadata['page']}-{page_end}"
+        return f"Page {metadata['page']}"
+
+    def _format_sources(self, results: List[Dict]) -> List[Dict]:
+        """Converts context blocks (or search results) into the SourceModel shape."""
+        return [
+            {
+                "source": r["metadata"]["source"],
+                "page": r["metadata"]["page"],
+                "content": r["content"]
+            }
+            for r in results
+        ]
+
+    def _search(self, index: TenantIndex, query: str, top_k: int, search_options: Dict,
+                query_vector: Optional[List[float]] = None) -> List[Dict]:
+        """
+            VectorDB search, followed by reranking when a reranker is loaded and the request didn't set rerank=False:
+            `rerank_candidates` results are fetched and the cross-encoder keeps the best top_k.
+        """
+        options = dict(search_options)
+        rerank = options.pop("rerank", None)
+        if self.reranker is None or rerank is False:
+            return index.vector_db.search(query, top_k, query_vector=query_vector, **options)
+
+        candidates = index.vector_db.search(query, max(top_k, self.rerank_candidates), query_vector=query_vector, **options)
+        with metrics.stage("rerank"):
+            return self.reranker.rerank(query, candidates, top_k)
+
+    def _search_many(self, index: TenantIndex, queries: List[str], top_k: int, search_options: Dict,
+                     query_vectors: Optional[List[List[float]]] = None) -> List[List[Dict]]:
+        """Batch version of _search(): one VectorDB.search_many call, then reranking query by query."""
+        options = dict(search_options)
+        rerank = options.pop("rerank", None)
+        if self.reranker is None or rerank is False:
+            return index.vector_db.search_many(queries, top_k, query_vectors=query_vectors, **options)
+
+        candidates = index.vector_db.search_many(queries, max(top_k, self.rerank_candidates), query_vectors=query_vectors, **options)
+        with metrics.stage("rerank"):
+            return [self.reranker.rerank(query, results, top_k) for query, results in zip(queries, candidates)]
+
+    def _retrieve(self, index: TenantIndex, query: str, top_k: int, search_options: Dict) -> Dict:
+        """
+            Blocking retrieval step shared by every ask variant: cache lookups, then semantic search, both in the
+            tenant's `index`. `search_options` (e.g. mode, rerank) are applied by _search() and are part of the cache scope.
+            Returns {"cached": answer dict or None, "results": [...], "cache_key": ..., "vector": ..., "index": index}.
+        """
+        cache = index.cache
+        if not cache:
+            results = self._search(index, query, top_k, search_options)
+            return {"cached": None, "results": results, "cache_key": None, "vector": None, "index": index}
+
+        # Dropping cached answers if the collection changed since they were stored
+        cache.sync_version(getattr(index.vector_db, "version", 0))
+        scope = (top_k, json.dumps(search_options, sort_keys=True))
+        cache_key = cache.make_key(query, scope)
+
+        with metrics.stage("cache_lookup"):
+            cached = cache.get(cache_key)
+        if cached:
+            logger.info(f"Exact cache hit for: {query}")
+            return {"cached": {**cached, "cached": "exact"}, "results": [], "cache_key": cache_key, "vector": None, "index": index}
+
+        query_vector = index.vector_db.embed_query(query)
+        with metrics.stage("cache_lookup"):
+            cached = cache.get_semantic(query_vector, scope)
+        if cached:
+            logger.info(f"Semantic cache hit for: {query}")
+            return {"cached": {**cached, "cached": "semantic"}, "results": [], "cache_key": cache_key, "vector": query_vector,
+                    "index": index}
 
-        # Semantic search (Retrieval)
         logger.info(f"Searching context for: {query}")
-        results = self.vector_db.search(query, top_k)
+        results = self._search(index, query, top_k, search_options, query_vector=query_vector)
+        return {"cached": None, "results": results, "cache_key": cache_key, "vector": query_vector, "index": index}
 
-        if not results:
-            return {
-                "answer": "I could not find relevant information within the given manuals to answer your question.",
-                "sources": [],
-                "processing_time": time.time() - start_time
-            }
+    def _retrieve_many(self, tenant: Optional[str], queries: List[str], top_k: int, search_options: Dict) -> List[Dict]:
+        """
+            Batch version of _retrieve() in the index of `tenant`, with the same result per query: exact cache lookups,
+            then the misses are embedded in one batch for the semantic lookups and searched with one search_many().
+        """
+        with self.tenants.use(tenant) as index:
+            retrievals: List[Optional[Dict]] = [None] * len(queries)
+            cache_keys: List[Any] = [None] * len(queries)
+            pending = list(range(len(queries)))
+
+            cache, vector_db = index.cache, index.vector_db
+            if cache:
+                cache.sync_version(getattr(vector_db, "version", 0))
+                scope = (top_k, json.dumps(search_options, sort_keys=True))
+                pending = []
+                with metrics.stage("cache_lookup"):
+                    for i, query in enumerate(queries):
+                        cache_keys[i] = cache.make_key(query, scope)
+                        cached = cache.get(cache_keys[i])
+                        if cached:
+                            retrievals[i] = {"cached": {**cached, "cached": "exact"}, "results": [], "cache_key": cache_keys[i],
+                                             "vector": None, "index": index}
+                        else:
+                            pending.append(i)
+
+            # Lexical search doesn't need the embeddings, unless the semantic cache tier does
+            needs_vectors = cache is not None or search_options.get("mode", getattr(vector_db, "retrieval_mode", None)) != "lexical"
+            vectors = vector_db.embed_queries([queries[i] for i in pending]) if pending and needs_vectors else None
+
+            if cache and vectors is not None:
+                misses = []
+                with metrics.stage("cache_lookup"):
+                    for i, vector in zip(pending, vectors):
+                        cached = cache.get_semantic(vector, scope)
+                        if cached:
+                            retrievals[i] = {"cached": {**cached, "cached": "semantic"}, "results": [], "cache_key": cache_keys[i],
+                                             "vector": vector, "index": index}
+                        else:
+                            misses.append((i, vector))
+                pending = [i for i, _ in misses]
+                vectors = [vector for _, vector in misses]
+
+            logger.info(f"Searching context for {len(pending)} of {len(queries)} queries")
+            if pending:
+                results = self._search_many(index, [queries[i] for i in pending], top_k, search_options, query_vectors=vectors)
+                for row, i in enumerate(pending):
+                    vector = vectors[row] if vectors is not None else None
+                    retrievals[i] = {"cached": None, "results": results[row], "cache_key": cache_keys[i], "vector": vector, "index": index}
+            return retrievals
+
+    def _retrieve_turn(self, tenant: Optional[str], query: str, top_k: int, search_options: Dict, session_id: Optional[str]) -> Dict:
+        """
+            Retrieval step of a chat turn, in the index of `tenant` (kept open during the search): _retrieve() for
+            a query outside a session, or the first turn of one.
+            A follow-up is searched with a standalone rewrite from the session's history and skips the answer cache
+            (its answer depends on the history); when it stays on the previous turn's topic, the chunks retrieved for
+            that turn are reused instead of searching again.
+            Adds "standalone", "session" (its state, None outside a session), "scope" and "version" to the retrieval.
+            Sessions are namespaced by tenant, so the same session ID in two tenants names two conversations.
+        """
+        with self.tenants.use(tenant) as index:
+            session = None
+            if self.conversations and session_id is not None:
+                session = self.conversations.get(session_id, namespace=index.tenant)
+            scope = (top_k, json.dumps(search_options, sort_keys=True))
+            turn = {"standalone": query, "session": session, "scope": scope, "version": getattr(index.vector_db, "version", 0)}
+            if session is None or not session["turns"]:
+                return {**self._retrieve(index, query, top_k, search_options), **turn}
+
+            standalone = self.conversations.rewrite(query, session)
+            turn["standalone"] = standalone
+            vector = None
+            results = self.conversations.reusable(query, session, scope, turn["version"])
+            if results is None and search_options.get("mode", getattr(index.vector_db, "retrieval_mode", None)) != "lexical":
+                vector = index.vector_db.embed_query(standalone)
+                results = self.conversations.reusable(query, session, scope, turn["version"], vector)
+
+            if results is None:
+                logger.info(f"Searching context for: {standalone}")
+                results = self._search(index, standalone, top_k, search_options, query_vector=vector)
+            else:
+                logger.info(f"Reusing the previous turn's context for: {query}")
+            return {"cached": None, "results": results, "cache_key": None, "vector": vector, "index": index, **turn}
+
+    def _history(self, retrieval: Dict) -> Optional[str]:
+        session = retrieval["session"]
+        return self.conversations.history(session) if session and session["turns"] else None
 
-        # Prompt building (Augmentation)
-        prompt = self._build_prompt(query, results)
+    def _remember(self, query: str, retrieval: Dict, answer_text: str):
+        """Records a turn of a session, with the chunks it was answered from for the next turn to reuse."""
+        session = retrieval["session"]
+        if session is None:
+            return
+        reuse = {key: retrieval[key] for key in ("scope", "version", "vector", "results")} if retrieval["results"] else None
+        self.conversations.append(session["id"], query, retrieval["standalone"], answer_text, reuse, namespace=session["namespace"])
 
-        # Generating Response (Generation)
-        logger.info("Calling Gemini API...")
+    @staticmethod
+    def _turn_info(query: str, retrieval: Dict) -> Dict:
+        """The "session_id" of a session turn, and its "rewritten_query" when the search used one."""
+        if retrieval["session"] is None:
+            return {}
+        info = {"session_id": retrieval["session"]["id"]}
+        if retrieval["standalone"] != query:
+            info["rewritten_query"] = retrieval["standalone"]
+        return info
+
+    def _store(self, retrieval: Dict, answer_text: str, sources: List[Dict]):
+        """Caches a successful answer, in the cache of the tenant it was retrieved from."""
+        cache = retrieval["index"].cache
+        if cache and retrieval["cache_key"] is not None:
+            cache.put(retrieval["cache_key"], retrieval["vector"], {"answer": answer_text, "sources": sources})
+
+    def _answered(self, query: str, retrieval: Dict, generation: Dict, sources: List[Dict], turn: Dict) -> Dict:
+        """
+            Result of a generated answer, which is cached and recorded in the session. A fallback answer
+            (the LLM was unavailable) is neither, and is flagged with "fallback".
+        """
+        if generation["fallback"]:
+            return {"answer": generation["text"], "sources": sources, "fallback": True, **turn}
+        self._store(retrieval, generation["text"], sources)
+        self._remember(query, retrieval, generation["text"])
+        return {"answer": generation["text"], "sources": sources, **turn}
+
+    def _finish(self, result: Dict, start_time: float, timings: Dict[str, float]) -> Dict:
+        """Stamps the total latency and the per-stage timings on an answer."""
+        total = time.perf_counter() - start_time
+        metrics.observe("total", total, timings)
+        return {**result, "processing_time": total, "timings": timings}
+
+    def ask(self, query: str, top_k: int = 3, session_id: Optional[str] = None, tenant: Optional[str] = None,
+            **search_options) -> Dict:
+        """
+            Answers a query, as a turn of the chat session `session_id` when given (see ConversationStore).
+            The result carries "processing_time" and "timings" ({stage: seconds}), plus "session_id" and
+            "rewritten_query" (see _turn_info) for a session turn.
+            `tenant` selects the tenant's collection (the default one when None): an unknown tenant raises
+            TenantNotFound, and one already at its quota of queries in flight TenantBusy (see TenantRegistry).
+        """
+        with self.tenants.admit(tenant):
+            start_time = time.perf_counter()
+            timings: Dict[str, float] = {}
+
+            # Cache lookup + Semantic search (Retrieval)
+            with metrics.stage("retrieval", timings):
+                retrieval = metrics.bind(self._retrieve_turn, timings)(tenant, query, top_k, search_options, session_id)
+            turn = self._turn_info(query, retrieval)
+            if retrieval["cached"]:
+                self._remember(query, retrieval, retrieval["cached"]["answer"])
+                return self._finish({**retrieval["cached"], **turn}, start_time, timings)
+            results = retrieval["results"]
+
+            if not results:
+                self._remember(query, retrieval, NO_CONTEXT_ANSWER)
+                return self._finish({"answer": NO_CONTEXT_ANSWER, "sources": [], **turn}, start_time, timings)
+
+            # Context assembly + Prompt building (Augmentation)
+            with metrics.stage("prompt_build", timings):
+                context = self.assembler.assemble(results)
+                prompt = self._build_prompt(query, context, self._history(retrieval))
+            sources = self._format_sources(context)
+
+            # Generating Response (Generation)
+            logger.info("Calling Gemini API...")
+            try:
+                with metrics.stage("llm_total", timings):
+                    generation = self.llm.generate(prompt, query, context)
+            except Exception as e:
+                logger.error(f"Gemini API Error: {e}")
+                return self._finish({"answer": LLM_ERROR_ANSWER, "sources": sources, **turn}, start_time, timings)
+            return self._finish(self._answered(query, retrieval, generation, sources, turn), start_time, timings)
+
+    async def aask(self, query: str, top_k: int = 3, session_id: Optional[str] = None, tenant: Optional[str] = None,
+                   **search_options) -> Dict:
+        """
+            Async version of ask(): nothing here blocks the event loop.
+            Retrieval runs on the bounded retrieval pool and generation uses the async Gemini client.
+        """
+        with self.tenants.admit(tenant):
+            start_time = time.perf_counter()
+            timings: Dict[str, float] = {}
+            loop = asyncio.get_running_loop()
+
+            # Cache lookup + Semantic search (Retrieval) off the event loop; includes the wait for a pool slot
+            with metrics.stage("retrieval", timings):
+                retrieval = await loop.run_in_executor(
+                    self.retrieval_pool, metrics.bind(self._retrieve_turn, timings), tenant, query, top_k, search_options, session_id
+                )
+            turn = self._turn_info(query, retrieval)
+            if retrieval["cached"]:
+                self._remember(query, retrieval, retrieval["cached"]["answer"])
+                return self._finish({**retrieval["cached"], **turn}, start_time, timings)
+            results = retrieval["results"]
+
+            if not results:
+                self._remember(query, retrieval, NO_CONTEXT_ANSWER)
+                return self._finish({"answer": NO_CONTEXT_ANSWER, "sources": [], **turn}, start_time, timings)
+
+            # Context assembly + Prompt building (Augmentation)
+            with metrics.stage("prompt_build", timings):
+                context = self.assembler.assemble(results)
+                prompt = self._build_prompt(query, context, self._history(retrieval))
+            sources = self._format_sources(context)
+
+            # Generating Response (Generation), through the LLM gateway
+            logger.info("Calling Gemini API (async)...")
+            try:
+                with metrics.stage("llm_total", timings):
+                    generation = await self.llm.agenerate(prompt, query, context)
+            except Exception as e:
+                logger.error(f"Gemini API Error: {e}")
+                return self._finish({"answer": LLM_ERROR_ANSWER, "sources": sources, **turn}, start_time, timings)
+            return self._finish(self._answered(query, retrieval, generation, sources, turn), start_time, timings)
+
+    async def astream(self, query: str, top_k: int = 3, session_id: Optional[str] = None, tenant: Optional[str] = None,
+                      **search_options) -> AsyncIterator[Tuple[str, Any]]:
+        """
+            Streaming version of aask(). Yields (event, data) pairs:
+            - ("sources", [...]) as soon as retrieval and context assembly are done
+            - ("token", {"text": ...}) for every chunk Gemini streams back
+            - ("done", {"processing_time": ..., "timings": {...}}) with per-stage timings (and the session fields of aask())
+            - ("error", {"detail": ...}) instead of "done" when the LLM fails after some tokens were sent: they stay
+              a partial answer (before any token, the error answer is sent as the answer, like aask())
+        """
+        with self.tenants.admit(tenant):
+            start_time = time.perf_counter()
+            timings: Dict[str, float] = {}
+            loop = asyncio.get_running_loop()
+
+            # Cache lookup + Semantic search (Retrieval) off the event loop
+            with metrics.stage("retrieval", timings):
+                retrieval = await loop.run_in_executor(
+                    self.retrieval_pool, metrics.bind(self._retrieve_turn, timings), tenant, query, top_k, search_options, session_id
+                )
+            turn = self._turn_info(query, retrieval)
+
+            cached = retrieval["cached"]
+            if cached:
+                self._remember(query, retrieval, cached["answer"])
+                yield "sources", cached["sources"]
+                yield "token", {"text": cached["answer"]}
+                yield "done", self._finish({"cached": cached["cached"], **turn}, start_time, timings)
+                return
+
+            results = retrieval["results"]
+            if not results:
+                self._remember(query, retrieval, NO_CONTEXT_ANSWER)
+                yield "sources", []
+                yield "token", {"text": NO_CONTEXT_ANSWER}
+                yield "done", self._finish(turn, start_time, timings)
+                return
+
+            # Context assembly + Prompt building (Augmentation)
+            with metrics.stage("prompt_build", timings):
+                context = self.assembler.assemble(results)
+                prompt = self._build_prompt(query, context, self._history(retrieval))
+            sources = self._format_sources(context)
+            yield "sources", sources
+
+            # Streaming Response (Generation)
+            logger.info("Calling Gemini API (stream)...")
+            answer_parts = []
+            fallback = False
+            try:
+                llm_start = time.perf_counter()
+                async for piece in self.llm.astream(prompt, query, context):
+                    if not answer_parts:
+                        metrics.observe("llm_first_token", time.perf_counter() - llm_start, timings)
+                    answer_parts.append(piece["text"])
+                    fallback = piece["fallback"]
+                    yield "token", {"text": piece["text"]}
+                metrics.observe("llm_total", time.perf_counter() - llm_start, timings)
+            except Exception as e:
+                logger.error(f"Gemini API Error: {e}")
+                if answer_parts:
+                    yield "error", {"detail": LLM_ERROR_ANSWER}
+                    return
+                yield "token", {"text": LLM_ERROR_ANSWER}
+            else:
+                generation = {"text": "".join(answer_parts), "fallback": fallback}
+                turn = {key: value for key, value in self._answered(query, retrieval, generation, sources, turn).items()
+                        if key not in ("answer", "sources")}
+
+            yield "done", self._finish(turn, start_time, timings)
+
+    async def _answer_item(self, index: int, query: str, retrieval: Dict, semaphore: asyncio.Semaphore,
+                           start_time: float) -> Dict:
+        """Generation step of one aask_many() query; errors are reported in the result, never raised."""
+        item = {"index": index, "query": query, "status": "ok", "cached": None, "error": None}
+        sources: List[Dict] = []
         try:
-            response = self.model.generate_content(prompt)
-            answer_text = response.text
+            if retrieval["cached"]:
+                return {**item, **retrieval["cached"], "processing_time": time.perf_counter() - start_time}
+            results = retrieval["results"]
+            if not results:
+                return {**item, "answer": NO_CONTEXT_ANSWER, "sources": [], "processing_time": time.perf_counter() - start_time}
+
+            context = self.assembler.assemble(results)
+            prompt = self._build_prompt(query, context)
+            sources = self._format_sources(context)
+
+            async with semaphore:
+                with metrics.stage("llm_total"):
+                    generation = await self.llm.agenerate(prompt, query, context)
+            if generation["fallback"]:
+                return {**item, "answer": generation["text"], "sources": sources, "fallback": True,
+                        "processing_time": time.perf_counter() - start_time}
+            self._store(retrieval, generation["text"], sources)
+            return {**item, "answer": generation["text"], "sources": sources, "processing_time": time.perf_counter() - start_time}
         except Exception as e:
-            logger.error(f"Gemini API Error: {e}")
-            answer_text = "Sorry, there was an error processing your response with the AI"
+            logger.error(f"Gemini API Error (batch query {index}): {e}")
+            self.batch_stats["failed"] += 1
+            return {**item, "status": "error", "error": str(e), "answer": None, "sources": sources,
+                    "processing_time": time.perf_counter() - start_time}
 
-        # Formatting output
-        sources_data = []
-        for r in results:
-            sources_data.append({
-                "source": r["metadata"]["source"],
-                "page": r["metadata"]["page"],
-                "content": r["content"]
-            })
+    async def aask_many(self, queries: List[str], top_k: int = 3, concurrency: Optional[int] = None,
+                        tenant: Optional[str] = None, **search_options) -> AsyncIterator[Dict]:
+        """
+            Answers a batch of queries (offline evaluation, bulk triage). Yields one result per query as soon as
+            it is ready, so not in input order: {"index", "query", "status" ("ok" or "error"), "answer", "sources",
+            "cached", "error", "processing_time"}. A failed query is reported in its result and the batch goes on.
+            Queries are retrieved in chunks of `batch_size` (one encoder batch and one Chroma query per chunk),
+            overlapped with the generation of the previous chunk; at most `concurrency` LLM calls run at once.
+            Invalid `search_options` raise ValueError before the first result. The batch counts as one query of `tenant`.
+        """
+        with self.tenants.admit(tenant):
+            loop = asyncio.get_running_loop()
+            semaphore = asyncio.Semaphore(concurrency or self.batch_concurrency)
+            pending: Set[asyncio.Task] = set()
+            self.batch_stats["queries"] += len(queries)
 
-        return {
-            "answer": answer_text,
-            "sources": sources_data,
-            "processing_time": time.time() - start_time
-        }
+            try:
+                for start in range(0, len(queries), self.batch_size):
+                    chunk = queries[start : start + self.batch_size]
+                    chunk_start = time.perf_counter()
+                    try:
+                        with metrics.stage("batch_retrieval"):
+                            retrievals = await loop.run_in_executor(
+                                self.retrieval_pool, self._retrieve_many, tenant, chunk, top_k, search_options
+                            )
+                    except (ValueError, TenantNotFound):
+                        raise
+                    except Exception as e:
+                        logger.error(f"Batch retrieval error (queries {start}-{start + len(chunk) - 1}): {e}")
+                        self.batch_stats["failed"] += len(chunk)
+                        for offset, query in enumerate(chunk):
+                            yield {"index": start + offset, "query": query, "status": "error", "cached": None, "error": str(e),
+                                   "answer": None, "sources": [], "processing_time": time.perf_counter() - chunk_start}
+                        continue
+
+                    for offset, (query, retrieval) in enumerate(zip(chunk, retrievals)):
+                        pending.add(asyncio.create_task(self._answer_item(start + offset, query, retrieval, semaphore, chunk_start)))
+
+                    # Streaming the answers already done; with more than one chunk in flight, retrieval waits for generation
+                    while pending:
+                        backlog = len(pending) > self.batch_size
+                        done, pending = await asyncio.wait(pending, timeout=None if backlog else 0, return_when=asyncio.FIRST_COMPLETED)
+                        for task in done:
+                            yield task.result()
+                        if not backlog:
+                            break
+
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+            finally:
+                # The client went away (or the caller stopped iterating): dropping the remaining LLM calls
+                for task in pending:
+                    task.cancel()
+
+    def ask_many(self, queries: List[str], top_k: int = 3, concurrency: Optional[int] = None, tenant: Optional[str] = None,
+                 **search_options) -> List[Dict]:
+        """
+            Blocking version of aask_many() for scripts, returning the results in input order.
+            Runs its own event loop, so it can't be called from async code.
+        """
+        async def collect():
+            return [result async for result in self.aask_many(queries, top_k, concurrency, tenant, **search_options)]
+
+        return sorted(asyncio.run(collect()), key=lambda result: result["index"])
@@ -0,0 +1,232 @@
+import re
+from typing import Dict, List, Optional
+
+# Numbered headings: "3. RESOLUÇÃO DE PROBLEMAS (TROUBLESHOOTING)", "4.2 MANUTENÇÃO"
+HEADING_PATTERN = re.compile(r"^\s*\d+(?:\.\d+)*\.?\s+(\S.{1,80}?)\s*$")
+# Numbered or bulleted steps: "1. Desligue o aparelho", "2) Remova o filtro", "Passo 3: ...", "- Verifique o cabo"
+STEP_PATTERN = re.compile(r"^(?:(?i:passo|step)\s+(\d{1,2})\s*[.):]|(\d{1,2})[.)]|[-•*▪])\s+\S")
+# Error-code entries: "Erro 101: ...", "Error E-42 -", "Código 7:", "E101: ..."
+ERROR_CODE_PATTERN = re.compile(r"^(?:(?i:erro|error|c[óo]digo|code|falha|fault)\s*[:#]?\s*[A-Z]?-?\d{1,4}\b|[A-Z]{1,2}-?\d{2,4}\s*[:\-–])")
+# Table rows keep their cells apart with tabs, pipes or runs of spaces
+CELL_SEPARATOR_PATTERN = re.compile(r"\t|\||\S {2,}(?=\S)")
+# Words and punctuation marks: a tokenizer-free proxy for model tokens, counted in one pass
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+SENTENCE_END = (".", "!", "?", ":", ";")
+
+def is_heading(title: str) -> bool:
+    """Headings are (mostly) upper case; numbered list items like "1. Verifique o cabo" are not."""
+    letters = [c for c in title if c.isalpha()]
+    return len(letters) >= 3 and sum(c.isupper() for c in letters) / len(letters) >= 0.8
+
+def count_tokens(text: str) -> int:
+    return len(TOKEN_PATTERN.findall(text))
+
+class StructuredChunker:
+    """
+        Structure-aware chunking of PDF pages, sized in tokens:
+        1. each page is parsed line by line into blocks: headings, steps, error-code entries, table rows
+           and paragraphs (lines wrapped by the PDF layout are joined back);
+        2. a block cut by the page break (an unfinished sentence, or the next steps of a procedure) is completed
+           with the start of the next page; its chunk keeps the page it starts on and records `page_end`;
+        3. blocks are packed into chunks of at most `chunk_tokens`. Headings always open a new chunk, a short
+           last block is repeated at the start of the next chunk, and a block longer than a chunk is cut into
+           overlapping token windows.
+        Every step is a single forward pass, so chunking time is linear in the text length.
+    """
+
+    def __init__(self, chunk_tokens: int = 160, overlap_tokens: int = 32, min_chunk_tokens: int = 32):
+        """
+            Args:
+                chunk_tokens (int): Maximum number of tokens (words and punctuation marks) per chunk
+                overlap_tokens (int): Tokens repeated between consecutive chunks of the same section
+                min_chunk_tokens (int): Shorter text before a heading (e.g. a running page header) joins the next section
+        """
+        if not 0 <= overlap_tokens < chunk_tokens:
+            raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.min_chunk_tokens = min_chunk_tokens
+
+    def parse(self, content: str, page: int) -> List[Dict]:
+        """Splits the raw text of a page into blocks ({"kind", "text", "tokens", "number", "title", "page", "page_end"})."""
+        blocks = []
+        lines: List[List[str]] = []
+        current = None    # Open block that the next plain line continues
+        for raw in content.splitlines():
+            line = " ".join(raw.split())
+            if not line:
+                current = None
+                continue
+
+            number, title = None, None
+            heading = HEADING_PATTERN.match(line)
+            step = STEP_PATTERN.match(line)
+            if heading and is_heading(heading.group(1)):
+                kind, title = "heading", heading.group(1)
+            elif step:
+                kind, number = "step", int(step.group(1) or step.group(2)) if step.group(1) or step.group(2) else None
+            elif ERROR_CODE_PATTERN.match(line):
+                kind = "error"
+            elif ("\t" in raw or "|" in raw or "  " in raw) and len(CELL_SEPARATOR_PATTERN.findall(raw)) >= 2:
+                kind = "table"
+            else:
+                kind = "text"
+
+            if current is not None:
+                last_line = lines[current][-1]
+                # Table rows stay together; plain lines continue the open entry until its sentence is over
+                if (kind == "table" and blocks[current]["kind"] == "table") or \
+                        (kind == "text" and blocks[current]["kind"] != "table" and not last_line.endswith(SENTENCE_END)):
+                    lines[current].append(line)
+                    continue
+
+            blocks.append({"kind": kind, "number": number, "title": title, "page": page, "page_end": page})
+            lines.append([line])
+            current = None if kind == "heading" else len(blocks) - 1
+
+        for block, block_lines in zip(blocks, lines):
+            block["text"] = ("\n" if block["kind"] == "table" else " ").join(block_lines)
+            block["tokens"] = count_tokens(block["text"])
+        return blocks
+
+    def _procedure_tokens(self, blocks: List[Dict]) -> Optional[int]:
+        """
+            Tokens of the numbered procedure the page ends with (its steps and their notes, back to
+            the first step on the page), or None when the page doesn't end inside a procedure.
+        """
+        tokens = 0
+        numbered = False
+        for block in reversed(blocks):
+            if block["kind"] not in ("step", "text"):
+                break
+            tokens += block["tokens"]
+            if block["kind"] == "step" and block["number"] is not None:
+                numbered = True
+                if block["number"] == 1:
+                    break
+        return tokens if numbered else None
+
+    def carry(self, blocks: List[Dict], next_blocks: List[Dict]) -> int:
+        """
+            Moves the start of the next page onto this one when it completes this page's last block:
+            a sentence cut by the page break is joined to its block, and the following steps of a
+            procedure are added as long as the whole procedure fits in one chunk.
+            Returns how many leading blocks of `next_blocks` were taken.
+        """
+        if not blocks or not next_blocks or blocks[-1]["kind"] == "heading":
+            return 0
+        last = blocks[-1]
+        taken = 0
+
+        first = next_blocks[0]
+        if first["kind"] == "text" and last["kind"] != "table" and \
+                (not last["text"].endswith(SENTENCE_END) or first["text"][:1].islower()):
+            last.update(text=f"{last['text']} {first['text']}", tokens=last["tokens"] + first["tokens"], page_end=first["page"])
+            taken = 1
+
+        procedure = self._procedure_tokens(blocks)
+        if procedure is None:
+            return taken
+        expected = next(b["number"] for b in reversed(blocks) if b["kind"] == "step" and b["number"] is not None) + 1
+        for block in next_blocks[taken:]:
+            if block["kind"] == "step" and block["number"] == expected:
+                expected += 1
+            elif block["kind"] != "text" or blocks[-1]["kind"] == "text":
+                break    # Only one note per step: anything else is past the procedure
+            if procedure + block["tokens"] > self.chunk_tokens:
+                break
+            procedure += block["tokens"]
+            blocks.append(block)
+            taken += 1
+        return taken
+
+    def _windows(self, block: Dict) -> List[Dict]:
+        """Cuts a block longer than a chunk into windows of `chunk_tokens` tokens, overlapping by `overlap_tokens`."""
+        spans = [match.span() for match in TOKEN_PATTERN.finditer(block["text"])]
+        step = self.chunk_tokens - self.overlap_tokens
+        windows = []
+        for start in range(0, len(spans), step):
+            end = min(start + self.chunk_tokens, len(spans))
+            text = block["text"][spans[start][0] : spans[end - 1][1]]
+            windows.append({**block, "text": text, "tokens": end - start})
+            if end == len(spans):
+                break
+        return windows
+
+    def pack(self, blocks: List[Dict], section: Optional[str] = None) -> List[Dict]:
+        """
+            Packs one page's blocks into chunks ({"text", "section", "page_end"}).
+            `section` is the heading still open from the previous page.
+        """
+        chunks = []
+        current: List[Dict] = []
+        tokens = 0
+        chunk_section = section
+
+        def flush():
+            chunks.append({
+                "text": "\n".join(block["text"] for block in current),
+                "section": chunk_section,
+                "page_end": max(block["page_end"] for block in current)
+            })
+
+        has_content = False    # Whether the current chunk has more than headings
+        for block in blocks:
+            for piece in (self._windows(block) if block["tokens"] > self.chunk_tokens else [block]):
+                if piece["kind"] == "heading" and has_content and tokens >= self.min_chunk_tokens:
+                    flush()
+                    current, tokens, has_content = [], 0, False
+                elif has_content and tokens + piece["tokens"] > self.chunk_tokens:
+                    flush()
+                    previous = current[-1]
+                    # A short last block (e.g. the previous step) gives the next chunk its context
+                    if len(current) > 1 and previous["tokens"] <= self.overlap_tokens and \
+                            previous["tokens"] + piece["tokens"] <= self.chunk_tokens:
+                        current, tokens = [previous], previous["tokens"]
+                    else:
+                        current, tokens, has_content = [], 0, False
+
+                if piece["kind"] == "heading":
+                    section = piece["title"]
+                else:
+                    has_content = True
+                if not current or piece["kind"] == "heading":
+                    chunk_section = section
+                current.append(piece)
+                tokens += piece["tokens"]
+
+        if current:
+            flush()
+        return chunks
+
+    def chunk_pages(self, pages: List[Dict]) -> List[List[Dict]]:
+        """
+            Chunks consecutive page records ({"page_number", "content", "source"}) into chunk records,
+            one list per page. Chunks that continue onto the next page belong to the page they start on.
+        """
+        parsed = [self.parse(page['content'], page['page_number']) for page in pages]
+        # Completing each page with the start of the next one (only across an actual page break)
+        for i in range(len(pages) - 1):
+            if pages[i + 1]['page_number'] == pages[i]['page_number'] + 1:
+                taken = self.carry(parsed[i], parsed[i + 1])
+                parsed[i + 1] = parsed[i + 1][taken:]
+
+        section = None
+        chunked = []
+        for page, blocks in zip(pages, parsed):
+            chunks = self.pack(blocks, section)
+            if chunks:
+                section = chunks[-1]["section"]
+            chunked.append([
+                {
+                    "id": f"{page['source']}_pg{page['page_number']}_{chunk_id}",
+                    "source": page['source'],
+                    "page": page['page_number'],
+                    "page_end": chunk["page_end"],
+                    "section": chunk["section"],
+                    "text": chunk["text"],
+                    "char_count": len(chunk["text"])
+                }
+                for chunk_id, chunk in enumerate(chunks)
+            ])
+        return chunked
@@ -0,0 +1,308 @@
+import os
+import json
+import mmap
+import shutil
+import threading
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+# float32 codes are the exact vectors: the scan is exact brute-force search and nothing needs re-scoring
+COMPACT_DTYPES = {"int8": ("codes.i8", np.int8), "float16": ("codes.f16", np.float16), "float32": ("codes.f32", np.float32)}
+# Distance functions, as in Chroma: squared L2, 1 - cosine similarity, 1 - inner product
+SPACES = ("l2", "cosine", "ip")
+
+class CompactVectorStore:
+    """
+        Dense vectors of a collection in NumPy files, for collections too large to keep float32 vectors in Chroma's index:
+        - codes.i8 / codes.f16 (memory-mapped): int8 (one scale per row) or float16 copies of the vectors,
+          scanned for approximate scores;
+        - rows.f32 (memory-mapped): the scale and squared norm of every row;
+        - exact.f32: the float32 vectors, never mapped: re-scoring reads its few candidate rows with pread;
+        - ids.json: the chunk ID of every row (null for deleted rows, which later inserts reuse), dtype and space.
+        Only the codes are scanned, so only they need to stay in memory: 1 (int8) or 2 (float16) bytes per
+        dimension instead of 4. With float32 codes (and no exact.f32) the store is an exact brute-force index.
+    """
+
+    def __init__(self, path: str, dim: int, dtype: str = "int8", space: str = "l2", rescore_factor: int = 4,
+                 block_rows: int = 1024, segment_rows: int = 65536):
+        """
+            Args:
+                path (str): Directory of the store
+                dim (int): Embedding dimension
+                dtype (str): Scanned representation, "int8", "float16" or "float32" (exact)
+                space (str): Distance function, "l2", "cosine" or "ip"
+                    (dtype and space are fixed when the store is created: an existing store keeps its own)
+                rescore_factor (int): Approximate candidates re-scored exactly per requested result
+                block_rows (int): Rows converted to float32 at a time during the scan (small enough to stay in CPU cache)
+                segment_rows (int): Rows scored before the running top candidates are updated
+        """
+        if dtype not in COMPACT_DTYPES:
+            raise ValueError(f"Unknown compact dtype '{dtype}', expected one of {tuple(COMPACT_DTYPES)}")
+        if space not in SPACES:
+            raise ValueError(f"Unknown space '{space}', expected one of {SPACES}")
+        self.path = path
+        self.dim = dim
+        self.dtype = dtype
+        self.space = space
+        self.rescore_factor = max(1, rescore_factor)
+        self.block_rows = block_rows
+        self.segment_rows = segment_rows
+        os.makedirs(self.path, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._capacity = 0
+        self._codes: Optional[np.ndarray] = None
+        self._rows: Optional[np.ndarray] = None
+        self._exact_path = os.path.join(self.path, "exact.f32")
+        self._mappings: List[mmap.mmap] = []
+        self._load()
+
+    def _load(self):
+        """Reads the row IDs and maps the files written so far."""
+        self._ids: List[Optional[str]] = []
+        meta_path = os.path.join(self.path, "ids.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["dim"] != self.dim:
+                raise ValueError(f"Compact store {self.path} holds vectors of dim {meta['dim']}, not {self.dim}: "
+                                 f"rebuild or re-ingest the collection")
+            self.dtype, self.space = meta["dtype"], meta.get("space", "l2")
+            self._ids = meta["ids"]
+        self._index: Dict[str, int] = {chunk_id: row for row, chunk_id in enumerate(self._ids) if chunk_id is not None}
+        self._free: List[int] = [row for row, chunk_id in enumerate(self._ids) if chunk_id is None][::-1]
+        self._live = np.zeros(len(self._ids), dtype=bool)
+        self._live[list(self._index.values())] = True
+        if self.dtype == "float32":
+            self.rescore_factor = 1
+
+        rows_path = os.path.join(self.path, "rows.f32")
+        if os.path.exists(rows_path):
+            self._map(os.path.getsize(rows_path) // 8)
+
+    def _map(self, capacity: int):
+        """(Re)maps the codes and rows files with room for `capacity` rows, growing them if needed."""
+        codes_file, codes_dtype = COMPACT_DTYPES[self.dtype]
+        arrays, mappings = [], []
+        for name, dtype, width in ((codes_file, codes_dtype, self.dim), ("rows.f32", np.float32, 2)):
+            file_path = os.path.join(self.path, name)
+            size = capacity * width * np.dtype(dtype).itemsize
+            with open(file_path, "ab") as f:
+                if f.tell() < size:
+                    f.truncate(size)
+            if not capacity:
+                return
+            with open(file_path, "r+b") as f:
+                mapping = mmap.mmap(f.fileno(), size)
+            mappings.append(mapping)
+            arrays.append(np.ndarray((capacity, width), dtype=dtype, buffer=mapping))
+        # Maps being replaced stay alive as long as a running search still holds their arrays
+        self._codes, self._rows = arrays
+        self._mappings = mappings
+        self._capacity = capacity
+
+    def _write_exact(self, rows: np.ndarray, vectors: np.ndarray):
+        """Writes float32 vectors at their (sorted) rows: each run of consecutive rows, e.g. an append, is one write."""
+        row_bytes = self.dim * 4
+        runs = np.flatnonzero(np.diff(rows) != 1) + 1
+        with open(self._exact_path, "r+b" if os.path.exists(self._exact_path) else "w+b") as f:
+            for run_rows, run_vectors in zip(np.split(rows, runs), np.split(vectors, runs)):
+                os.pwrite(f.fileno(), run_vectors.tobytes(), int(run_rows[0]) * row_bytes)
+
+    def _read_exact(self, rows: List[int]) -> np.ndarray:
+        """Float32 vectors of `rows`, one pread each (mapping the file would fault whole pages around every row into memory)."""
+        if self.dtype == "float32":
+            return np.asarray(self._codes[rows]) if rows else np.empty((0, self.dim), dtype=np.float32)
+        row_bytes = self.dim * 4
+        vectors = np.empty((len(rows), self.dim), dtype=np.float32)
+        with open(self._exact_path, "rb") as f:
+            for i, row in enumerate(rows):
+                vectors[i] = np.frombuffer(os.pread(f.fileno(), row_bytes, row * row_bytes), dtype=np.float32)
+        return vectors
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def quantize(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Codes of float32 vectors and their scales: int8 is symmetric, scaled per row by max|v| / 127."""
+        if self.dtype != "int8":
+            return vectors.astype(COMPACT_DTYPES[self.dtype][1]), np.ones(len(vectors), dtype=np.float32)
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def upsert(self, ids: List[str], vectors: np.ndarray) -> np.ndarray:
+        """
+            Writes the vectors of `ids` (a float32 (len(ids), dim) matrix, taken as is) and returns the row of each ID.
+            Existing IDs keep their row; new ones take deleted rows first, then rows past the end.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.shape != (len(ids), self.dim):
+            raise ValueError(f"Expected a ({len(ids)}, {self.dim}) matrix, got {vectors.shape}")
+        # The last occurrence of a repeated ID wins, as in Chroma
+        requested = ids
+        last = {chunk_id: i for i, chunk_id in enumerate(ids)}
+        if len(last) < len(ids):
+            ids, vectors = list(last), vectors[list(last.values())]
+
+        with self._lock:
+            rows = np.empty(len(ids), dtype=np.int64)
+            for i, chunk_id in enumerate(ids):
+                row = self._index.get(chunk_id)
+                if row is None:
+                    if self._free:
+                        row = self._free.pop()
+                        self._ids[row] = chunk_id
+                    else:
+                        row = len(self._ids)
+                        self._ids.append(chunk_id)
+                    self._index[chunk_id] = row
+                rows[i] = row
+
+            size = len(self._ids)
+            if size > self._capacity:
+                self._map(max(size, 2 * self._capacity, 1024))
+            if size > len(self._live):
+                self._live = np.concatenate([self._live, np.zeros(size - len(self._live), dtype=bool)])
+
+            codes, scales = self.quantize(vectors)
+            order = np.argsort(rows)    # Sequential writes
+            rows, codes, scales, vectors = rows[order], codes[order], scales[order], vectors[order]
+            if self.dtype != "float32":
+                self._write_exact(rows, vectors)
+            self._codes[rows] = codes
+            self._rows[rows, 0] = scales
+            self._rows[rows, 1] = np.einsum("ij,ij->i", vectors, vectors)
+            self._live[rows] = True
+            return np.asarray([self._index[chunk_id] for chunk_id in requested], dtype=np.int64)
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            for chunk_id in ids:
+                row = self._index.pop(chunk_id, None)
+                if row is not None:
+                    self._ids[row] = None
+                    self._live[row] = False
+                    self._free.append(row)
+
+    def flush(self):
+        """Syncs the vector files, then publishes the row IDs (atomically, so readers never see IDs without vectors)."""
+        with self._lock:
+            for mapping in self._mappings:
+                mapping.flush()
+            if os.path.exists(self._exact_path):
+                with open(self._exact_path, "r+b") as f:
+                    os.fsync(f.fileno())
+            meta_path = os.path.join(self.path, "ids.json")
+            tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"dim": self.dim, "dtype": self.dtype, "space": self.space, "ids": self._ids}, f)
+            os.replace(tmp_path, meta_path)
+
+    def get(self, ids: List[str]) -> np.ndarray:
+        """Exact float32 vectors of `ids` (all of them must be stored)."""
+        return self._read_exact([self._index[chunk_id] for chunk_id in ids])
+
+    def search(self, queries: np.ndarray, n_results: int,
+               allowed: Optional[List[str]] = None) -> List[List[Tuple[str, float]]]:
+        """
+            Nearest rows of every query vector, as (id, distance) lists, closest first.
+            The codes are scanned block by block for approximate scores, keeping n_results * rescore_factor
+            candidates per query; those are re-scored on the exact vectors. `allowed` restricts the search to these IDs.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        with self._lock:
+            codes, rows, live = self._codes, self._rows, self._live.copy()
+        size = len(live)
+        if not size or n_results <= 0:
+            return [[] for _ in queries]
+
+        if allowed is not None:
+            mask = np.zeros(size, dtype=bool)
+            mask[[self._index[chunk_id] for chunk_id in allowed if self._index.get(chunk_id, size) < size]] = True
+            live &= mask
+        candidates = min(n_results * self.rescore_factor, int(live.sum()))
+        if not candidates:
+            return [[] for _ in queries]
+
+        # Approximate scan. Scores rank like the distance: q.v - |v|^2 / 2 (l2), q.v / |v| (cosine) or q.v (ip)
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        buffer = np.empty((self.block_rows, self.dim), dtype=np.float32)
+        for start in range(0, size, self.segment_rows):
+            end = min(start + self.segment_rows, size)
+            segment_live = live[start:end]
+            if not segment_live.any():
+                continue
+            scores = np.empty((end - start, len(queries)), dtype=np.float32)
+            for block in range(start, end, self.block_rows):
+                count = min(self.block_rows, end - block)
+                np.copyto(buffer[:count], codes[block : block + count])
+                np.matmul(buffer[:count], queries.T, out=scores[block - start : block - start + count])
+            scores *= rows[start:end, 0:1]
+            if self.space == "l2":
+                scores -= 0.5 * rows[start:end, 1:2]
+            elif self.space == "cosine":
+                scores /= np.sqrt(np.maximum(rows[start:end, 1:2], 1e-24))
+            scores[~segment_live] = -np.inf
+
+            merged_scores = np.concatenate([best_scores, scores.T], axis=1)
+            merged_rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, end), (len(queries), end - start))], axis=1)
+            if merged_scores.shape[1] > candidates:
+                keep = np.argpartition(-merged_scores, candidates - 1, axis=1)[:, :candidates]
+                merged_scores = np.take_along_axis(merged_scores, keep, axis=1)
+                merged_rows = np.take_along_axis(merged_rows, keep, axis=1)
+            best_scores, best_rows = merged_scores, merged_rows
+
+        # Exact re-scoring: the candidate rows of all the queries are read once, in file order
+        unique_rows, positions = np.unique(best_rows, return_inverse=True)
+        vectors = self._read_exact(unique_rows.tolist())
+        positions = positions.reshape(best_rows.shape)
+        rankings = []
+        for q, query in enumerate(queries):
+            valid = np.isfinite(best_scores[q])
+            distances = self.distances(vectors[positions[q][valid]], query)
+            order = np.argsort(distances)[:n_results]
+            rankings.append((best_rows[q][valid][order], distances[order]))
+
+        with self._lock:
+            return [
+                [(self._ids[row], float(distance)) for row, distance in zip(found.tolist(), distances) if self._ids[row] is not None]
+                for found, distances in rankings
+            ]
+
+    def distances(self, vectors: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Exact distances between a query and float32 vectors, in the store's space."""
+        if self.space == "l2":
+            return ((vectors - query) ** 2).sum(axis=1)
+        dots = vectors @ query
+        if self.space == "cosine":
+            dots /= np.maximum(np.linalg.norm(vectors, axis=1) * np.linalg.norm(query), 1e-12)
+        return 1.0 - dots
+
+    def warm_up(self):
+        """Reads the codes once, so the first query doesn't fault them in from disk."""
+        if len(self):
+            self.search(np.zeros((1, self.dim), dtype=np.float32), 1)
+
+    def stats(self) -> Dict[str, Any]:
+        codes_bytes = np.dtype(COMPACT_DTYPES[self.dtype][1]).itemsize * self.dim
+        return {
+            "dtype": self.dtype,
+            "space": self.space,
+            "vectors": len(self),
+            "rows": len(self._ids),
+            "scanned_bytes": len(self._ids) * (codes_bytes + 8),
+            "exact_bytes": len(self._ids) * self.dim * 4 if self.dtype != "float32" else 0
+        }
+
+    def drop(self):
+        """Deletes the store's files."""
+        with self._lock:
+            self._codes = self._rows = None
+            self._mappings = []
+            self._ids, self._index, self._free = [], {}, []
+            self._live = np.zeros(0, dtype=bool)
+            self._capacity = 0
+            shutil.rmtree(self.path, ignore_errors=True)
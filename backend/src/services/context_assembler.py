@@ -0,0 +1,158 @@
+import re
+import math
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Chunk IDs are "{source}_pg{page}_{index}" (see PDFProcessor.chunk_page)
+CHUNK_ID_PATTERN = re.compile(r"_pg(\d+)_(\d+)$")
+WORD_PATTERN = re.compile(r"\w+")
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for Gemini/SentencePiece-style tokenizers)."""
+    return math.ceil(len(text) / 4)
+
+def merge_overlapping(first: str, second: str, min_overlap: int = 16) -> str:
+    """
+        Joins two consecutive chunks, dropping the text `second` repeats from the end of `first`
+        (the sliding window overlap). Chunks that don't overlap are joined with a space.
+    """
+    probe = second[:min_overlap]
+    if len(probe) == min_overlap:
+        start = first.find(probe)
+        while start != -1:
+            if second.startswith(first[start:]):
+                return first + second[len(first) - start:]
+            start = first.find(probe, start + 1)
+    return f"{first} {second}"
+
+def _shingles(text: str, size: int = 3) -> Set[Tuple[str, ...]]:
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+class ContextAssembler:
+    """
+        Turns ranked search results into the context sent to the LLM:
+        1. chunks of the same source/page with consecutive indexes are merged back into contiguous spans;
+        2. spans whose word shingles are mostly contained in a more relevant span are dropped;
+        3. spans are packed in relevance order into a token budget (the last one may be truncated).
+        Every span keeps its source and page, so citations are unchanged.
+    """
+
+    def __init__(self, token_budget: int = 2000, dedup_threshold: float = 0.8, min_span_tokens: int = 64):
+        """
+            Args:
+                token_budget (int): Maximum estimated tokens of context (0 disables the limit)
+                dedup_threshold (float): Shingle containment above which a span counts as a near-duplicate
+                min_span_tokens (int): Smallest truncated span worth adding when the budget is almost spent
+        """
+        self.token_budget = token_budget
+        self.dedup_threshold = dedup_threshold
+        self.min_span_tokens = min_span_tokens
+
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def _spans(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Groups results by (source, page) and merges runs of consecutive chunks. Spans keep their best rank."""
+        groups: Dict[Tuple, List[Tuple[int, int, Dict]]] = {}
+        spans = []
+        for rank, result in enumerate(results):
+            metadata = result.get("metadata") or {}
+            match = CHUNK_ID_PATTERN.search(result.get("id") or "")
+            if not match or "source" not in metadata:
+                spans.append({"rank": rank, "ids": [result.get("id")], "content": result["content"], "metadata": metadata})
+                continue
+            key = (metadata["source"], metadata.get("page"))
+            groups.setdefault(key, []).append((int(match.group(2)), rank, result))
+
+        for members in groups.values():
+            members.sort(key=lambda member: member[0])
+            run = [members[0]]
+            for member in members[1:]:
+                if member[0] == run[-1][0]:
+                    continue  # same chunk twice
+                if member[0] == run[-1][0] + 1:
+                    run.append(member)
+                    continue
+                spans.append(self._merge_run(run))
+                run = [member]
+            spans.append(self._merge_run(run))
+
+        spans.sort(key=lambda span: span["rank"])
+        return spans
+
+    @staticmethod
+    def _merge_run(run: List[Tuple[int, int, Dict]]) -> Dict[str, Any]:
+        content = run[0][2]["content"]
+        for _, _, result in run[1:]:
+            content = merge_overlapping(content, result["content"])
+        metadata = run[0][2]["metadata"]
+        # Structured chunks can end on a later page: the merged span ends where its last chunk does
+        if run[-1][2]["metadata"].get("page_end"):
+            metadata = {**metadata, "page_end": max(result["metadata"].get("page_end") or 0 for _, _, result in run)}
+        return {
+            "rank": min(rank for _, rank, _ in run),
+            "ids": [result["id"] for _, _, result in run],
+            "content": content,
+            "metadata": metadata
+        }
+
+    def _is_duplicate(self, shingles: Set, kept: List[Set]) -> bool:
+        if not shingles:
+            return True
+        return any(len(shingles & other) / len(shingles) >= self.dedup_threshold for other in kept)
+
+    @staticmethod
+    def _truncate(text: str, tokens: int) -> str:
+        """Cuts text to roughly `tokens` tokens at a word boundary."""
+        limit = tokens * 4
+        if len(text) <= limit:
+            return text
+        cut = text.rfind(" ", 0, limit)
+        return text[: cut if cut > 0 else limit] + " ..."
+
+    def assemble(self, results: List[Dict[str, Any]], token_budget: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+            Returns context blocks ({"ids", "content", "metadata"}) in relevance order, within the token budget.
+        """
+        budget = self.token_budget if token_budget is None else token_budget
+        blocks = []
+        kept_shingles: List[Set] = []
+        used = 0
+
+        for span in self._spans(results):
+            shingles = _shingles(span["content"])
+            if self._is_duplicate(shingles, kept_shingles):
+                continue
+
+            tokens = estimate_tokens(span["content"])
+            content = span["content"]
+            if budget and used + tokens > budget:
+                remaining = budget - used
+                if remaining < self.min_span_tokens:
+                    break
+                content = self._truncate(content, remaining)
+                tokens = estimate_tokens(content)
+
+            blocks.append({"ids": span["ids"], "content": content, "metadata": span["metadata"]})
+            kept_shingles.append(shingles)
+            used += tokens
+
+        with self._lock:
+            self.calls += 1
+            self.input_tokens += sum(estimate_tokens(r["content"]) for r in results)
+            self.output_tokens += used
+        return blocks
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "token_budget": self.token_budget,
+            "calls": self.calls,
+            "mean_input_tokens": self.input_tokens / self.calls if self.calls else 0.0,
+            "mean_output_tokens": self.output_tokens / self.calls if self.calls else 0.0,
+            "token_reduction": 1 - self.output_tokens / self.input_tokens if self.input_tokens else 0.0
+        }
@@ -0,0 +1,268 @@
+import os
+import re
+import json
+import time
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from .chunking import TOKEN_PATTERN, count_tokens
+
+# Session IDs are chosen by the client and name the session's file when conversations are persisted
+SESSION_ID_PATTERN = re.compile(r"^[\w-]{1,128}$")
+WORD_PATTERN = re.compile(r"\w[\w-]*")
+# Openings of a follow-up that leans on the previous question: "and what about error 202?", "e o filtro?"
+FOLLOW_UP_PATTERN = re.compile(
+    r"^\s*(?:and|also|but|so|then|what about|how about|e|também|mas|então|e quanto|e sobre|e se)\b", re.IGNORECASE
+)
+# Words that carry no topic: a follow-up made only of them ("and how do I do that?") stays on the previous topic
+STOPWORDS = frozenset("""
+    a an the and or but so then also of to in on at for from with by about as is are was were be been it its this that
+    these those they them their there here what which who how when where why do does did can could should would will
+    i me my you your we our one please more again same other another explain tell mean better detail details step steps
+    o os as um uma uns umas e ou mas então também de do da dos das em no na nos nas num numa por pelo pela para com
+    sem sobre que qual quais quem como quando onde porque se é são foi era ser está estão isso isto esse essa este esta
+    ele ela eles elas dele dela nele nela lhe mesmo mesma outro outra eu me meu minha você seu sua nós mais ainda
+    quanto faço fazer devo posso pode explique explicar explica melhor detalhe detalhes passo passos significa
+""".split())
+
+def content_words(text: str) -> List[str]:
+    """Topic words of a text, lower-cased, in order and without repeats."""
+    words = [w.lower() for w in WORD_PATTERN.findall(text)]
+    return list(dict.fromkeys(w for w in words if w not in STOPWORDS))
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """First `max_tokens` tokens of a text (words and punctuation marks, see chunking.count_tokens)."""
+    spans = [match.span() for match in TOKEN_PATTERN.finditer(text)]
+    if len(spans) <= max_tokens:
+        return text
+    return text[: spans[max_tokens - 1][1]] + " [...]"
+
+class ConversationStore:
+    """
+        Server-side memory of chat sessions, so follow-up questions can be answered in context:
+        - the last `recent_turns` turns are kept verbatim (answers cut to `answer_tokens`); older ones are folded into
+          an extractive summary of at most `summary_tokens`, so the history added to a prompt stays bounded;
+        - follow-ups are rewritten into standalone search queries with the topic words of the previous question;
+        - the last retrieval of each session is kept, so a turn on the same topic reuses its chunks instead of searching.
+        Sessions live in a bounded LRU, expire after `ttl_seconds` idle, and are also written to `directory` when given
+        (one JSON file each), so they survive restarts and are shared by the worker processes. A session ID is scoped
+        by an optional namespace (the tenant), so two tenants using the same ID have two sessions.
+    """
+
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: float = 86400, directory: Optional[str] = None,
+                 recent_turns: int = 3, summary_tokens: int = 300, answer_tokens: int = 150,
+                 reuse_threshold: float = 0.95):
+        """
+            Args:
+                max_sessions (int): LRU capacity of the in-memory sessions
+                ttl_seconds (float): Idle time after which a session is forgotten, 0 disables expiration
+                directory (str): Where sessions are persisted, None keeps them in memory only
+                recent_turns (int): Turns kept verbatim in the history
+                summary_tokens (int): Size cap of the summary of the older turns
+                answer_tokens (int): Size cap of each answer kept in the history
+                reuse_threshold (float): Minimum cosine similarity between two turns' queries for the second one
+                    to reuse the chunks retrieved by the first, >= 1 disables the reuse of similar queries
+        """
+        self.max_sessions = max_sessions
+        self.ttl = ttl_seconds
+        self.directory = directory
+        self.recent_turns = recent_turns
+        self.summary_tokens = summary_tokens
+        self.answer_tokens = answer_tokens
+        self.reuse_threshold = reuse_threshold
+
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.rewrites = 0
+        self.reused_retrievals = 0
+        self.expired = 0
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._prune_files()
+
+    @staticmethod
+    def check_id(session_id: str):
+        if not SESSION_ID_PATTERN.match(session_id):
+            raise ValueError("session_id must be 1-128 letters, digits, '_' or '-'")
+
+    @staticmethod
+    def _key(session_id: str, namespace: Optional[str]) -> str:
+        # "." is neither in session IDs nor in tenant IDs
+        return session_id if namespace is None else f"{namespace}.{session_id}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _expired(self, updated: float) -> bool:
+        return self.ttl > 0 and time.time() - updated > self.ttl
+
+    def _prune_files(self):
+        """Deletes the persisted sessions that expired while the server was down."""
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".json") and self._expired(os.path.getmtime(path)):
+                os.remove(path)
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        """The persisted session, if another worker (or an earlier run) wrote a newer one than ours."""
+        cached = self._sessions.get(key)
+        if not self.directory:
+            return cached
+        try:
+            mtime = os.path.getmtime(self._path(key))
+        except FileNotFoundError:
+            return cached
+        if cached is not None and cached["mtime"] >= mtime:
+            return cached
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cached
+        # The retrieval is kept in memory only (it holds vectors), and is dropped with a stale copy
+        return {"namespace": None, **data, "retrieval": None, "mtime": mtime}
+
+    def get(self, session_id: str, namespace: Optional[str] = None) -> Dict[str, Any]:
+        """
+            The session's state ({"id", "namespace", "summary", "turns", "retrieval", "updated"}), a new empty one
+            for an unknown or expired ID. The returned dict is a snapshot: record turns with append().
+        """
+        self.check_id(session_id)
+        key = self._key(session_id, namespace)
+        with self._lock:
+            session = self._load(key)
+            if session is not None and self._expired(session["updated"]):
+                self.expired += 1
+                self._drop(key)
+                session = None
+            if session is None:
+                session = {"id": session_id, "namespace": namespace, "summary": [], "turns": [], "retrieval": None,
+                           "updated": time.time(), "mtime": 0.0}
+            self._sessions[key] = session
+            self._sessions.move_to_end(key)
+            self._evict()
+            return {**session, "turns": list(session["turns"]), "summary": list(session["summary"])}
+
+    def _evict(self):
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def _drop(self, key: str):
+        self._sessions.pop(key, None)
+        if self.directory and os.path.exists(self._path(key)):
+            os.remove(self._path(key))
+
+    def delete(self, session_id: str, namespace: Optional[str] = None) -> bool:
+        """Forgets a session; returns whether it existed."""
+        self.check_id(session_id)
+        key = self._key(session_id, namespace)
+        with self._lock:
+            existed = key in self._sessions or bool(self.directory and os.path.exists(self._path(key)))
+            self._drop(key)
+            return existed
+
+    def rewrite(self, query: str, session: Dict[str, Any]) -> str:
+        """
+            Standalone search query for a turn. A follow-up (it opens like one, or it is a short question
+            that names no topic of its own) gets the topic words of the previous question that it doesn't
+            already have; if it brings a number of its own (e.g. another error code), the previous question's
+            numbers are left out.
+        """
+        if not session["turns"]:
+            return query
+        previous = session["turns"][-1]["standalone"]
+        words = content_words(query)
+        if not FOLLOW_UP_PATTERN.match(query) and len(words) > 2:
+            return query
+
+        has_number = any(w.isdigit() for w in words)
+        context = [w for w in content_words(previous) if w not in words and not (has_number and w.isdigit())]
+        if not context:
+            return query
+        with self._lock:
+            self.rewrites += 1
+        return f"{query} {' '.join(context)}"
+
+    def reusable(self, query: str, session: Dict[str, Any], scope: Any, version: Any,
+                 vector: Optional[List[float]] = None) -> Optional[List[Dict]]:
+        """
+            The chunks retrieved for the session's previous turn, when this turn stays on its topic: same search
+            scope (top_k, options) and collection version, and either no topic words of its own or a query within
+            `reuse_threshold` cosine similarity of the previous one. None means a new search is needed.
+        """
+        retrieval = session["retrieval"]
+        if not retrieval or retrieval["scope"] != scope or retrieval["version"] != version:
+            return None
+        same_topic = not content_words(query)
+        if not same_topic and vector is not None and retrieval["vector"] is not None and self.reuse_threshold < 1:
+            same_topic = float(np.dot(self._unit(vector), retrieval["vector"])) >= self.reuse_threshold
+        if not same_topic:
+            return None
+        with self._lock:
+            self.reused_retrievals += 1
+        return retrieval["results"]
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def history(self, session: Dict[str, Any]) -> str:
+        """The conversation so far, as prompt text: the summary of the older turns, then the recent ones."""
+        parts = []
+        if session["summary"]:
+            parts.append("Earlier questions and answers:\n" + "\n".join(session["summary"]))
+        for turn in session["turns"]:
+            parts.append(f"User: {turn['query']}\nAssistant: {turn['answer']}")
+        return "\n\n".join(parts)
+
+    def append(self, session_id: str, query: str, standalone: str, answer: str, retrieval: Optional[Dict[str, Any]] = None,
+               namespace: Optional[str] = None):
+        """
+            Records a turn (and the retrieval it used: {"scope", "version", "vector", "results"}, reusable by the next turn).
+            Turns past `recent_turns` are folded into the summary, whose oldest lines go once it exceeds `summary_tokens`.
+        """
+        turn = {"query": query, "standalone": standalone, "answer": truncate_tokens(answer, self.answer_tokens)}
+        key = self._key(session_id, namespace)
+        with self._lock:
+            session = self._load(key) or {"id": session_id, "namespace": namespace, "summary": [], "turns": [], "retrieval": None,
+                                          "mtime": 0.0}
+            turns = session["turns"] + [turn]
+            summary = list(session["summary"])
+            while len(turns) > self.recent_turns:
+                old = turns.pop(0)
+                # Keeping the question and the gist of the answer (its first sentence)
+                gist = re.split(r"(?<=[.!?])\s", old["answer"], maxsplit=1)[0]
+                summary.append(f"- {old['standalone']} -> {truncate_tokens(gist, 40)}")
+            while summary and sum(count_tokens(line) for line in summary) > self.summary_tokens:
+                summary.pop(0)
+
+            if retrieval is not None and retrieval.get("vector") is not None:
+                retrieval = {**retrieval, "vector": self._unit(retrieval["vector"])}
+            session = {**session, "summary": summary, "turns": turns, "retrieval": retrieval, "updated": time.time()}
+            if self.directory:
+                session["mtime"] = self._write(key, session)
+            self._sessions[key] = session
+            self._sessions.move_to_end(key)
+            self._evict()
+
+    def _write(self, key: str, session: Dict[str, Any]) -> float:
+        path = self._path(key)
+        data = {field: session[field] for field in ("id", "namespace", "summary", "turns", "updated")}
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return os.path.getmtime(path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "persisted": self.directory is not None,
+            "rewrites": self.rewrites,
+            "reused_retrievals": self.reused_retrievals,
+            "expired": self.expired
+        }
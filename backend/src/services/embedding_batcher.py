@@ -0,0 +1,127 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from collections import Counter
+from typing import Callable, List, Dict, Any, Tuple
+
+class EmbeddingBatcher:
+    """
+        Coalesces concurrent single-text embedding requests into one encode() call.
+        Callers block on encode(); a background thread collects requests for up to `window_ms`
+        (or until `max_batch_size` is reached), encodes them together and resolves each future with its vector.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], List[List[float]]], window_ms: float = 2.0, max_batch_size: int = 32,
+                 timeout: float = 30.0):
+        """
+            Args:
+                encode_fn (Callable): Batch encoder, receives a list of texts and returns one vector per text
+                window_ms (float): How long to wait for more requests after the first one arrives
+                max_batch_size (int): Upper bound of texts per encode() call
+                timeout (float): Seconds encode() waits for its vector before raising TimeoutError
+        """
+        self.encode_fn = encode_fn
+        self.window = max(0.0, window_ms) / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self.timeout = timeout
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes: Counter = Counter()
+        self._closed = False
+
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def encode(self, text: str) -> List[float]:
+        """
+            Embeds a single text, sharing the encode() call with any concurrent requests.
+            Raises TimeoutError when the vector doesn't come within `timeout` seconds.
+        """
+        future: Future = Future()
+        # Checked and queued under the lock, so no request lands behind close()'s sentinel
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("EmbeddingBatcher is closed")
+            self._queue.put((text, future))
+        return future.result(timeout=self.timeout)
+
+    def _collect(self, first) -> Tuple[List, bool]:
+        """Gathers requests until the window expires or the batch is full. Also returns whether close() was called."""
+        batch = [first]
+        deadline = time.monotonic() + self.window
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                # Requests that queued up while the previous batch was encoding are taken without waiting
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+
+        return batch, False
+
+    def _run(self):
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is None:
+                break
+
+            batch, stop = self._collect(first)
+            texts = [text for text, _ in batch]
+            try:
+                vectors = self.encode_fn(texts)
+                for (_, future), vector in zip(batch, vectors):
+                    future.set_result(vector)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+            with self._lock:
+                self._batch_sizes[len(batch)] += 1
+        self._fail_pending()
+
+    def _fail_pending(self):
+        """Fails the requests still queued once the worker stopped, so no caller waits for a vector forever."""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None:
+                item[1].set_exception(RuntimeError("EmbeddingBatcher is closed"))
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch-size distribution since startup."""
+        with self._lock:
+            histogram = dict(sorted(self._batch_sizes.items()))
+        batches = sum(histogram.values())
+        queries = sum(size * count for size, count in histogram.items())
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_batch_size,
+            "batches": batches,
+            "queries": queries,
+            "mean_batch_size": queries / batches if batches else 0.0,
+            "batch_size_histogram": histogram
+        }
+
+    def close(self):
+        """
+            Stops the background thread once the requests queued before the call are served. Requests the worker
+            doesn't get to fail with RuntimeError.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._worker.join(timeout=5)
+        # A worker still busy after the timeout fails the rest itself when it stops
+        if not self._worker.is_alive():
+            self._fail_pending()
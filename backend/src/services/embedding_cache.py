@@ -0,0 +1,165 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+from .serving import WriteLock
+
+KEY_BYTES = 20  # sha1 digest
+CHECK_BYTES = 8  # blake2b of the key and the vector, stored after the key
+CACHE_FORMAT = 2
+
+class EmbeddingCache:
+    """
+        On-disk embedding cache keyed by (model name, text hash).
+        Vectors live in a memory-mapped float32 matrix of `capacity` rows; a parallel memory-mapped array holds the
+        key of each slot, so the hash index is rebuilt from disk on startup. When full, the least recently used
+        slots are evicted. Worker processes share the files but each picks its own free slots, so two of them may write
+        the same slot at once: every slot also stores a checksum of its key and vector, and a hit whose key or checksum
+        doesn't match on disk (slot reused or being written by another process) is a miss.
+    """
+
+    def __init__(self, directory: str, model_name: str, dim: int, max_bytes: int = 256 * 1024 * 1024):
+        """
+            Args:
+                directory (str): Root directory of the cache (one subdirectory per model)
+                model_name (str): Embedding model identifier, part of the cache key
+                dim (int): Embedding dimension
+                max_bytes (int): Size budget of the vector matrix, which sets the number of slots
+        """
+        self.model_name = model_name
+        self.dim = dim
+        self.capacity = max(1, max_bytes // (dim * 4))
+        self.path = os.path.join(directory, re.sub(r"[^\w.-]+", "_", model_name))
+        os.makedirs(self.path, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._clock = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._open()
+
+    def _open(self):
+        meta_path = os.path.join(self.path, "meta.json")
+        vectors_path = os.path.join(self.path, "vectors.f32")
+        keys_path = os.path.join(self.path, "keys.bin")
+
+        meta = {"dim": self.dim, "capacity": self.capacity, "format": CACHE_FORMAT}
+        # Processes opening the cache together must not both recreate it
+        with WriteLock(os.path.join(self.path, "open.lock")):
+            existing = None
+            if os.path.exists(meta_path):
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    existing = json.load(f)
+
+            # Layout changed (new dim, budget or format): starting from scratch with new files, swapped in,
+            # since other workers may still have the old ones mapped (truncating them would crash their reads)
+            if existing != meta or not os.path.exists(vectors_path) or not os.path.exists(keys_path):
+                for path, shape in ((vectors_path, (self.capacity, self.dim * 4)), (keys_path, (self.capacity, KEY_BYTES + CHECK_BYTES))):
+                    tmp_path = f"{path}.{os.getpid()}.tmp"
+                    np.memmap(tmp_path, dtype=np.uint8, mode="w+", shape=shape).flush()
+                    os.replace(tmp_path, path)
+                with open(meta_path, "w", encoding="utf-8") as f:
+                    json.dump(meta, f)
+            self.vectors = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+            # Raw digest bytes (a fixed-size bytes dtype would strip trailing NULs), then the slot's checksum
+            self.keys = np.memmap(keys_path, dtype=np.uint8, mode="r+", shape=(self.capacity, KEY_BYTES + CHECK_BYTES))
+
+        # Rebuilding the in-memory index from the keys on disk
+        used = self.keys[:, :KEY_BYTES].any(axis=1)
+        occupied = np.flatnonzero(used)
+        self._index: Dict[bytes, int] = {self.keys[slot, :KEY_BYTES].tobytes(): int(slot) for slot in occupied}
+        self._free: List[int] = np.flatnonzero(~used)[::-1].tolist()
+        self._last_used = np.zeros(self.capacity, dtype=np.int64)
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha1(f"{self.model_name}\0{text}".encode("utf-8")).digest()
+
+    @staticmethod
+    def _check(key: bytes, vector: np.ndarray) -> bytes:
+        return hashlib.blake2b(vector.tobytes(), digest_size=CHECK_BYTES, key=key).digest()
+
+    def lookup(self, texts: List[str]) -> Tuple[np.ndarray, List[int]]:
+        """
+            Returns a (len(texts), dim) matrix filled for cache hits, and the indexes of the texts that missed.
+        """
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        missing = []
+        with self._lock:
+            self._clock += 1
+            for i, text in enumerate(texts):
+                key = self._key(text)
+                slot = self._index.get(key)
+                vector = self._read(slot, key) if slot is not None else None
+                if vector is not None:
+                    out[i] = vector
+                    self._last_used[slot] = self._clock
+                else:
+                    if slot is not None:
+                        del self._index[key]
+                    missing.append(i)
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        return out, missing
+
+    def _read(self, slot: int, key: bytes) -> Optional[np.ndarray]:
+        """The vector of a slot if it still holds `key` and matches its checksum (copies, checked against each other)."""
+        entry = self.keys[slot].tobytes()
+        vector = np.array(self.vectors[slot])
+        if entry[:KEY_BYTES] == key and entry[KEY_BYTES:] == self._check(key, vector):
+            return vector
+        return None
+
+    def store(self, texts: List[str], vectors: np.ndarray):
+        """Adds vectors for the given texts, evicting least recently used slots when full."""
+        with self._lock:
+            self._clock += 1
+            new_keys = []
+            for text in texts:
+                key = self._key(text)
+                if key not in self._index:
+                    new_keys.append(key)
+            new_keys = list(dict.fromkeys(new_keys))[: self.capacity]
+            self._ensure_free(len(new_keys))
+
+            by_key = {self._key(text): vector for text, vector in zip(texts, vectors)}
+            for key in new_keys:
+                slot = self._free.pop()
+                # The checksum binds the key to this vector: a crash, or another process writing the same slot,
+                # can't pair the key with another vector
+                vector = np.asarray(by_key[key], dtype=np.float32)
+                self.vectors[slot] = vector
+                self.keys[slot] = np.frombuffer(key + self._check(key, vector), dtype=np.uint8)
+                self._index[key] = slot
+                self._last_used[slot] = self._clock
+
+    def _ensure_free(self, needed: int):
+        shortage = needed - len(self._free)
+        if shortage <= 0:
+            return
+        used = np.fromiter(self._index.values(), dtype=np.int64, count=len(self._index))
+        victims = used[np.argpartition(self._last_used[used], shortage - 1)[:shortage]]
+        for slot in victims.tolist():
+            self._index.pop(self.keys[slot, :KEY_BYTES].tobytes(), None)
+            self.keys[slot] = 0
+            self._free.append(slot)
+
+    def flush(self):
+        with self._lock:
+            self.vectors.flush()
+            self.keys.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "entries": len(self._index),
+            "capacity": self.capacity,
+            "size_bytes": self.capacity * self.dim * 4,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
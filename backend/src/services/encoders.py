@@ -0,0 +1,135 @@
+import os
+import logging
+import numpy as np
+from typing import List, Optional
+
+logger = logging.getLogger("Encoders")
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+HF_REPO = "sentence-transformers/all-MiniLM-L6-v2"
+# Quantized exports published in the model repository; the avx2 build runs on any x86-64 CPU we deploy on
+ONNX_FILES = {
+    "onnx": "onnx/model.onnx",
+    "onnx-int8": "onnx/model_quint8_avx2.onnx",
+}
+BACKENDS = ("torch",) + tuple(ONNX_FILES)
+
+class Encoder:
+    """
+        Interface of the embedding backends used by VectorDB.
+        `name` identifies the model + backend (it is part of the embedding cache key),
+        `encode` returns a float32 (len(texts), dim) matrix of L2-normalized vectors.
+    """
+    name: str
+    dim: int
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+class SentenceTransformerEncoder(Encoder):
+    """
+        PyTorch backend through sentence-transformers (the original VectorDB behavior).
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL):
+        from sentence_transformers import SentenceTransformer
+
+        try:
+            self.model = SentenceTransformer(model_name, device='cpu')
+        except Exception as e:
+            logger.warning(f"Network error({e}). Loading model from LOCAL CACHE only.")
+            self.model = SentenceTransformer(model_name, device='cpu', local_files_only=True)
+        self.name = model_name
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        embeddings = self.model.encode(texts)
+        if len(embeddings.shape) == 1:
+            embeddings = embeddings.reshape(1, -1)
+        return embeddings.astype(np.float32, copy=False)
+
+class OnnxEncoder(Encoder):
+    """
+        ONNX Runtime backend: HF tokenizer + exported transformer + mean pooling + L2 normalization,
+        which is exactly the all-MiniLM-L6-v2 sentence-transformers pipeline without PyTorch.
+        Pass an int8-quantized export as `model_file` for the quantized variant.
+    """
+
+    def __init__(self, repo_id: str = HF_REPO, model_file: str = ONNX_FILES["onnx"], max_length: int = 256,
+                 batch_size: int = 64, threads: Optional[int] = None):
+        """
+            Args:
+                repo_id (str): Hugging Face repository holding tokenizer.json and the ONNX exports
+                model_file (str): ONNX file inside the repository
+                max_length (int): Token truncation length (256 matches the sentence-transformers config)
+                batch_size (int): Texts per session.run() call
+                threads (int): ONNX Runtime intra-op threads (0/None lets ORT decide)
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+        from huggingface_hub import hf_hub_download
+
+        def download(filename: str) -> str:
+            try:
+                return hf_hub_download(repo_id, filename)
+            except Exception as e:
+                logger.warning(f"Network error({e}). Loading {filename} from LOCAL CACHE only.")
+                return hf_hub_download(repo_id, filename, local_files_only=True)
+
+        self.tokenizer = Tokenizer.from_file(download("tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads or 0
+        self.session = ort.InferenceSession(download(model_file), options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.batch_size = batch_size
+        self.name = f"{repo_id.split('/')[-1]}:{os.path.splitext(os.path.basename(model_file))[0]}"
+        self.dim = self.session.get_outputs()[0].shape[-1]
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real tokens, then L2 normalization
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+
+        # Sorting by length keeps padding (wasted compute) low inside each batch
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(texts), self.batch_size):
+            idx = order[start : start + self.batch_size]
+            out[idx] = self._encode_batch([texts[i] for i in idx])
+        return out
+
+def create_encoder(backend: Optional[str] = None, model_name: Optional[str] = None) -> Encoder:
+    """
+        Builds the configured encoder.
+        backend: "torch" (default), "onnx" or "onnx-int8" (env EMBEDDING_BACKEND).
+        The ONNX file can be overridden with EMBEDDING_ONNX_FILE (e.g. an avx512_vnni quantized export).
+    """
+    backend = backend or os.getenv("EMBEDDING_BACKEND", "torch")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+
+    if backend == "torch":
+        return SentenceTransformerEncoder(model_name or DEFAULT_MODEL)
+
+    model_file = os.getenv("EMBEDDING_ONNX_FILE") or ONNX_FILES[backend]
+    repo_id = model_name if model_name and "/" in model_name else HF_REPO
+    return OnnxEncoder(repo_id=repo_id, model_file=model_file, threads=int(os.getenv("EMBEDDING_THREADS", "0")))
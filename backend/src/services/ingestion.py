@@ -1,46 +1,98 @@
 import pandas as pd
 import pypdf
 import re
-from typing import List, Dict, Optional
+import hashlib
+from typing import List, Dict, Optional, Tuple
 from pathlib import Path
+from .chunking import HEADING_PATTERN, StructuredChunker, is_heading
+from . import metrics
 
+# Bumped whenever extracted metadata changes, so re-syncs re-upsert unchanged text with the new fields
+# (meta2: sections continue across extraction tasks)
+METADATA_SCHEMA = "meta2"
+
+CHUNK_STRATEGIES = ("structured", "window")
+
+# "PRODUTO X-1000", "Product: NovaLink 5", "Modelo PG-12"
+PRODUCT_PATTERN = re.compile(r"(?i:\b(?:produto|product|modelo|model))\s*[:\-–]?\s*([A-Z0-9][\w\-./]*(?: [\w\-./]*\d[\w\-./]*)?)")
+# "Versão 2.1", "Version: 3.0.4", "Rev. 5", "v1.2"
+VERSION_PATTERN = re.compile(r"(?i:\b(?:vers[aã]o|version|rev(?:is[aã]o|ision)?\.?|v))\s*[:\-]?\s*(\d+(?:\.\d+){0,3}[a-z]?)\b")
 class PDFProcessor:
     """
         Handles the ingestion and processing of PDF documentos, using Pandas for data structuring and analysis
     """
 
-    def __init__(self, chunk_size: int = 1000, overlap: int = 200):
+    def __init__(self, chunk_size: int = 1000, overlap: int = 200, strategy: str = "structured",
+                 chunk_tokens: int = 160, overlap_tokens: int = 32):
         """
             Args:
-                chunk_size (int): Maximum number of characters per chunk of text
-                overlap (int): NUmber of characters to overlap between chunks to maintain context
+                chunk_size (int): Maximum number of characters per chunk of text ("window" strategy)
+                overlap (int): NUmber of characters to overlap between chunks to maintain context ("window" strategy)
+                strategy (str): "structured" (StructuredChunker, sized in tokens) or "window" (character sliding window)
+                chunk_tokens (int): Maximum number of tokens per chunk ("structured" strategy)
+                overlap_tokens (int): Tokens repeated between consecutive chunks ("structured" strategy)
         """
+        if strategy not in CHUNK_STRATEGIES:
+            raise ValueError(f"Unknown chunking strategy '{strategy}', expected one of {CHUNK_STRATEGIES}")
         self.chunk_size = chunk_size
         self.overlap = overlap
+        self.strategy = strategy
+        self.chunker = StructuredChunker(chunk_tokens, overlap_tokens) if strategy == "structured" else None
 
-    def load_pdf(self, file_path: str) -> List[Dict]:
-        """Reads a PDF file and extracts text page by page"""
+    def load_pdf(self, file_path: str, start_page: int = 0, end_page: Optional[int] = None) -> List[Dict]:
+        """
+            Reads a PDF file and extracts text page by page.
+            `start_page`/`end_page` (0-based, end exclusive) restrict extraction to a page range.
+        """
         path = Path(file_path)
         if not path.exists():
             raise FileNotFoundError(f"File not found: {file_path}")
 
-        extracted_data = []
-
         try:
-            reader = pypdf.PdfReader(file_path)
-            for i, page in enumerate(reader.pages):
-                text = page.extract_text()
-                if text:
-                    extracted_data.append({
-                        "page_number": i + 1,
-                        "content": text,
-                        "source": path.name
-                    })
+            return [page for page in self._read_pages(path, start_page, end_page) if page['content']]
         except Exception as e:
             print(f"Error reading PDF: {e}")
             return []
 
-        return extracted_data
+    def _read_pages(self, path: Path, start_page: int = 0, end_page: Optional[int] = None,
+                    source: Optional[str] = None) -> List[Dict]:
+        """
+            Extracts every page of the range, including empty ones. Errors are raised to the caller.
+            `source` names the pages (and their chunk IDs), the file name by default.
+        """
+        with metrics.stage("pdf_read"):
+            reader = pypdf.PdfReader(str(path))
+            end_page = len(reader.pages) if end_page is None else min(end_page, len(reader.pages))
+            return [
+                {
+                    "page_number": i + 1,
+                    "content": reader.pages[i].extract_text() or "",
+                    "source": source or path.name
+                }
+                for i in range(start_page, end_page)
+            ]
+
+    @staticmethod
+    def page_count(file_path: str) -> int:
+        """Number of pages of a PDF, without extracting any text"""
+        return len(pypdf.PdfReader(file_path).pages)
+
+    @staticmethod
+    def document_metadata(file_path: str, sample_pages: int = 2) -> Dict[str, Optional[str]]:
+        """
+            Document-level metadata: product and manual version, looked up in the PDF title
+            and the first pages (cover / header). Missing fields are None.
+        """
+        reader = pypdf.PdfReader(file_path)
+        title = getattr(reader.metadata, "title", None) or ""
+        text = "\n".join([title] + [reader.pages[i].extract_text() or "" for i in range(min(sample_pages, len(reader.pages)))])
+
+        product = PRODUCT_PATTERN.search(text)
+        version = VERSION_PATTERN.search(text)
+        return {
+            "product": product.group(1).strip() if product else None,
+            "version": version.group(1) if version else None
+        }
 
     def _clean_text(self, text: str) -> str:
         """
@@ -93,6 +145,68 @@ class PDFProcessor:
 
         return chunks
 
+    def _headings(self, content: str, cleaned: str) -> List[Tuple[int, str]]:
+        """Section headings of a raw page as (offset in the cleaned text, title)."""
+        headings = []
+        offset = 0
+        for line in content.splitlines():
+            match = HEADING_PATTERN.match(line)
+            if not match or not is_heading(match.group(1)):
+                continue
+            position = cleaned.find(self._clean_text(line), offset)
+            if position != -1:
+                headings.append((position, self._clean_text(match.group(1))))
+                offset = position
+        return headings
+
+    def chunk_page(self, page: Dict, section: Optional[str] = None) -> List[Dict]:
+        """
+            Cleans and chunks one page record from load_pdf() into chunk records, with the "window" strategy
+            (chunk_pages() applies the configured one).
+            Each chunk gets the section heading it falls under; `section` is the one still open
+            from the previous page.
+        """
+        with metrics.stage("chunk"):
+            cleaned = self._clean_text(page['content'])
+            chunks = self._create_chunks(cleaned)
+            headings = self._headings(page['content'], cleaned)
+
+        records = []
+        position = 0
+        for chunk_id, chunk_text in enumerate(chunks):
+            position = max(0, cleaned.find(chunk_text, position))
+            # A heading in the first half of the chunk names it, later ones belong to the next chunks
+            midpoint = position + len(chunk_text) // 2
+            chunk_section = section
+            for offset, title in headings:
+                if offset > midpoint:
+                    break
+                chunk_section = title
+            records.append({
+                "id": f"{page['source']}_pg{page['page_number']}_{chunk_id}",
+                "source": page['source'],
+                "page": page['page_number'],
+                "section": chunk_section,
+                "text": chunk_text,
+                "char_count": len(chunk_text)
+            })
+            position += 1
+        return records
+
+    def chunk_pages(self, pages: List[Dict]) -> List[List[Dict]]:
+        """Chunks consecutive pages, carrying the open section heading from one page to the next."""
+        if self.chunker:
+            with metrics.stage("chunk"):
+                return self.chunker.chunk_pages(pages)
+        section = None
+        chunked = []
+        for page in pages:
+            chunks = self.chunk_page(page, section) if page['content'] else []
+            if chunks:
+                section = chunks[-1]["section"]
+            chunked.append(chunks)
+        return chunked
+
     def process(self, file_path: str) -> pd.DataFrame:
         """
             Orchestrates the pipeline: Load -> Clean -> Chunk -> DataFrame
@@ -102,29 +216,40 @@ class PDFProcessor:
         if not raw_pages:
             return pd.DataFrame()
 
-        # Converting to DataFrame
-        df_pages = pd.DataFrame(raw_pages)
+        # Generating chunks: transforming each page into multiple rows (chunks)
+        document = self.document_metadata(file_path)
+        chunk_rows = [{**chunk, **document} for chunks in self.chunk_pages(raw_pages) for chunk in chunks]
 
-        # Cleaning text using vectorized string operations
-        df_pages['clean_content'] = df_pages['content'].apply(self._clean_text)
+        return pd.DataFrame(chunk_rows)
 
-        # Generating chunks: transforming each row (page) into multiple rows (chunks)
-        chunk_rows = []
-
-        for _, row in df_pages.iterrows():
-            chunks = self._create_chunks(row['clean_content'])
-            for chunk_id, chunk_text in enumerate(chunks):
-                chunk_rows.append({
-                    "id": f"{row['source']}_pg{row['page_number']}_{chunk_id}",
-                    "source": row['source'],
-                    "page": row['page_number'],
-                    "text": chunk_text,
-                    "char_count": len(chunk_text)
-                })
-
-        df_chunks = pd.DataFrame(chunk_rows)
-
-        return df_chunks
+def extract_page_range(file_path: str, start_page: int, end_page: int, chunk_size: int, overlap: int,
+                       strategy: str = "structured", chunk_tokens: int = 160, overlap_tokens: int = 32,
+                       source: Optional[str] = None) -> List[Dict]:
+    """
+        Process-pool task: extracts and chunks pages [start_page, end_page) of one PDF.
+        Returns one record per page (empty pages included) with its content hash and chunks,
+        so large PDFs can be split across workers. Read errors propagate to the caller.
+        `source` is the file's key in the library (see IngestionPipeline), its name by default.
+        Chunks before the first heading of the range have section None: the caller fills in the section
+        left open by the previous range.
+    """
+    processor = PDFProcessor(chunk_size=chunk_size, overlap=overlap, strategy=strategy,
+                             chunk_tokens=chunk_tokens, overlap_tokens=overlap_tokens)
+    # Structured chunks can continue onto the next page: reading one page on each side of the range,
+    # so the chunks don't depend on how the file was split into tasks
+    context = 1 if strategy == "structured" else 0
+    first_page = max(0, start_page - context)
+    pages = processor._read_pages(Path(file_path), first_page, end_page + context, source)
+    return [
+        {
+            "source": page['source'],
+            "page": page['page_number'],
+            "hash": hashlib.sha1(page['content'].encode("utf-8")).hexdigest(),
+            "chunks": chunks
+        }
+        for page, chunks in zip(pages, processor.chunk_pages(pages))
+        if start_page < page['page_number'] <= end_page
+    ]
 
 # Manual testing
 if __name__ == "__main__":
@@ -0,0 +1,400 @@
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import logging
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Deque, Dict, Iterator, List, Optional, Tuple
+from .ingestion_manifest import IngestionManifest
+from .tenants import check_tenant
+
+logger = logging.getLogger("IngestionJobs")
+logger.setLevel(logging.INFO)
+
+# Job states; the last three are final
+JOB_STATES = ("queued", "running", "completed", "failed", "interrupted")
+JOB_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+class JobQueueFull(Exception):
+    """Raised when the ingestion queue is at capacity (the API answers 429)."""
+
+class LoadGovernor:
+    """
+        Gives chat traffic priority over background ingestion running in the same process:
+        - before each embedding batch, ingestion waits while `pause_threshold` or more chat requests
+          are in flight (for at most `max_pause` seconds, so it still progresses under constant load);
+        - after each batch, it sleeps so that embedding takes at most `cpu_share` of the wall time.
+        The share is split evenly between the tenants ingesting (see ingestion_job()), then between the jobs of each
+        tenant, so a tenant running several jobs doesn't take the shared encoder from another one.
+    """
+
+    def __init__(self, cpu_share: float = 0.5, pause_threshold: int = 4, max_pause: float = 10.0):
+        """
+            Args:
+                cpu_share (float): Fraction of the time ingestion may spend embedding (1 disables the cap)
+                pause_threshold (int): In-flight chat requests that pause ingestion (0 disables pausing)
+                max_pause (float): Longest wait before one batch runs anyway
+        """
+        self.cpu_share = min(max(cpu_share, 0.05), 1.0)
+        self.pause_threshold = pause_threshold
+        self.max_pause = max_pause
+
+        self._cond = threading.Condition()
+        self.active_chats = 0
+        # Ingestion jobs running per tenant (None: the default collection)
+        self._jobs: Dict[Optional[str], int] = {}
+        self.batches = 0
+        self.paused_seconds = 0.0
+        self.throttled_seconds = 0.0
+
+    @contextmanager
+    def chat_request(self):
+        """Wraps the handling of one chat request."""
+        with self._cond:
+            self.active_chats += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.active_chats -= 1
+                self._cond.notify_all()
+
+    @contextmanager
+    def ingestion_job(self, tenant: Optional[str] = None) -> Iterator["JobPacer"]:
+        """Wraps one running ingestion job of a tenant, yielding the governor its pipeline paces its batches with."""
+        with self._cond:
+            self._jobs[tenant] = self._jobs.get(tenant, 0) + 1
+        try:
+            yield JobPacer(self, tenant)
+        finally:
+            with self._cond:
+                self._jobs[tenant] -= 1
+                if not self._jobs[tenant]:
+                    del self._jobs[tenant]
+
+    def _job_share(self, tenant: Optional[str]) -> float:
+        """Fraction of the time one job of `tenant` may spend embedding (called with the lock held)."""
+        jobs = self._jobs.get(tenant, 0)
+        if self.cpu_share >= 1.0 or not jobs:
+            return self.cpu_share
+        return self.cpu_share / len(self._jobs) / jobs
+
+    @contextmanager
+    def ingestion_batch(self, tenant: Optional[str] = None):
+        """Wraps one ingestion embedding batch: waits out chat bursts before it, yields the CPU after it."""
+        wait_start = time.monotonic()
+        deadline = wait_start + self.max_pause
+        with self._cond:
+            while self.pause_threshold and self.active_chats >= self.pause_threshold:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+        paused = time.monotonic() - wait_start
+
+        batch_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            busy = time.perf_counter() - batch_start
+            with self._cond:
+                share = self._job_share(tenant)
+            idle = busy * (1 - share) / share
+            if idle:
+                time.sleep(idle)
+            with self._cond:
+                self.batches += 1
+                self.paused_seconds += paused
+                self.throttled_seconds += idle
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            jobs = {tenant or "(default)": count for tenant, count in self._jobs.items()}
+        return {
+            "active_chats": self.active_chats,
+            "cpu_share": self.cpu_share,
+            "jobs_by_tenant": jobs,
+            "batches": self.batches,
+            "paused_seconds": self.paused_seconds,
+            "throttled_seconds": self.throttled_seconds
+        }
+
+class JobPacer:
+    """The LoadGovernor as seen by the pipeline of one job: paces its batches within its tenant's share."""
+
+    def __init__(self, governor: LoadGovernor, tenant: Optional[str]):
+        self.governor = governor
+        self.tenant = tenant
+
+    def ingestion_batch(self):
+        return self.governor.ingestion_batch(self.tenant)
+
+class IngestionJobManager:
+    """
+        Background ingestion for the API: jobs (uploaded PDFs or a server directory) are queued onto a bounded
+        pool and run through the IngestionPipeline, with the collection's manifest (incremental re-syncs).
+        Job records are persisted as JSON, so any worker process can report their progress.
+        A job targets a tenant's collection (or the default one): each tenant may have `max_tenant_jobs` jobs queued
+        or running, and the pool takes the tenants' jobs in turn, so one tenant's bulk upload doesn't hold back the others.
+    """
+
+    def __init__(self, vector_db, jobs_dir: str, max_workers: int = 1, max_queued: int = 8,
+                 allowed_dirs: Optional[List[str]] = None, max_upload_bytes: int = 100 * 1024 * 1024,
+                 governor: Optional[LoadGovernor] = None, pipeline_options: Optional[Dict[str, Any]] = None,
+                 tenants=None, max_tenant_jobs: int = 4):
+        """
+            Args:
+                vector_db (VectorDB): Destination collection of the jobs without a tenant (shared with the chat service)
+                jobs_dir (str): Directory of the job records and of the uploads waiting to be ingested
+                max_workers (int): Jobs running at the same time
+                max_queued (int): Jobs waiting or running before new ones are refused
+                allowed_dirs (list): Server directories that can be ingested by path (none: only uploads)
+                max_upload_bytes (int): Size limit of each uploaded file
+                governor (LoadGovernor): Chat-priority pacing of the embedding batches
+                pipeline_options (dict): IngestionPipeline arguments (workers, embed_batch_size...)
+                tenants (TenantRegistry): Opens the tenants' collections (None: jobs can't name a tenant)
+                max_tenant_jobs (int): Jobs waiting or running per tenant before its new ones are refused, 0 disables it
+        """
+        self.vector_db = vector_db
+        self.jobs_dir = jobs_dir
+        self.uploads_dir = os.path.join(jobs_dir, "uploads")
+        os.makedirs(self.uploads_dir, exist_ok=True)
+        self.max_queued = max_queued
+        self.allowed_dirs = [os.path.realpath(d) for d in (allowed_dirs or [])]
+        self.max_upload_bytes = max_upload_bytes
+        self.governor = governor
+        self.pipeline_options = pipeline_options or {}
+        self.tenants = tenants
+        self.max_tenant_jobs = max_tenant_jobs
+
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingestion-job")
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._pending = 0
+        # Jobs waiting or running per tenant, the waiting ones per tenant, and when each tenant last had a job started
+        self._tenant_pending: Dict[Optional[str], int] = {}
+        self._waiting: "OrderedDict[Optional[str], Deque[Dict[str, Any]]]" = OrderedDict()
+        self._last_started: Dict[Optional[str], float] = {}
+        self._load_jobs()
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _load_jobs(self):
+        """Reloads past job records; jobs cut short by a restart are marked interrupted."""
+        for name in os.listdir(self.jobs_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.jobs_dir, name), "r", encoding="utf-8") as f:
+                    job = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if job["status"] in ("queued", "running") and not self._alive(job.get("pid")):
+                job["status"] = "interrupted"
+                self._save(job)
+            self.jobs[job["id"]] = job
+
+    @staticmethod
+    def _alive(pid: Optional[int]) -> bool:
+        """Whether the process that owns a job is still running (other workers keep theirs going)."""
+        if not pid or pid == os.getpid():
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _save(self, job: Dict[str, Any]):
+        """Atomically writes a job record."""
+        path = self._job_path(job["id"])
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        os.replace(tmp_path, path)
+
+    def _new_job(self, kind: str, target: str, files: List[str], prune: bool, tenant: Optional[str]) -> Dict[str, Any]:
+        if tenant is not None:
+            check_tenant(tenant)
+            if self.tenants is None:
+                raise ValueError("Tenants are not available for ingestion")
+        with self._lock:
+            if self._pending >= self.max_queued:
+                raise JobQueueFull(f"Ingestion queue is full ({self.max_queued} jobs)")
+            if self.max_tenant_jobs and self._tenant_pending.get(tenant, 0) >= self.max_tenant_jobs:
+                raise JobQueueFull(f"Tenant '{tenant or 'default'}' already has {self.max_tenant_jobs} ingestion jobs queued or running")
+            self._pending += 1
+            self._tenant_pending[tenant] = self._tenant_pending.get(tenant, 0) + 1
+        job = {
+            "id": uuid.uuid4().hex,
+            "pid": os.getpid(),
+            "tenant": tenant,
+            "kind": kind,
+            "target": target,
+            "files": files,
+            "prune": prune,
+            "status": "queued",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "progress": {},
+            "error": None
+        }
+        self.jobs[job["id"]] = job
+        return job
+
+    def submit_upload(self, uploads: List[Tuple[str, BinaryIO]], tenant: Optional[str] = None) -> Dict[str, Any]:
+        """Saves uploaded PDFs ((filename, file object) pairs) and queues their ingestion into the tenant's collection."""
+        names = [os.path.basename(name or "") for name, _ in uploads]
+        if not names or any(not name.lower().endswith(".pdf") for name in names):
+            raise ValueError("Only .pdf files can be ingested")
+        if len(set(names)) != len(names):
+            raise ValueError("Uploaded file names must be unique")
+
+        job = self._new_job("upload", "", names, prune=False, tenant=tenant)
+        directory = os.path.join(self.uploads_dir, job["id"])
+        job["target"] = directory
+        try:
+            os.makedirs(directory)
+            for name, (_, source) in zip(names, uploads):
+                self._copy_upload(source, os.path.join(directory, name))
+        except Exception:
+            shutil.rmtree(directory, ignore_errors=True)
+            self.jobs.pop(job["id"], None)
+            self._finished(job)
+            raise
+        return self._enqueue(job)
+
+    def _copy_upload(self, source: BinaryIO, path: str, block_size: int = 1 << 20):
+        written = 0
+        with open(path, "wb") as out:
+            for block in iter(lambda: source.read(block_size), b""):
+                written += len(block)
+                if written > self.max_upload_bytes:
+                    raise ValueError(f"{os.path.basename(path)} is larger than {self.max_upload_bytes // (1024 * 1024)}MB")
+                out.write(block)
+
+    def submit_directory(self, path: str, prune: bool = False, tenant: Optional[str] = None) -> Dict[str, Any]:
+        """
+            Queues the ingestion of a server directory into the tenant's collection.
+            The directory must be inside one of the allowed directories.
+        """
+        directory = os.path.realpath(path)
+        if not any(directory == root or directory.startswith(root + os.sep) for root in self.allowed_dirs):
+            raise ValueError("Directory ingestion is not allowed for this path (see INGEST_ALLOWED_DIRS)")
+        if not os.path.isdir(directory):
+            raise ValueError(f"Directory not found: {path}")
+        job = self._new_job("directory", directory, [], prune, tenant)
+        return self._enqueue(job)
+
+    def _enqueue(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        self._save(job)
+        with self._lock:
+            self._waiting.setdefault(job["tenant"], deque()).append(job)
+        # Each pool task runs the next job in tenant order, not necessarily this one
+        self.pool.submit(self._run_next)
+        logger.info(f"Queued ingestion job {job['id']} ({job['kind']}: {job['target']}, tenant {job['tenant'] or 'default'})")
+        return job
+
+    def _run_next(self):
+        """Runs the oldest waiting job of the tenant that least recently had a job started."""
+        with self._lock:
+            tenant = min(self._waiting, key=lambda t: self._last_started.get(t, 0.0))
+            job = self._waiting[tenant].popleft()
+            if not self._waiting[tenant]:
+                del self._waiting[tenant]
+            self._last_started[tenant] = time.monotonic()
+        self._run(job)
+
+    def _finished(self, job: Dict[str, Any]):
+        with self._lock:
+            self._pending -= 1
+            self._tenant_pending[job["tenant"]] -= 1
+            if not self._tenant_pending[job["tenant"]]:
+                del self._tenant_pending[job["tenant"]]
+                self._last_started.pop(job["tenant"], None)
+
+    @contextmanager
+    def _collection(self, tenant: Optional[str]):
+        """The VectorDB a job writes to: the tenant's (created on first use, kept open during the job) or the default one."""
+        if tenant is None:
+            yield self.vector_db
+            return
+        with self.tenants.use(tenant, create=True) as index:
+            yield index.vector_db
+
+    @contextmanager
+    def _pacer(self, tenant: Optional[str]):
+        """The governor of a job's pipeline, sharing the ingestion CPU fairly between tenants (None without a governor)."""
+        if self.governor is None:
+            yield None
+            return
+        with self.governor.ingestion_job(tenant) as pacer:
+            yield pacer
+
+    def _run(self, job: Dict[str, Any]):
+        job.update({"status": "running", "started_at": time.time()})
+        self._save(job)
+        last_save = [time.monotonic()]
+
+        def on_progress(snapshot: Dict):
+            job["progress"] = snapshot
+            # Progress is frequent: persisting it at most once per second for the other workers
+            if time.monotonic() - last_save[0] > 1.0:
+                self._save(job)
+                last_save[0] = time.monotonic()
+
+        try:
+            # Imported on first use: serving-only processes never load pypdf/pandas
+            from .ingestion_pipeline import IngestionPipeline
+
+            with self._collection(job["tenant"]) as vector_db, self._pacer(job["tenant"]) as governor:
+                manifest = IngestionManifest.for_collection(vector_db.data_dir, vector_db.collection_name)
+                pipeline = IngestionPipeline(vector_db, manifest=manifest, governor=governor, **self.pipeline_options)
+                result = pipeline.run(job["target"], prune=job["prune"], on_progress=on_progress, cancel=self._cancel)
+            job.update({"progress": result, "status": "interrupted" if result["cancelled"] else "completed"})
+        except Exception as e:
+            logger.error(f"Ingestion job {job['id']} failed: {e}")
+            job.update({"status": "failed", "error": str(e)})
+        finally:
+            job["finished_at"] = time.time()
+            self._save(job)
+            self._finished(job)
+            # Uploads are only needed until their chunks are in the index
+            if job["kind"] == "upload" and job["status"] == "completed":
+                shutil.rmtree(job["target"], ignore_errors=True)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """A job record; jobs queued by other worker processes are read from disk."""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return dict(job)
+        if not JOB_ID_PATTERN.fullmatch(job_id):
+            return None
+        try:
+            with open(self._job_path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        counts = {state: 0 for state in JOB_STATES}
+        for job in list(self.jobs.values()):
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        with self._lock:
+            tenants = {tenant or "(default)": count for tenant, count in self._tenant_pending.items()}
+        return {"jobs": counts, "pending_by_tenant": tenants, "governor": self.governor.stats() if self.governor else None}
+
+    def close(self):
+        """Stops the running jobs after their current batch and drops the queued ones."""
+        self._cancel.set()
+        self.pool.shutdown(wait=True, cancel_futures=True)
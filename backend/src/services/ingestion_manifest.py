@@ -0,0 +1,134 @@
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+class IngestionManifest:
+    """
+        Persistent record of what has been ingested, used for incremental re-syncs.
+        Layout:
+            {"files": {source: {"path", "file_hash", "chunking", "pages": {page: {"hash", "chunks": {chunk_id: chunk_hash}}}}}}
+        A file is only marked as ingested (file_hash stored) once all of its pages were upserted.
+        `source` is the file's path relative to the ingestion root (IngestionPipeline.source_key), so same-named
+        files in different subfolders have their own entries.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.data: Dict = {"files": {}}
+        self.reload()
+
+    def reload(self):
+        """
+            Re-reads the manifest from disk. Another writer (ingestion job, worker process or CLI) may have saved it
+            since it was loaded: a run reloads it once it holds the collection's write lock, so it never saves over
+            the entries of the previous one.
+        """
+        with self._lock:
+            self.data = {"files": {}}
+            if self.path.exists():
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.data = json.load(f)
+
+    @staticmethod
+    def file_hash(file_path: str, block_size: int = 1 << 20) -> str:
+        """SHA-256 of a file, read in blocks."""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    @property
+    def files(self) -> Dict[str, Dict]:
+        return self.data["files"]
+
+    def is_unchanged(self, source: str, file_hash: str, chunking: str) -> bool:
+        """True if the file was fully ingested with the same content and chunking parameters."""
+        entry = self.files.get(source)
+        return bool(entry) and entry.get("file_hash") == file_hash and entry.get("chunking") == chunking
+
+    def begin_file(self, source: str, path: str, chunking: str, page_count: int) -> List[str]:
+        """
+            Marks a file as being (re)ingested and forgets pages past its new length.
+            With different chunking parameters every chunk is re-upserted, even if its text is unchanged.
+            Returns the chunk IDs of those vanished pages, which must be deleted.
+        """
+        with self._lock:
+            entry = self.files.setdefault(source, {"pages": {}})
+            if entry.get("chunking") not in (None, chunking):
+                for page in entry["pages"].values():
+                    page["chunks"] = {chunk_id: "" for chunk_id in page["chunks"]}
+            entry.update({"path": path, "file_hash": None, "chunking": chunking})
+            stale_ids = []
+            for page in [p for p in entry["pages"] if int(p) > page_count]:
+                stale_ids.extend(entry["pages"].pop(page)["chunks"].keys())
+            return stale_ids
+
+    def diff_page(self, source: str, page: int, chunks: List[Dict]) -> Tuple[List[Dict], List[str], Dict[str, str]]:
+        """
+            Compares freshly extracted chunks of a page against the manifest.
+            Returns (chunks to upsert, chunk IDs to delete, new {chunk_id: hash} map of the page).
+        """
+        new_hashes = {c["id"]: self.text_hash(c["text"]) for c in chunks}
+        old_hashes = self.files.get(source, {}).get("pages", {}).get(str(page), {}).get("chunks", {})
+
+        to_upsert = [c for c in chunks if old_hashes.get(c["id"]) != new_hashes[c["id"]]]
+        to_delete = [chunk_id for chunk_id in old_hashes if chunk_id not in new_hashes]
+        return to_upsert, to_delete, new_hashes
+
+    def set_page(self, source: str, page: int, page_hash: str, chunk_hashes: Dict[str, str]):
+        with self._lock:
+            entry = self.files.setdefault(source, {"pages": {}})
+            entry["pages"][str(page)] = {"hash": page_hash, "chunks": chunk_hashes}
+
+    def complete_file(self, source: str, file_hash: str):
+        with self._lock:
+            self.files[source]["file_hash"] = file_hash
+
+    def invalidate(self):
+        """
+            Forces a full re-embed on the next run while keeping the known chunk IDs,
+            so stale chunks are still cleaned up.
+        """
+        with self._lock:
+            for entry in self.files.values():
+                entry["file_hash"] = None
+                for page in entry["pages"].values():
+                    page["chunks"] = {chunk_id: "" for chunk_id in page["chunks"]}
+
+    def remove_file(self, source: str) -> List[str]:
+        """Forgets a file. Returns its chunk IDs, which must be deleted."""
+        with self._lock:
+            entry = self.files.pop(source, None)
+        if not entry:
+            return []
+        return [chunk_id for page in entry["pages"].values() for chunk_id in page["chunks"]]
+
+    def sources_under(self, directory: str) -> List[str]:
+        """Sources previously ingested from `directory`."""
+        root = os.path.abspath(directory)
+        return [
+            source for source, entry in self.files.items()
+            if entry.get("path") and os.path.abspath(entry["path"]).startswith(root + os.sep)
+        ]
+
+    def save(self):
+        """Atomically writes the manifest to disk."""
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.data, f)
+            os.replace(tmp_path, self.path)
+
+    @classmethod
+    def for_collection(cls, data_dir: str, collection_name: str) -> "IngestionManifest":
+        return cls(os.path.join(data_dir, "manifests", f"{collection_name}.json"))
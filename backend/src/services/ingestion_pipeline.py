@@ -0,0 +1,347 @@
+import os
+import time
+import queue
+import logging
+import threading
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from .ingestion import METADATA_SCHEMA, PDFProcessor, extract_page_range
+from .ingestion_manifest import IngestionManifest
+from . import metrics
+
+logger = logging.getLogger("IngestionPipeline")
+logger.setLevel(logging.INFO)
+
+# Marks the end of the page stream in the queue
+_DONE = object()
+
+def _extract_task(*args) -> Tuple[List[Dict], Dict[str, float]]:
+    """
+        Worker entry point: extract_page_range() plus its stage timings (totals for the task).
+        Worker processes have their own histograms, so the parent records these.
+    """
+    timings: Dict[str, float] = {}
+    records = metrics.bind(extract_page_range, timings)(*args)
+    return records, timings
+
+class IngestionPipeline:
+    """
+        Streaming directory ingestion:
+        PDF page ranges -> process pool (extract + chunk) -> bounded queue -> batched embedding + upsert.
+        Extraction keeps running while the consumer embeds, and memory stays bounded by the number of
+        in-flight tasks, the queue size and the embedding batch size, regardless of corpus size.
+        With an IngestionManifest, re-runs only touch files, pages and chunks whose content changed.
+    """
+
+    def __init__(self, vector_db, chunk_size: int = 1000, overlap: int = 200, strategy: str = "structured",
+                 chunk_tokens: int = 160, overlap_tokens: int = 32, workers: Optional[int] = None,
+                 pages_per_task: int = 25, queue_size: int = 1000, embed_batch_size: int = 256,
+                 manifest: Optional[IngestionManifest] = None, manifest_save_interval: float = 10.0, governor=None):
+        """
+            Args:
+                vector_db (VectorDB): Destination of the chunks (must expose add_chunks)
+                chunk_size (int): Maximum number of characters per chunk of text ("window" strategy)
+                overlap (int): Number of characters to overlap between chunks ("window" strategy)
+                strategy (str): Chunking strategy, "structured" or "window" (see PDFProcessor)
+                chunk_tokens (int): Maximum number of tokens per chunk ("structured" strategy)
+                overlap_tokens (int): Tokens repeated between consecutive chunks ("structured" strategy)
+                workers (int): Extraction processes (defaults to CPU count - 1)
+                pages_per_task (int): Pages per extraction task, so big PDFs are split across workers
+                queue_size (int): Max extracted pages waiting for the embedding consumer
+                embed_batch_size (int): Chunks per encode() + upsert call
+                manifest (IngestionManifest): Enables incremental ingestion (None re-embeds everything)
+                manifest_save_interval (float): Minimum seconds between manifest writes during a run
+                governor (LoadGovernor): Paces the embedding batches when ingestion shares the process with chat traffic
+        """
+        self.vector_db = vector_db
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.strategy = strategy
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.pages_per_task = pages_per_task
+        self.queue_size = queue_size
+        self.embed_batch_size = embed_batch_size
+        self.manifest = manifest
+        self.manifest_save_interval = manifest_save_interval
+        self.governor = governor
+
+    @property
+    def chunking(self) -> str:
+        """Chunking signature stored in the manifest; changing it forces re-chunking of unchanged files."""
+        if self.strategy == "structured":
+            return f"structured:{self.chunk_tokens}:{self.overlap_tokens}:{METADATA_SCHEMA}"
+        return f"window:{self.chunk_size}:{self.overlap}:{METADATA_SCHEMA}"
+
+    @staticmethod
+    def source_key(file_path: Path, root: Path) -> str:
+        """
+            Name of a file in the library: its path relative to the ingestion root, so same-named manuals
+            in different subfolders ("x1000/manual.pdf", "y2/manual.pdf") keep separate chunks and manifest entries.
+        """
+        return file_path.relative_to(root).as_posix()
+
+    def _plan(self, files: List[Path], root: Path, stats: Dict) -> Iterator[Tuple[str, object]]:
+        """
+            Yields ("file", info) events followed by that file's ("task", (file, start_page, end_page, source))
+            extraction tasks. Files whose hash and chunking match the manifest are skipped entirely.
+        """
+        for file_path in files:
+            source = self.source_key(file_path, root)
+            try:
+                file_hash = IngestionManifest.file_hash(str(file_path)) if self.manifest else None
+                if self.manifest and self.manifest.is_unchanged(source, file_hash, self.chunking):
+                    stats["skipped_files"] += 1
+                    continue
+                total_pages = PDFProcessor.page_count(str(file_path))
+                document = PDFProcessor.document_metadata(str(file_path))
+            except Exception as e:
+                logger.error(f"Skipping unreadable PDF {file_path}: {e}")
+                continue
+
+            yield "file", {
+                "type": "file",
+                "source": source,
+                "path": str(file_path.resolve()),
+                "file_hash": file_hash,
+                "page_count": total_pages,
+                "metadata": document
+            }
+            for start in range(0, total_pages, self.pages_per_task):
+                yield "task", (str(file_path), start, min(start + self.pages_per_task, total_pages), source)
+
+    def _produce(self, plan: Iterator[Tuple[str, object]], pages: "queue.Queue", stats: Dict, stop: threading.Event):
+        """
+            Producer thread: keeps at most 2 tasks per worker in flight and streams their pages into the queue,
+            in page order.
+        """
+        # Spawned workers avoid forking a parent that already holds torch/Chroma threads
+        context = multiprocessing.get_context("spawn")
+        max_in_flight = self.workers * 2
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as pool:
+                # Futures in submission order, and the section heading still open at the end of each file's last task
+                in_flight: Dict = {}
+                sections: Dict[str, Optional[str]] = {}
+                for kind, item in plan:
+                    if stop.is_set():
+                        break
+                    if kind == "file":
+                        self._put(item, pages, stop)
+                        continue
+                    file_path, start, end, source = item
+                    future = pool.submit(_extract_task, file_path, start, end, self.chunk_size, self.overlap,
+                                         self.strategy, self.chunk_tokens, self.overlap_tokens, source)
+                    in_flight[future] = item
+                    if len(in_flight) >= max_in_flight:
+                        self._forward(in_flight, sections, pages, stats, stop)
+                while in_flight and not stop.is_set():
+                    self._forward(in_flight, sections, pages, stats, stop)
+                for future in in_flight:
+                    future.cancel()
+        finally:
+            while True:
+                try:
+                    pages.put(_DONE, timeout=0.5)
+                    break
+                except queue.Full:
+                    if stop.is_set():
+                        break
+
+    def _forward(self, in_flight: Dict, sections: Dict[str, Optional[str]], pages: "queue.Queue", stats: Dict,
+                 stop: threading.Event):
+        """
+            Waits for the oldest task and forwards its pages. Tasks finish in any order, but forwarding them in
+            submission order lets each one continue the section heading left open by the previous task of its file
+            (a worker only sees its own page range).
+        """
+        future = next(iter(in_flight))
+        file_path, _, _, source = in_flight.pop(future)
+        try:
+            records, timings = future.result()
+        except Exception as e:
+            stats["failed_tasks"] += 1
+            logger.error(f"Extraction task failed for {file_path}: {e}")
+            self._put({"type": "failed", "source": source}, pages, stop)
+            return
+        for stage, seconds in timings.items():
+            metrics.observe(stage, seconds)
+
+        # Chunks before the task's first heading have no section: they belong to the one still open
+        section = sections.get(source)
+        for record in records:
+            for chunk in record["chunks"]:
+                if chunk["section"] is None:
+                    chunk["section"] = section
+                section = chunk["section"]
+            self._put({"type": "page", **record}, pages, stop)
+        sections[source] = section
+
+    @staticmethod
+    def _put(item: Dict, pages: "queue.Queue", stop: threading.Event):
+        # Blocks while the consumer is behind (backpressure)
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _delete(self, ids: List[str], stats: Dict):
+        if ids:
+            self.vector_db.delete_chunks(ids)
+            stats["deleted_chunks"] += len(ids)
+
+    def _flush(self, state: Dict, stats: Dict, force_save: bool = False):
+        """Embeds + upserts the buffered chunks, then records the flushed pages/files in the manifest."""
+        if state["buffer"]:
+            if self.governor:
+                with self.governor.ingestion_batch():
+                    self.vector_db.add_chunks(state["buffer"])
+            else:
+                self.vector_db.add_chunks(state["buffer"])
+            stats["chunks"] += len(state["buffer"])
+            state["buffer"] = []
+
+        if not self.manifest:
+            return
+        for source, page, page_hash, chunk_hashes in state["pending_pages"]:
+            self.manifest.set_page(source, page, page_hash, chunk_hashes)
+        for source, file_hash in state["completed_files"]:
+            self.manifest.complete_file(source, file_hash)
+        state["pending_pages"] = []
+        state["completed_files"] = []
+
+        # Saving at most every few seconds, the manifest of a big library is not tiny
+        if force_save or time.monotonic() - state["last_save"] > self.manifest_save_interval:
+            self.manifest.save()
+            state["last_save"] = time.monotonic()
+
+    def _consume(self, item: Dict, state: Dict, stats: Dict):
+        files = state["files"]
+        source = item["source"]
+
+        if item["type"] == "file":
+            files[source] = {
+                "file_hash": item["file_hash"], "remaining": item["page_count"], "failed": False, "metadata": item["metadata"]
+            }
+            if self.manifest:
+                self._delete(self.manifest.begin_file(source, item["path"], self.chunking, item["page_count"]), stats)
+            if item["page_count"] == 0:
+                state["completed_files"].append((source, item["file_hash"]))
+                stats["completed_files"] += 1
+            return
+
+        if item["type"] == "failed":
+            files[source]["failed"] = True
+            return
+
+        # Page record: only new or modified chunks are embedded, vanished ones are deleted
+        stats["pages"] += 1
+        chunks = item["chunks"]
+        if self.manifest:
+            changed, stale_ids, chunk_hashes = self.manifest.diff_page(source, item["page"], chunks)
+            stats["unchanged_chunks"] += len(chunks) - len(changed)
+            self._delete(stale_ids, stats)
+            state["pending_pages"].append((source, item["page"], item["hash"], chunk_hashes))
+            chunks = changed
+        # Document-level fields (product, version) are only known to the planner
+        state["buffer"].extend({**chunk, **files[source]["metadata"]} for chunk in chunks)
+
+        file_state = files[source]
+        file_state["remaining"] -= 1
+        if file_state["remaining"] == 0 and not file_state["failed"]:
+            state["completed_files"].append((source, file_state["file_hash"]))
+            stats["completed_files"] += 1
+
+    def run(self, directory: str, pattern: str = "*.pdf", recursive: bool = True, prune: bool = True,
+            on_progress: Optional[Callable[[Dict], None]] = None, cancel: Optional[threading.Event] = None,
+            full: bool = False) -> Dict:
+        """
+            Ingests every PDF under `directory`. Returns throughput statistics.
+            With a manifest, unchanged files are skipped, only modified chunks are re-embedded and,
+            when `prune` is set, chunks of files no longer present in the directory are deleted.
+            The manifest is (re)loaded once the run holds the collection's write lock; `full` then invalidates it,
+            re-embedding every file.
+            `on_progress` is called with a snapshot of the statistics after each embedded batch.
+            Setting `cancel` stops the run after the current batch; what was embedded so far is kept
+            (and recorded in the manifest, so the next run resumes from there).
+        """
+        root = Path(directory)
+        if not root.is_dir():
+            raise FileNotFoundError(f"Directory not found: {directory}")
+        files = sorted(root.rglob(pattern) if recursive else root.glob(pattern))
+        sources = {self.source_key(f, root) for f in files}
+
+        stats = {
+            "files": len(files), "skipped_files": 0, "completed_files": 0, "pages": 0, "chunks": 0,
+            "unchanged_chunks": 0, "deleted_chunks": 0, "failed_tasks": 0, "cancelled": False
+        }
+        logger.info(f"Ingesting {len(files)} PDFs from {directory} with {self.workers} workers...")
+
+        pages: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        producer = threading.Thread(
+            target=self._produce, args=(self._plan(files, root, stats), pages, stats, stop), name="ingestion-producer", daemon=True
+        )
+        state = {"buffer": [], "pending_pages": [], "completed_files": [], "files": {}, "last_save": time.monotonic()}
+
+        # One ingestion owner at a time: serving workers only read, and reload once the final flush publishes
+        with self.vector_db.writing():
+            # What the previous owner ingested, not what the manifest held when this pipeline was built
+            if self.manifest:
+                self.manifest.reload()
+                if full:
+                    self.manifest.invalidate()
+            start_time = time.perf_counter()
+            producer.start()
+            try:
+                while True:
+                    if cancel is not None and cancel.is_set():
+                        logger.warning("Ingestion cancelled, keeping the batches embedded so far")
+                        stats["cancelled"] = True
+                        break
+                    item = pages.get()
+                    if item is _DONE:
+                        break
+                    self._consume(item, state, stats)
+                    if len(state["buffer"]) >= self.embed_batch_size:
+                        self._flush(state, stats)
+                        if on_progress:
+                            on_progress(self._snapshot(stats, start_time))
+
+                # Removing files that disappeared from the directory
+                if self.manifest and prune and not stats["cancelled"]:
+                    for source in self.manifest.sources_under(str(root)):
+                        if source not in sources:
+                            logger.info(f"Removing chunks of deleted file: {source}")
+                            self._delete(self.manifest.remove_file(source), stats)
+                self._flush(state, stats, force_save=True)
+                self.vector_db.flush()
+            finally:
+                stop.set()
+                producer.join()
+
+        result = self._snapshot(stats, start_time)
+        logger.info(
+            f"Ingestion completed: {result['pages']} pages, {result['chunks']} chunks embedded "
+            f"({result['skipped_files']} files and {result['unchanged_chunks']} chunks unchanged, "
+            f"{result['deleted_chunks']} deleted) in {result['elapsed']:.1f}s "
+            f"({result['pages_per_sec']:.1f} pages/s, {result['chunks_per_sec']:.1f} chunks/s)"
+        )
+        if on_progress:
+            on_progress(result)
+        return result
+
+    @staticmethod
+    def _snapshot(stats: Dict, start_time: float) -> Dict:
+        elapsed = time.perf_counter() - start_time
+        return {
+            **stats,
+            "elapsed": elapsed,
+            "pages_per_sec": stats["pages"] / elapsed if elapsed else 0.0,
+            "chunks_per_sec": stats["chunks"] / elapsed if elapsed else 0.0
+        }
@@ -0,0 +1,175 @@
+import os
+import re
+import math
+import heapq
+import pickle
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    """
+        Lowercased, accent-folded word tokens ("Solução" -> "solucao"), so codes like "Erro 101"
+        or "X-1000" match regardless of case and accents.
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return TOKEN_PATTERN.findall(text)
+
+class BM25Index:
+    """
+        In-memory inverted index with BM25 scoring, persisted with pickle.
+        Supports incremental upserts and deletes by chunk ID; lookups only touch the postings of the query terms.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75, common_ratio: float = 0.05):
+        """
+            Args:
+                path (str): Pickle file used by load()/save()
+                k1 (float): BM25 term-frequency saturation
+                b (float): BM25 length normalization
+                common_ratio (float): Terms in more than this share of documents don't generate candidates
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.common_ratio = common_ratio
+        self._lock = threading.RLock()
+        self.dirty = False
+
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_ids: List[Optional[str]] = []
+        self.doc_lens: List[int] = []
+        self.doc_terms: List[Tuple[str, ...]] = []
+        self.doc_index: Dict[str, int] = {}
+        self.free_slots: List[int] = []
+        self.total_len = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_index)
+
+    def add(self, ids: List[str], texts: List[str]):
+        """Indexes (or re-indexes) documents."""
+        with self._lock:
+            self.remove(ids)
+            for doc_id, text in zip(ids, texts):
+                counts = Counter(tokenize(text))
+                length = sum(counts.values())
+                slot = self.free_slots.pop() if self.free_slots else len(self.doc_ids)
+                if slot == len(self.doc_ids):
+                    self.doc_ids.append(doc_id)
+                    self.doc_lens.append(length)
+                    self.doc_terms.append(tuple(counts))
+                else:
+                    self.doc_ids[slot] = doc_id
+                    self.doc_lens[slot] = length
+                    self.doc_terms[slot] = tuple(counts)
+                for term, tf in counts.items():
+                    self.postings.setdefault(term, {})[slot] = tf
+                self.doc_index[doc_id] = slot
+                self.total_len += length
+            self.dirty = True
+
+    def remove(self, ids: Iterable[str]):
+        with self._lock:
+            for doc_id in ids:
+                slot = self.doc_index.pop(doc_id, None)
+                if slot is None:
+                    continue
+                for term in self.doc_terms[slot]:
+                    posting = self.postings.get(term)
+                    if posting is not None:
+                        posting.pop(slot, None)
+                        if not posting:
+                            del self.postings[term]
+                self.total_len -= self.doc_lens[slot]
+                self.doc_ids[slot] = None
+                self.doc_lens[slot] = 0
+                self.doc_terms[slot] = ()
+                self.free_slots.append(slot)
+                self.dirty = True
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """Returns up to top_k (chunk_id, bm25_score) pairs, best first."""
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self.doc_index)
+            if not terms or not n_docs:
+                return []
+            avg_len = self.total_len / n_docs
+
+            matched = sorted(
+                ((term, self.postings[term]) for term in terms if term in self.postings),
+                key=lambda item: len(item[1])
+            )
+            if not matched:
+                return []
+
+            # Candidates come from the selective terms only; terms present in a large share of the corpus
+            # ("erro", "manual") just add to those candidates' scores instead of scanning their whole postings.
+            # Documents matching only common terms carry little lexical signal and are left to the dense engine,
+            # unless the selective terms don't yield top_k candidates.
+            common_df = max(top_k, int(self.common_ratio * n_docs))
+            rare = [(term, posting) for term, posting in matched if len(posting) <= common_df]
+            common = [(term, posting) for term, posting in matched if len(posting) > common_df]
+
+            scores: Dict[int, float] = {}
+            for term, posting in rare:
+                idf = self._idf(len(posting), n_docs)
+                for slot, tf in posting.items():
+                    scores[slot] = scores.get(slot, 0.0) + self._term_score(idf, tf, slot, avg_len)
+
+            if len(scores) < top_k:
+                # Too few candidates (e.g. only common terms in the query, or lexical-only retrieval): scoring
+                # the common postings in full as well
+                for term, posting in common:
+                    idf = self._idf(len(posting), n_docs)
+                    for slot, tf in posting.items():
+                        scores[slot] = scores.get(slot, 0.0) + self._term_score(idf, tf, slot, avg_len)
+                common = []
+
+            for term, posting in common:
+                idf = self._idf(len(posting), n_docs)
+                for slot in scores:
+                    tf = posting.get(slot)
+                    if tf:
+                        scores[slot] += self._term_score(idf, tf, slot, avg_len)
+
+            best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+            return [(self.doc_ids[slot], score) for slot, score in best]
+
+    @staticmethod
+    def _idf(df: int, n_docs: int) -> float:
+        return math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+    def _term_score(self, idf: float, tf: int, slot: int, avg_len: float) -> float:
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lens[slot] / avg_len)
+        return idf * tf * (self.k1 + 1) / (tf + norm)
+
+    def save(self):
+        """Persists the index next to the Chroma data (atomic replace)."""
+        if not self.path:
+            return
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            state = {k: getattr(self, k) for k in ("postings", "doc_ids", "doc_lens", "doc_terms", "doc_index", "free_slots", "total_len")}
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+
+    def load(self) -> bool:
+        """Loads the persisted index. Returns False if there is none."""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        with self._lock:
+            with open(self.path, "rb") as f:
+                state = pickle.load(f)
+            for key, value in state.items():
+                setattr(self, key, value)
+            self.dirty = False
+        return True
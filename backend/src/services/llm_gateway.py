@@ -0,0 +1,676 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import logging
+import threading
+import numpy as np
+from collections import deque
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, AsyncIterator, Dict, List, Optional
+from .conversation_store import content_words
+
+logger = logging.getLogger("LLMGateway")
+logger.setLevel(logging.INFO)
+
+LLM_BACKENDS = ("gemini", "http")
+FALLBACK_NOTICE = ("The AI assistant is unavailable right now. These excerpts from the manuals are the closest "
+                   "match to your question:")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+|\n+")
+
+class LLMTimeout(Exception):
+    """An LLM call ran past its per-call timeout or the request's deadline."""
+
+class LLMUnavailable(Exception):
+    """The LLM failed (or its circuit is open) and no fallback is configured."""
+
+class LLMHTTPError(Exception):
+    """Error status from an HTTP LLM server; `code` carries the HTTP status, like google.api_core errors."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+def is_rate_limit(error: Exception) -> bool:
+    # google.api_core errors carry the HTTP status in `code`
+    if getattr(error, "code", None) == 429:
+        return True
+    message = str(error).lower()
+    return "429" in message or "quota" in message or "rate limit" in message
+
+def is_retryable(error: Exception) -> bool:
+    """Timeouts, rate limits (429) and transient server errors are worth retrying."""
+    return isinstance(error, (LLMTimeout, ConnectionError)) or getattr(error, "code", None) in (500, 502, 503, 504) \
+        or is_rate_limit(error)
+
+def create_gemini_model():
+    """Configures the Gemini client from GEMINI_API_KEY (imported here: the SDK is slow to import)."""
+    import google.generativeai as genai
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY not found! Check .env file.")
+    genai.configure(api_key=api_key)
+
+    # Using Gemini Flash 2.5
+    # IMPORTANT: RUN "python notebooks/check_models.py" IF YOU'RE UNSURE WHICH MODELS ARE AVAILABLE FOR YOUR API KEY
+    return genai.GenerativeModel('models/gemini-2.5-flash')
+
+def create_llm_model():
+    """The generative model selected by LLM_BACKEND: "gemini" (default) or "http" (see HTTPChatModel, LLM_URL/LLM_MODEL)."""
+    backend = os.getenv("LLM_BACKEND", "gemini")
+    if backend == "gemini":
+        return create_gemini_model()
+    if backend == "http":
+        return HTTPChatModel(os.getenv("LLM_URL", "http://localhost:8100/v1"), os.getenv("LLM_MODEL", "default"),
+                             api_key=os.getenv("LLM_API_KEY"),
+                             max_connections=int(os.getenv("LLM_MAX_CONCURRENCY", "8")) * 2)
+    raise ValueError(f"Unknown LLM_BACKEND '{backend}', expected one of {LLM_BACKENDS}")
+
+class LLMResponse:
+    """The part of a Gemini response ChatService reads."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+class HTTPChatModel:
+    """
+        Client of an OpenAI-compatible chat completions server (vLLM, llama.cpp, Ollama, or the fake server of
+        benchmarks/fake_llm_server.py), with the generate_content/generate_content_async interface of Gemini models.
+        One sync and one async connection pool are kept for the life of the model, so calls reuse keep-alive connections.
+    """
+
+    def __init__(self, base_url: str, model: str = "default", api_key: Optional[str] = None,
+                 max_connections: int = 16, timeout: float = 60.0):
+        """
+            Args:
+                base_url (str): API root, e.g. "http://localhost:8100/v1"
+                model (str): Model name sent with every request
+                api_key (str): Bearer token, if the server wants one
+                max_connections (int): Size of each connection pool
+                timeout (float): Socket timeout in seconds (the gateway enforces the per-call deadlines)
+        """
+        import httpx
+
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.model = model
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._client_options = {"headers": headers, "limits": limits, "timeout": timeout}
+        self._client = httpx.Client(**self._client_options)
+        self._async_client = None
+        self._async_loop = None
+
+    def _payload(self, prompt: str, stream: bool) -> Dict[str, Any]:
+        return {"model": self.model, "messages": [{"role": "user", "content": prompt}], "stream": stream}
+
+    @staticmethod
+    def _check(status: int, body: str):
+        if status >= 400:
+            raise LLMHTTPError(status, body[:200])
+
+    def generate_content(self, prompt: str, **kwargs) -> LLMResponse:
+        response = self._client.post(self.url, json=self._payload(prompt, False))
+        self._check(response.status_code, response.text)
+        return LLMResponse(response.json()["choices"][0]["message"]["content"])
+
+    async def generate_content_async(self, prompt: str, stream: bool = False, **kwargs):
+        import httpx
+
+        # Created inside the event loop that uses it (a script running ask_many() gets a loop per call)
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = httpx.AsyncClient(**self._client_options)
+            self._async_loop = loop
+        if stream:
+            request = self._async_client.build_request("POST", self.url, json=self._payload(prompt, True))
+            response = await self._async_client.send(request, stream=True)
+            if response.status_code >= 400:
+                body = (await response.aread()).decode("utf-8", "replace")
+                await response.aclose()
+                self._check(response.status_code, body)
+            return self._stream(response)
+        response = await self._async_client.post(self.url, json=self._payload(prompt, False))
+        self._check(response.status_code, response.text)
+        return LLMResponse(response.json()["choices"][0]["message"]["content"])
+
+    @staticmethod
+    async def _stream(response) -> AsyncIterator[LLMResponse]:
+        """Server-sent events of a streamed completion ("data: {...}" lines, then "data: [DONE]")."""
+        try:
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                delta = json.loads(data)["choices"][0].get("delta", {})
+                if delta.get("content"):
+                    yield LLMResponse(delta["content"])
+        finally:
+            await response.aclose()
+
+    def close(self):
+        self._client.close()
+
+class ExtractiveFallback:
+    """
+        Local fallback answer when the LLM can't be reached: the context sentences sharing the most
+        topic words with the query, quoted with their source and page. No model, so it answers in microseconds.
+    """
+
+    def __init__(self, max_sentences: int = 3):
+        self.max_sentences = max_sentences
+
+    def generate(self, prompt: str, query: str, context: List[Dict]) -> str:
+        words = set(content_words(query))
+        candidates = []
+        for rank, chunk in enumerate(context):
+            metadata = chunk["metadata"]
+            for sentence in SENTENCE_PATTERN.split(chunk["content"]):
+                sentence = " ".join(sentence.split())
+                if sentence:
+                    overlap = len(words.intersection(content_words(sentence)))
+                    # Best overlap first; ties go to the better-ranked chunk, then to the earlier sentence
+                    candidates.append((-overlap, rank, len(candidates), sentence, metadata))
+        if not candidates:
+            return FALLBACK_NOTICE
+        best = sorted(candidates)[: self.max_sentences]
+        best = [c for c in best if c[0] < 0] or best[:1]
+        lines = [f"- {sentence} ({metadata['source']}, page {metadata['page']})"
+                 for _, _, _, sentence, metadata in sorted(best, key=lambda c: (c[1], c[2]))]
+        return FALLBACK_NOTICE + "\n" + "\n".join(lines)
+
+    async def agenerate(self, prompt: str, query: str, context: List[Dict]) -> str:
+        return self.generate(prompt, query, context)
+
+class ModelFallback:
+    """
+        Fallback answer from a second, local model (e.g. a small model behind HTTPChatModel), given `timeout`
+        seconds; if it fails as well, `then` (the extractive fallback by default) answers.
+    """
+
+    def __init__(self, model, timeout: float = 10.0, then=None):
+        self.model = model
+        self.timeout = timeout
+        self.then = then or ExtractiveFallback()
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="llm-fallback")
+
+    def generate(self, prompt: str, query: str, context: List[Dict]) -> str:
+        try:
+            return self._pool.submit(self.model.generate_content, prompt).result(timeout=self.timeout).text
+        except Exception as e:
+            logger.warning(f"Fallback model failed ({e!r}), answering with {type(self.then).__name__}")
+            return self.then.generate(prompt, query, context)
+
+    async def agenerate(self, prompt: str, query: str, context: List[Dict]) -> str:
+        try:
+            response = await asyncio.wait_for(self.model.generate_content_async(prompt), self.timeout)
+            return response.text
+        except Exception as e:
+            logger.warning(f"Fallback model failed ({e!r}), answering with {type(self.then).__name__}")
+            return await self.then.agenerate(prompt, query, context)
+
+def create_fallback():
+    """The fallback selected by LLM_FALLBACK: "extractive" (default), "http" (a local model at LLM_FALLBACK_URL) or "none"."""
+    kind = os.getenv("LLM_FALLBACK", "extractive")
+    if kind == "none":
+        return None
+    if kind == "extractive":
+        return ExtractiveFallback()
+    if kind == "http":
+        model = HTTPChatModel(os.getenv("LLM_FALLBACK_URL", "http://localhost:8101/v1"), os.getenv("LLM_FALLBACK_MODEL", "default"))
+        return ModelFallback(model, timeout=float(os.getenv("LLM_FALLBACK_TIMEOUT_SECONDS", "10")))
+    raise ValueError(f"Unknown LLM_FALLBACK '{kind}', expected 'extractive', 'http' or 'none'")
+
+class CircuitBreaker:
+    """
+        Stops calling a failing LLM: once at least `failure_ratio` of the last `window` calls failed (and the window
+        is full), the circuit opens and calls are rejected for `reset_seconds`. Then one probe call is let through
+        (half-open), whose outcome closes the circuit again or re-opens it. A probe that never reports back is
+        replaced after `reset_seconds`. A ratio (not a count of consecutive failures) keeps fast-failing calls from
+        tripping it while most calls still succeed.
+    """
+
+    def __init__(self, failure_ratio: float = 0.5, window: int = 20, reset_seconds: float = 30.0):
+        """
+            Args:
+                failure_ratio (float): Share of failed calls that opens the circuit, 0 disables the breaker
+                window (int): Number of recent calls the ratio is computed over
+                reset_seconds (float): Time the circuit stays open before a probe call
+        """
+        self.failure_ratio = failure_ratio
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self._outcomes: deque = deque(maxlen=window)    # True for a failure
+        self._opened_at = 0.0    # Also the start of the current probe, when half-open
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed" or self.failure_ratio <= 0:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._outcomes.append(False)
+            if self.state == "half_open":
+                self.state = "closed"
+                self._outcomes.clear()
+
+    def record_failure(self):
+        with self._lock:
+            self._outcomes.append(True)
+            full = len(self._outcomes) == self._outcomes.maxlen
+            tripped = full and self.failure_ratio > 0 and sum(self._outcomes) >= self.failure_ratio * len(self._outcomes)
+            if self.state == "half_open" or (self.state == "closed" and tripped):
+                if self.state == "closed":
+                    self.opened += 1
+                    logger.warning(f"LLM circuit open for {self.reset_seconds:.0f}s: {sum(self._outcomes)} of the last "
+                                   f"{len(self._outcomes)} calls failed")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+class ConcurrencyLimiter:
+    """
+        At most `limit` LLM calls in flight, shared by the sync calls (which block on it) and the async ones (which
+        await it) of every event loop: an asyncio.Semaphore is bound to the loop it first waits on, while
+        ChatService.ask_many() runs a new loop per batch. A released slot goes to the oldest async waiter first.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self._waiters: deque = deque()    # (loop, future) of the async callers waiting for a slot
+
+    def locked(self) -> bool:
+        return self.in_flight >= self.limit
+
+    def try_acquire(self) -> bool:
+        """Takes a slot only if one is free (hedges must not queue behind other requests)."""
+        with self._lock:
+            if self.in_flight >= self.limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Blocks for a slot, at most `timeout` seconds; returns whether it got one."""
+        with self._released:
+            if not self._released.wait_for(lambda: self.in_flight < self.limit and not self._waiters, timeout):
+                return False
+            self.in_flight += 1
+            return True
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.in_flight < self.limit and not self._waiters:
+                self.in_flight += 1
+                return
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Cancelled once the slot was handed over: giving it back
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                loop, future = self._waiters.popleft()
+                if future.done() or loop.is_closed():
+                    continue
+                try:
+                    # The slot stays taken, handed over to the waiter
+                    loop.call_soon_threadsafe(self._hand_over, future)
+                    return
+                except RuntimeError:    # The waiter's loop closed meanwhile
+                    continue
+            self.in_flight -= 1
+            self._released.notify()
+
+    def _hand_over(self, future: asyncio.Future):
+        if future.done():
+            self.release()
+        else:
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def aslot(self) -> AsyncIterator[None]:
+        await self.aacquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+class LLMGateway:
+    """
+        Resilient access to the generative model, shared by every ChatService call:
+        - at most `max_concurrency` calls in flight, each bounded by `timeout`, the whole request by `deadline`;
+        - timeouts, rate limits and transient errors are retried with exponential backoff and jitter, and a rate limit
+          pauses the other calls too (shared cooldown);
+        - with `hedge`, a second identical call is sent when the first one is slower than the p95 of recent calls
+          (and at least `hedge_min_ms`), and the first answer wins;
+        - a circuit breaker stops calling the model while it keeps failing;
+        - when the model can't answer in time, the `fallback` does (see ExtractiveFallback and ModelFallback),
+          otherwise LLMUnavailable is raised.
+    """
+
+    def __init__(self, model, max_concurrency: int = 8, timeout: float = 10.0, deadline: float = 20.0,
+                 retries: int = 3, retry_delay: float = 1.0, hedge: bool = False, hedge_min_ms: float = 500.0,
+                 breaker: Optional[CircuitBreaker] = None, fallback=None):
+        """
+            Args:
+                model: Generative model exposing generate_content/generate_content_async (Gemini or HTTPChatModel)
+                max_concurrency (int): LLM calls in flight, hedges included
+                timeout (float): Seconds per call (for a stream: until the first token, then between tokens)
+                deadline (float): Seconds per request, retries and backoff included; then the fallback answers
+                retries (int): Retries after the first call
+                retry_delay (float): First backoff delay in seconds, doubled at every retry
+                hedge (bool): Sends a hedged second call when the first one is slow (not for streams)
+                hedge_min_ms (float): Lower bound of the hedging delay
+                breaker (CircuitBreaker): Circuit breaker (a default one when omitted)
+                fallback: Object with generate/agenerate(prompt, query, context) -> str, None to raise LLMUnavailable
+        """
+        self.model = model
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.hedge = hedge
+        self.hedge_min = hedge_min_ms / 1000
+        self.breaker = breaker or CircuitBreaker()
+        self.fallback = fallback
+
+        # Bounds the sync, async and streaming calls together (a timed-out sync call keeps its slot until it returns)
+        self.limiter = ConcurrencyLimiter(max_concurrency)
+        # Sync calls run on this pool, so they can be timed out and hedged like the async ones
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency * 2, thread_name_prefix="llm")
+        self._latencies: deque = deque(maxlen=256)
+        self._cooldown_until = 0.0
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "calls": 0, "failures": 0, "timeouts": 0, "retries": 0, "hedged": 0,
+                         "hedge_wins": 0, "rejected": 0, "fallbacks": 0}
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        for client in (self.model, getattr(self.fallback, "model", None)):
+            if hasattr(client, "close"):
+                client.close()
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.counters[key] += amount
+
+    def _hedge_after(self) -> Optional[float]:
+        """Seconds after which a call gets a hedge: the p95 latency of recent calls (None until there are enough)."""
+        if not self.hedge or len(self._latencies) < 20:
+            return None
+        return max(self.hedge_min, float(np.percentile(self._latencies, 95)))
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        delay = min(self.retry_delay * 2 ** attempt, 60.0) * random.uniform(0.5, 1.5)
+        if is_rate_limit(error):
+            self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+        self._count("retries")
+        logger.warning(f"LLM call failed ({error!r}), retrying in {delay:.1f}s ({attempt + 1}/{self.retries})")
+        return delay
+
+    def _failed(self, error: Exception):
+        self._count("failures")
+        if isinstance(error, LLMTimeout):
+            self._count("timeouts")
+        self.breaker.record_failure()
+
+    def _succeeded(self, latency: float):
+        self._latencies.append(latency)
+        self.breaker.record_success()
+
+    def _give_up(self, error: Optional[Exception]) -> Exception:
+        if error is None:
+            self._count("rejected")
+            return LLMUnavailable("LLM circuit open")
+        return LLMUnavailable(f"LLM unavailable: {error!r}")
+
+    async def agenerate(self, prompt: str, query: str = "", context: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        """
+            Generates an answer for `prompt`; `query` and `context` (the prompt's chunks) feed the fallback.
+            Returns {"text", "fallback" (whether the fallback answered), "attempts"}.
+        """
+        self._count("requests")
+        deadline = time.monotonic() + self.deadline
+        error = None
+        attempt = 0
+        for attempt in range(self.retries + 1):
+            wait_for = max(self._cooldown_until - time.monotonic(), 0.0)
+            if wait_for >= deadline - time.monotonic() or not self.breaker.allow():
+                break
+            await asyncio.sleep(wait_for)
+            try:
+                text = await self._attempt(prompt, min(self.timeout, deadline - time.monotonic()))
+                return {"text": text, "fallback": False, "attempts": attempt + 1}
+            except Exception as e:
+                error = e
+                self._failed(e)
+                if attempt == self.retries or not is_retryable(e):
+                    break
+                delay = self._backoff(attempt, e)
+                if delay >= deadline - time.monotonic():
+                    break
+                await asyncio.sleep(delay)
+
+        if self.fallback is None:
+            raise self._give_up(error)
+        self._count("fallbacks")
+        if error is None:
+            self._count("rejected")
+        return {"text": await self.fallback.agenerate(prompt, query, context or []), "fallback": True, "attempts": attempt + 1}
+
+    async def _attempt(self, prompt: str, timeout: float) -> str:
+        """One call (plus its hedge), holding a concurrency slot per call in flight."""
+        async with self.limiter.aslot():
+            start = time.perf_counter()
+            self._count("calls")
+            first = asyncio.ensure_future(self.model.generate_content_async(prompt))
+            pending = {first}
+            hedged = False
+            try:
+                hedge_after = self._hedge_after()
+                if hedge_after is not None and hedge_after < timeout:
+                    done, _ = await asyncio.wait(pending, timeout=hedge_after)
+                    # Only with a free slot: hedging must not queue behind other requests
+                    if not done and self.limiter.try_acquire():
+                        hedged = True
+                        self._count("hedged")
+                        self._count("calls")
+                        pending.add(asyncio.ensure_future(self.model.generate_content_async(prompt)))
+
+                error = None
+                while pending:
+                    remaining = timeout - (time.perf_counter() - start)
+                    done, pending = await asyncio.wait(pending, timeout=max(remaining, 0), return_when=asyncio.FIRST_COMPLETED)
+                    if not done:
+                        raise LLMTimeout(f"No answer within {timeout:.1f}s")
+                    for task in done:
+                        if task.exception() is None:
+                            if task is not first:
+                                self._count("hedge_wins")
+                            self._succeeded(time.perf_counter() - start)
+                            return task.result().text
+                        error = task.exception()
+                raise error
+            finally:
+                for task in pending:
+                    task.cancel()
+                if hedged:
+                    self.limiter.release()
+
+    def generate(self, prompt: str, query: str = "", context: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        """Blocking version of agenerate() (calls run on the gateway's thread pool)."""
+        self._count("requests")
+        deadline = time.monotonic() + self.deadline
+        error = None
+        attempt = 0
+        for attempt in range(self.retries + 1):
+            wait_for = max(self._cooldown_until - time.monotonic(), 0.0)
+            if wait_for >= deadline - time.monotonic() or not self.breaker.allow():
+                break
+            time.sleep(wait_for)
+            try:
+                text = self._attempt_sync(prompt, min(self.timeout, deadline - time.monotonic()))
+                return {"text": text, "fallback": False, "attempts": attempt + 1}
+            except Exception as e:
+                error = e
+                self._failed(e)
+                if attempt == self.retries or not is_retryable(e):
+                    break
+                delay = self._backoff(attempt, e)
+                if delay >= deadline - time.monotonic():
+                    break
+                time.sleep(delay)
+
+        if self.fallback is None:
+            raise self._give_up(error)
+        self._count("fallbacks")
+        if error is None:
+            self._count("rejected")
+        return {"text": self.fallback.generate(prompt, query, context or []), "fallback": True, "attempts": attempt + 1}
+
+    def _submit(self, prompt: str):
+        """Runs one call on the pool; its concurrency slot (taken by the caller) is released when it returns."""
+        self._count("calls")
+        future = self._pool.submit(self.model.generate_content, prompt)
+        future.add_done_callback(lambda _: self.limiter.release())
+        return future
+
+    def _attempt_sync(self, prompt: str, timeout: float) -> str:
+        start = time.perf_counter()
+        if not self.limiter.acquire(timeout):
+            raise LLMTimeout(f"No free LLM slot within {timeout:.1f}s")
+        first = self._submit(prompt)
+        pending = {first}
+        hedge_after = self._hedge_after()
+        if hedge_after is not None and hedge_after < timeout - (time.perf_counter() - start):
+            done, _ = wait(pending, timeout=hedge_after)
+            # Only with a free slot, like the async hedges
+            if not done and self.limiter.try_acquire():
+                self._count("hedged")
+                pending.add(self._submit(prompt))
+
+        error = None
+        while pending:
+            remaining = timeout - (time.perf_counter() - start)
+            done, pending = wait(pending, timeout=max(remaining, 0), return_when=FIRST_COMPLETED)
+            if not done:
+                # The calls can't be interrupted: they finish in the background and their result is dropped
+                raise LLMTimeout(f"No answer within {timeout:.1f}s")
+            for future in done:
+                if future.exception() is None:
+                    if future is not first:
+                        self._count("hedge_wins")
+                    self._succeeded(time.perf_counter() - start)
+                    return future.result().text
+                error = future.exception()
+        raise error
+
+    async def astream(self, prompt: str, query: str = "", context: Optional[List[Dict]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+            Streaming version of agenerate(), yielding {"text", "fallback"} pieces. Failures before the first token
+            are retried (then the fallback answers, in one piece); once tokens went out, an error is raised as is.
+        """
+        self._count("requests")
+        deadline = time.monotonic() + self.deadline
+        error = None
+        for attempt in range(self.retries + 1):
+            wait_for = max(self._cooldown_until - time.monotonic(), 0.0)
+            if wait_for >= deadline - time.monotonic() or not self.breaker.allow():
+                break
+            await asyncio.sleep(wait_for)
+            started = False
+            try:
+                async with self.limiter.aslot():
+                    start = time.perf_counter()
+                    self._count("calls")
+                    timeout = min(self.timeout, deadline - time.monotonic())
+                    try:
+                        response = await asyncio.wait_for(self.model.generate_content_async(prompt, stream=True), timeout)
+                        chunks = response.__aiter__()
+                        while True:
+                            remaining = timeout - (time.perf_counter() - start) if not started else self.timeout
+                            try:
+                                chunk = await asyncio.wait_for(chunks.__anext__(), max(remaining, 0))
+                            except StopAsyncIteration:
+                                break
+                            if chunk.text:
+                                if not started:
+                                    self._latencies.append(time.perf_counter() - start)
+                                started = True
+                                yield {"text": chunk.text, "fallback": False}
+                    except asyncio.TimeoutError:
+                        raise LLMTimeout(f"No {'token' if started else 'first token'} within {timeout:.1f}s")
+                self.breaker.record_success()
+                return
+            except Exception as e:
+                error = e
+                self._failed(e)
+                if started or attempt == self.retries or not is_retryable(e):
+                    if started:
+                        raise
+                    break
+                delay = self._backoff(attempt, e)
+                if delay >= deadline - time.monotonic():
+                    break
+                await asyncio.sleep(delay)
+
+        if self.fallback is None:
+            raise self._give_up(error)
+        self._count("fallbacks")
+        if error is None:
+            self._count("rejected")
+        yield {"text": await self.fallback.agenerate(prompt, query, context or []), "fallback": True}
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = list(self._latencies)
+        return {
+            **self.counters,
+            "in_flight": self.limiter.in_flight,
+            "circuit": self.breaker.state,
+            "circuit_opened": self.breaker.opened,
+            "p95_ms": float(np.percentile(latencies, 95)) * 1000 if latencies else None,
+            "hedge_after_ms": (self._hedge_after() or 0) * 1000 if self.hedge else None,
+            "fallback": type(self.fallback).__name__ if self.fallback else None
+        }
+
+def create_llm_gateway(model) -> LLMGateway:
+    """The LLMGateway configured by the LLM_* settings, around `model`."""
+    return LLMGateway(
+        model,
+        max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+        timeout=float(os.getenv("LLM_TIMEOUT_SECONDS", "10")),
+        deadline=float(os.getenv("LLM_DEADLINE_SECONDS", "20")),
+        retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+        retry_delay=float(os.getenv("LLM_RETRY_DELAY_SECONDS", "1.0")),
+        hedge=os.getenv("LLM_HEDGE", "0") == "1",
+        hedge_min_ms=float(os.getenv("LLM_HEDGE_MIN_MS", "500")),
+        breaker=CircuitBreaker(
+            failure_ratio=float(os.getenv("LLM_BREAKER_FAILURE_RATIO", "0.5")),
+            window=int(os.getenv("LLM_BREAKER_WINDOW", "20")),
+            reset_seconds=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+        ),
+        fallback=create_fallback()
+    )
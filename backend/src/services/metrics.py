@@ -0,0 +1,109 @@
+import os
+import time
+import bisect
+import functools
+import threading
+import contextvars
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Recording into the process-wide histograms (env METRICS_ENABLED). Per-request timings are collected either way.
+ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# Latency buckets in seconds, from a cache hit to a slow LLM call
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Per-request collector: {stage: seconds} of the request being served in this context
+_current: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("stage_timings", default=None)
+
+class Histogram:
+    """
+        Cumulative latency histogram with one series per stage label, rendered in the Prometheus text format.
+    """
+
+    def __init__(self, name: str, description: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # stage -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[str, List] = {}
+
+    def observe(self, stage: str, seconds: float):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(stage)
+            if series is None:
+                series = self._series[stage] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {stage: (list(counts), total, count) for stage, (counts, total, count) in self._series.items()}
+        for stage in sorted(snapshot):
+            counts, total, count = snapshot[stage]
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{self.name}_count{{stage="{stage}"}} {count}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+STAGE_SECONDS = Histogram("support_brain_stage_seconds", "Latency of chat, retrieval and ingestion stages in seconds")
+
+def observe(stage: str, seconds: float, timings: Optional[Dict[str, float]] = None):
+    """Records a stage duration measured by the caller (e.g. time to first streamed token)."""
+    target = timings if timings is not None else _current.get()
+    if target is not None:
+        target[stage] = target.get(stage, 0.0) + seconds
+    if ENABLED:
+        STAGE_SECONDS.observe(stage, seconds)
+
+class stage:
+    """
+        Times a block:
+            with metrics.stage("vector_query"):
+                ...
+        The duration goes to the stage histogram and is added to the per-request timings of the current context
+        (or to `timings` when given). Without either, it costs a single context variable lookup.
+    """
+    __slots__ = ("name", "timings", "start")
+
+    def __init__(self, name: str, timings: Optional[Dict[str, float]] = None):
+        self.name = name
+        self.timings = timings
+        self.start = None
+
+    def __enter__(self):
+        if self.timings is None:
+            self.timings = _current.get()
+        if ENABLED or self.timings is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is not None:
+            observe(self.name, time.perf_counter() - self.start, self.timings)
+        return False
+
+def bind(fn: Callable, timings: Optional[Dict[str, float]] = None) -> Callable:
+    """
+        Wraps `fn` to run in a copy of the current context, collecting its stages into `timings`.
+        Thread pools don't propagate context variables, so work handed to run_in_executor goes through this.
+    """
+    context = contextvars.copy_context()
+    if timings is not None:
+        context.run(_current.set, timings)
+    return functools.partial(context.run, fn)
+
+def render() -> str:
+    """Prometheus text exposition of every metric."""
+    return "\n".join(STAGE_SECONDS.render()) + "\n"
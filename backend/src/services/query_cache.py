@@ -0,0 +1,139 @@
+import re
+import time
+import threading
+import unicodedata
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+class QueryCache:
+    """
+        Two-tier answer cache for ChatService:
+        - exact tier: normalized query + scope (top_k, search options) + collection version, LRU with TTL
+        - semantic tier: reuses an answer whose query embedding is within `semantic_threshold` cosine similarity
+        Entries are dropped as a whole whenever the collection version changes.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600, semantic_threshold: float = 0.92):
+        """
+            Args:
+                max_entries (int): LRU capacity shared by both tiers
+                ttl_seconds (float): Entry lifetime, 0 disables expiration
+                semantic_threshold (float): Minimum cosine similarity for a semantic hit, >= 1 disables the tier
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.semantic_threshold = semantic_threshold
+
+        self._entries: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+
+        # Stacked unit vectors of the cached queries, rebuilt lazily after inserts/evictions
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[Tuple] = []
+
+        self.hits_exact = 0
+        self.hits_semantic = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Case, accent-width and whitespace insensitive form of a query."""
+        text = unicodedata.normalize("NFKC", query).casefold()
+        text = re.sub(r"\s+", " ", text)
+        return text.strip(" ?!.,;:")
+
+    def make_key(self, query: str, scope: Hashable) -> Tuple:
+        return (self.normalize(query), scope, self._version)
+
+    def sync_version(self, version: Any):
+        """Clears both tiers if the collection changed since the entries were stored."""
+        with self._lock:
+            if version != self._version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._matrix = None
+                self._version = version
+
+    def _expired(self, entry: Dict) -> bool:
+        return self.ttl > 0 and time.monotonic() - entry["created"] > self.ttl
+
+    def get(self, key: Tuple) -> Optional[Dict]:
+        """Exact-tier lookup. Does not count a miss, since the semantic tier may still answer."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry):
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            self.hits_exact += 1
+            return entry["value"]
+
+    def get_semantic(self, vector: List[float], scope: Hashable) -> Optional[Dict]:
+        """Semantic-tier lookup among entries with the same scope."""
+        with self._lock:
+            if self.semantic_threshold >= 1 or not self._entries:
+                self.misses += 1
+                return None
+
+            if self._matrix is None:
+                self._matrix_keys = list(self._entries.keys())
+                self._matrix = np.stack([self._entries[k]["vector"] for k in self._matrix_keys])
+
+            query = self._unit(vector)
+            similarities = self._matrix @ query
+            for idx in np.argsort(-similarities):
+                if similarities[idx] < self.semantic_threshold:
+                    break
+                key = self._matrix_keys[idx]
+                entry = self._entries.get(key)
+                if entry is None or key[1] != scope or self._expired(entry):
+                    continue
+                self._entries.move_to_end(key)
+                self.hits_semantic += 1
+                return entry["value"]
+
+            self.misses += 1
+            return None
+
+    def put(self, key: Tuple, vector: List[float], value: Dict):
+        with self._lock:
+            # Ignoring answers computed against an older collection version
+            if key[2] != self._version:
+                return
+            self._entries[key] = {"vector": self._unit(vector), "value": value, "created": time.monotonic()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def _remove(self, key: Tuple):
+        self._entries.pop(key, None)
+        self._matrix = None
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits_exact + self.hits_semantic + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits_exact": self.hits_exact,
+            "hits_semantic": self.hits_semantic,
+            "misses": self.misses,
+            "hit_rate": (self.hits_exact + self.hits_semantic) / lookups if lookups else 0.0,
+            "invalidations": self.invalidations
+        }
@@ -0,0 +1,98 @@
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("Reranker")
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+class CrossEncoderReranker:
+    """
+        Re-scores over-fetched search candidates with a small CPU cross-encoder and keeps the best top_k.
+        Candidates are scored in batches under a hard latency budget: when the next batch would not fit,
+        scoring stops and the candidates are returned in their original (vector) order.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_RERANK_MODEL, batch_size: int = 16, budget_ms: float = 200.0,
+                 max_length: int = 256, model=None):
+        """
+            Args:
+                model_name (str): Cross-encoder checkpoint (query, passage) -> relevance score
+                batch_size (int): Pairs per predict() call
+                budget_ms (float): Maximum time spent reranking one query (0 disables the budget)
+                max_length (int): Token truncation of each (query, passage) pair
+                model: Optional pre-loaded model exposing predict(pairs)
+        """
+        self.model = model if model is not None else self.load_model(model_name, max_length)
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.budget = budget_ms / 1000
+
+        self._lock = threading.Lock()
+        # Moving average of one batch's scoring time, used to stop before the budget is blown
+        self._batch_seconds: Optional[float] = None
+        self.calls = 0
+        self.fallbacks = 0
+        self.total_seconds = 0.0
+
+    @staticmethod
+    def load_model(model_name: str = DEFAULT_RERANK_MODEL, max_length: int = 256):
+        """Loads the cross-encoder on CPU, falling back to the local Hugging Face cache when offline."""
+        from sentence_transformers import CrossEncoder
+
+        try:
+            return CrossEncoder(model_name, device='cpu', max_length=max_length)
+        except Exception as e:
+            logger.warning(f"Network error({e}). Loading reranker from LOCAL CACHE only.")
+            return CrossEncoder(model_name, device='cpu', max_length=max_length, local_files_only=True)
+
+    def rerank(self, query: str, results: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+        """
+            Returns the top_k results by cross-encoder score (added as "rerank_score"),
+            or the first top_k results unchanged if the latency budget ran out.
+        """
+        if len(results) <= 1:
+            return results[:top_k]
+
+        start = time.perf_counter()
+        scores: List[float] = []
+        for i in range(0, len(results), self.batch_size):
+            # The first batch always runs, which keeps the batch time estimate up to date
+            elapsed = time.perf_counter() - start
+            if i and self.budget and elapsed + self._batch_seconds > self.budget:
+                break
+            batch_start = time.perf_counter()
+            pairs = [(query, r["content"]) for r in results[i : i + self.batch_size]]
+            scores.extend(float(s) for s in self.model.predict(pairs, batch_size=self.batch_size))
+            self._observe_batch(time.perf_counter() - batch_start)
+
+        elapsed = time.perf_counter() - start
+        complete = len(scores) == len(results) and not (self.budget and elapsed > self.budget)
+        with self._lock:
+            self.calls += 1
+            self.total_seconds += elapsed
+            if not complete:
+                self.fallbacks += 1
+
+        if not complete:
+            logger.warning(f"Rerank budget exceeded ({elapsed * 1000:.0f}ms), keeping vector order")
+            return results[:top_k]
+
+        order = sorted(range(len(results)), key=lambda i: scores[i], reverse=True)[:top_k]
+        return [{**results[i], "rerank_score": scores[i]} for i in order]
+
+    def _observe_batch(self, seconds: float):
+        with self._lock:
+            previous = self._batch_seconds
+            self._batch_seconds = seconds if previous is None else 0.8 * previous + 0.2 * seconds
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "budget_ms": self.budget * 1000,
+            "calls": self.calls,
+            "fallbacks": self.fallbacks,
+            "mean_ms": self.total_seconds / self.calls * 1000 if self.calls else 0.0,
+            "batch_ms": (self._batch_seconds or 0.0) * 1000
+        }
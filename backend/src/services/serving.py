@@ -0,0 +1,112 @@
+import os
+import gc
+import sys
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: the write lock only serializes writers inside one process
+    fcntl = None
+
+from .encoders import create_encoder
+
+logger = logging.getLogger("Serving")
+
+# Read-only models loaded in the gunicorn master before the workers are forked (see gunicorn.conf.py)
+_shared: Dict[str, Any] = {}
+
+def preload():
+    """
+        Loads the read-only models once, in the gunicorn master (preload_app), before the workers are forked.
+        Workers then share the weight pages copy-on-write instead of each loading its own copy.
+        Nothing is encoded here: PyTorch thread pools must only start after the fork.
+    """
+    if _shared:
+        return
+    start = time.perf_counter()
+    backend = os.getenv("EMBEDDING_BACKEND", "torch")
+    if backend == "torch":
+        _shared["encoder"] = create_encoder(backend)
+    else:
+        # ONNX Runtime starts its thread pools when the session is created, which a fork would break
+        logger.info(f"Embedding backend '{backend}' is loaded by each worker after the fork")
+
+    if os.getenv("RERANK_ENABLED", "0") == "1":
+        from .reranker import CrossEncoderReranker, DEFAULT_RERANK_MODEL
+        _shared["rerank_model"] = CrossEncoderReranker.load_model(os.getenv("RERANK_MODEL", DEFAULT_RERANK_MODEL))
+
+    # Moving everything allocated so far out of the GC's reach: collections in the workers
+    # would otherwise write to these objects' headers and un-share their pages
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Preloaded {sorted(_shared)} in {time.perf_counter() - start:.1f}s")
+
+def shared(name: str) -> Optional[Any]:
+    """A model preloaded by the master ("encoder" or "rerank_model"), or None when serving without preload."""
+    return _shared.get(name)
+
+def after_fork(workers: int):
+    """
+        Per-worker setup: splits the CPU cores between the workers, so N workers x N threads
+        don't oversubscribe the machine (EMBEDDING_THREADS overrides the split).
+    """
+    threads = int(os.getenv("EMBEDDING_THREADS", "0")) or max(1, (os.cpu_count() or 1) // max(1, workers))
+    # Read by create_encoder() when the worker builds its own ONNX session
+    os.environ["EMBEDDING_THREADS"] = str(threads)
+    if "torch" in sys.modules:
+        import torch
+        torch.set_num_threads(threads)
+
+class WriteLock:
+    """
+        Exclusive lock serializing index writes across processes (flock on a lock file): whichever process
+        holds it is the single ingestion owner, serving workers only read. Reentrant within a process,
+        so a pipeline run can hold it while the add/delete calls it makes acquire it again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+
+    @property
+    def depth(self) -> int:
+        """Nesting level of the calling process' hold on the lock (0 when not held)."""
+        return self._depth
+
+    def acquire(self):
+        self._lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    logger.info(f"Waiting for another process to finish writing ({self.path})...")
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+            except BaseException:
+                os.close(fd)
+                self._lock.release()
+                raise
+            self._fd = fd
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
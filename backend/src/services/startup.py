@@ -0,0 +1,95 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+from . import serving
+
+logger = logging.getLogger("Startup")
+logger.setLevel(logging.INFO)
+
+class Readiness:
+    """
+        Startup state of each component ("loading", "ready" or "failed", with its load time),
+        reported by the /ready endpoint.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.components: Dict[str, Dict[str, Any]] = {}
+        self.done = False
+
+    def run(self, name: str, load: Callable, *args) -> Any:
+        """Runs one loading step, recording its duration and outcome (errors are recorded and re-raised)."""
+        with self._lock:
+            self.components[name] = {"status": "loading", "seconds": None, "error": None}
+        start = time.perf_counter()
+        try:
+            result = load(*args)
+        except Exception as e:
+            with self._lock:
+                self.components[name].update(status="failed", seconds=time.perf_counter() - start, error=str(e))
+            logger.error(f"Failed to load {name}: {e}")
+            raise
+        with self._lock:
+            self.components[name].update(status="ready", seconds=time.perf_counter() - start)
+        logger.info(f"{name} ready in {time.perf_counter() - start:.2f}s")
+        return result
+
+    @property
+    def failed(self) -> bool:
+        return any(c["status"] == "failed" for c in self.components.values())
+
+    @property
+    def ready(self) -> bool:
+        return self.done and not self.failed
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            components = {name: dict(state) for name, state in self.components.items()}
+        return {
+            "ready": self.ready,
+            "uptime_seconds": time.time() - self.started_at,
+            "components": components
+        }
+
+def _load_encoder():
+    """The embedding model (preloaded by the gunicorn master, if any), warmed up with a dummy batch."""
+    from .encoders import create_encoder
+
+    encoder = serving.shared("encoder") or create_encoder()
+    encoder.encode(["warm-up", "Erro 101: o sistema não liga"])
+    return encoder
+
+def _load_reranker():
+    from .chat_service import create_reranker
+
+    reranker = create_reranker()
+    if reranker:
+        reranker.model.predict([("warm-up", "warm-up")])
+    return reranker
+
+def build_chat_service(readiness: Readiness, collection_name: str = "technical_manuals"):
+    """
+        Builds the ChatService with its independent parts loaded concurrently: the embedding model,
+        the Chroma client + BM25 index, the reranker and the LLM client. The vector index is then
+        warmed up with one query, so the first request doesn't pay for lazy loading.
+    """
+    from .vector_store import VectorDB
+    from .chat_service import ChatService
+    from .llm_gateway import create_llm_model
+
+    with ThreadPoolExecutor(max_workers=4, thread_name_prefix="startup") as pool:
+        encoder = pool.submit(readiness.run, "encoder", _load_encoder)
+        lexical_index = pool.submit(readiness.run, "index", VectorDB.preload_index, collection_name)
+        reranker = pool.submit(readiness.run, "reranker", _load_reranker) if os.getenv("RERANK_ENABLED", "0") == "1" else None
+        model = pool.submit(readiness.run, "llm", create_llm_model)
+
+        vector_db = readiness.run(
+            "vector_db",
+            lambda: VectorDB(collection_name=collection_name, encoder=encoder.result(), lexical_index=lexical_index.result())
+        )
+        readiness.run("warm_up", vector_db.warm_up)
+        return ChatService(vector_db=vector_db, model=model.result(), reranker=reranker.result() if reranker else None)
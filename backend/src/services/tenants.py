@@ -0,0 +1,270 @@
+import gc
+import re
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from .vector_store import VectorDB
+from .query_cache import QueryCache
+
+logger = logging.getLogger("Tenants")
+logger.setLevel(logging.INFO)
+
+# Lower-case letters, digits and inner hyphens: no "_" or ".", so a tenant's collection ("tenant_<id>"), its
+# partitions ("tenant_<id>__...") and its chat session keys ("<id>.<session>") can't collide with another tenant's
+TENANT_ID_PATTERN = re.compile(r"^[a-z0-9](?:[a-z0-9-]{0,30}[a-z0-9])?$")
+COLLECTION_PREFIX = "tenant_"
+
+class TenantNotFound(Exception):
+    """Raised when a query names a tenant that has no collection yet (the API answers 404)."""
+
+class TenantBusy(Exception):
+    """Raised when a tenant is at its quota of queries in flight (the API answers 429)."""
+
+def check_tenant(tenant: str):
+    if not TENANT_ID_PATTERN.match(tenant):
+        raise ValueError("tenant must be 1-32 lower-case letters, digits or inner '-'")
+
+def tenant_collection(tenant: str) -> str:
+    """Chroma collection holding a tenant's manuals."""
+    check_tenant(tenant)
+    return f"{COLLECTION_PREFIX}{tenant}"
+
+class TenantIndex:
+    """
+        What a request reads for one tenant: its VectorDB and its answer cache (None when caching is off).
+        The default index (tenant None) is the collection requests without a tenant use.
+    """
+
+    def __init__(self, tenant: Optional[str], vector_db: VectorDB, cache: Optional[QueryCache]):
+        self.tenant = tenant
+        self.vector_db = vector_db
+        self.cache = cache
+        # Searches and ingestion jobs using the index: it is only closed once unused
+        self.users = 0
+
+class TenantRegistry:
+    """
+        Tenant-scoped collections, so the manual sets of different customers never mix: each tenant has its own
+        Chroma collection, BM25 index, manifest, answer cache and session namespace. Tenants are opened on first
+        use and kept in an LRU of `max_open` indexes; the least recently used idle one is closed past that, so
+        hundreds of tenants don't keep their indexes resident. Every tenant shares the default index's encoder,
+        embedding cache and query micro-batcher (see VectorDB.sibling).
+        Each tenant may have at most `max_queries` queries in flight, see admit(): past that, its queries are refused
+        with TenantBusy instead of taking the retrieval workers and LLM slots of the others. The default index is not
+        limited, so deployments without tenants serve as many concurrent chats as before.
+    """
+
+    def __init__(self, base: VectorDB, default_cache: Optional[QueryCache] = None,
+                 cache_factory: Optional[Callable[[], Optional[QueryCache]]] = None,
+                 max_open: int = 32, max_queries: int = 16, unload_after: Optional[int] = None):
+        """
+            Args:
+                base (VectorDB): The default index, whose encoder and caches the tenants share
+                default_cache (QueryCache): Answer cache of the default index
+                cache_factory (Callable): Builds the answer cache of a tenant when it is opened (None: no cache)
+                max_open (int): Tenant indexes kept open (the ones in use are never closed, so this can be exceeded)
+                max_queries (int): Queries in flight per tenant before new ones are refused, 0 disables the quota
+                unload_after (int): Closed tenants whose indexes Chroma may keep loaded before they are unloaded
+                    (see _unload()), `max_open` by default; 0 never unloads them
+        """
+        self.base = base
+        self.default = TenantIndex(None, base, default_cache)
+        self.cache_factory = cache_factory
+        self.max_open = max(1, max_open)
+        self.max_queries = max_queries
+        self.unload_after = self.max_open if unload_after is None else unload_after
+
+        self._indexes: "OrderedDict[str, TenantIndex]" = OrderedDict()
+        self._opening: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        # Set while the Chroma System is replaced (see _unload()): tenant indexes are acquired once it is over
+        self._unloaded = threading.Condition(self._lock)
+        self._unloading = False
+        # Queries in flight and refused, per tenant (None: the default index)
+        self._queries: Dict[Optional[str], int] = {}
+        self.rejected: Dict[Optional[str], int] = {}
+        self.opened = 0
+        self.evicted = 0
+        self.unloads = 0
+        self._evicted_at_unload = 0
+
+    def exists(self, tenant: str) -> bool:
+        """Whether the tenant has a collection (created by its first ingestion, in any process)."""
+        name = tenant_collection(tenant)
+        if tenant in self._indexes:
+            return True
+        # Chroma < 0.6 lists collection objects, newer versions their names
+        return any(getattr(c, "name", c) == name for c in self.base.client.list_collections())
+
+    def _acquire(self, tenant: Optional[str], create: bool) -> TenantIndex:
+        if tenant is None:
+            with self._lock:
+                self.default.users += 1
+            return self.default
+        check_tenant(tenant)
+
+        with self._lock:
+            while self._unloading:
+                self._unloaded.wait()
+            index = self._indexes.get(tenant)
+            if index is not None:
+                index.users += 1
+                self._indexes.move_to_end(tenant)
+                return index
+            opening = self._opening.setdefault(tenant, threading.Lock())
+
+        # Opening (loading the BM25 index...) outside the registry lock, once per tenant
+        try:
+            with opening:
+                with self._lock:
+                    index = self._indexes.get(tenant)
+                    if index is not None:
+                        index.users += 1
+                        self._indexes.move_to_end(tenant)
+                        return index
+                if not create and not self.exists(tenant):
+                    raise TenantNotFound(f"Unknown tenant '{tenant}': it has no ingested manuals")
+
+                logger.info(f"Opening tenant '{tenant}'...")
+                index = TenantIndex(tenant, self.base.sibling(tenant_collection(tenant)),
+                                    self.cache_factory() if self.cache_factory else None)
+                with self._lock:
+                    # Another thread may have opened it after a failed attempt released the opening lock
+                    current = self._indexes.get(tenant)
+                    if current is None:
+                        index.users = 1
+                        self._indexes[tenant] = index
+                        self.opened += 1
+                        evicted = self._evict()
+                    else:
+                        evicted, index = [index], current
+                        index.users += 1
+                        self._indexes.move_to_end(tenant)
+        finally:
+            with self._lock:
+                if self._opening.get(tenant) is opening:
+                    del self._opening[tenant]
+        self._close(evicted)
+        return index
+
+    def _release(self, index: TenantIndex):
+        with self._lock:
+            index.users -= 1
+            evicted = self._evict() if index.tenant is not None else []
+        self._close(evicted)
+        self._unload()
+
+    def _unload(self):
+        """
+            Closing a tenant doesn't unload its HNSW index: Chroma keeps the index of every collection it queried
+            until its System goes away (capping Chroma's own index cache isn't safe, it loses indexes not persisted
+            yet). Once `unload_after` tenants were closed, the System is replaced, at a moment when no index is in use,
+            so at most `max_open` + `unload_after` tenant indexes stay loaded; the open ones reload from disk.
+            The registry lock is only held to check that and flag the swap: meanwhile tenant indexes wait in _acquire(),
+            while the default index keeps serving (its searches move to the new System when it is ready).
+        """
+        with self._lock:
+            if self._unloading or not self.unload_after or self.evicted - self._evicted_at_unload < self.unload_after:
+                return
+            if self.default.users or self._opening or any(index.users for index in self._indexes.values()):
+                return
+            self._unloading = True
+            closed = self.evicted - self._evicted_at_unload
+            self._evicted_at_unload = self.evicted
+            indexes = list(self._indexes.values())
+
+        try:
+            logger.info(f"Unloading the indexes of {closed} closed tenants")
+            self.base.unload_indexes()
+            # Moving the open tenants to the new System now, so nothing holds the old one
+            for index in indexes:
+                index.vector_db.refresh()
+        finally:
+            with self._lock:
+                self._unloading = False
+                self.unloads += 1
+                self._unloaded.notify_all()
+        # Chroma's System is only freed with its reference cycles
+        gc.collect()
+
+    def _evict(self) -> List[TenantIndex]:
+        """Takes the least recently used idle indexes out of the LRU (called with the lock held)."""
+        evicted = []
+        for tenant in list(self._indexes):
+            if len(self._indexes) <= self.max_open:
+                break
+            if self._indexes[tenant].users == 0:
+                evicted.append(self._indexes.pop(tenant))
+        self.evicted += len(evicted)
+        return evicted
+
+    def _close(self, indexes: List[TenantIndex]):
+        for index in indexes:
+            logger.info(f"Closing idle tenant '{index.tenant}'")
+            index.vector_db.close()
+
+    @contextmanager
+    def use(self, tenant: Optional[str], create: bool = False) -> Iterator[TenantIndex]:
+        """
+            The index of a tenant (the default one for None), kept open while in use. Opening a tenant blocks
+            (it loads its BM25 index): async callers use it from a worker thread.
+            Args:
+                tenant (str): Tenant ID, see check_tenant()
+                create (bool): Creates the tenant's collection if needed (ingestion); otherwise an unknown tenant
+                    raises TenantNotFound
+        """
+        index = self._acquire(tenant, create)
+        try:
+            yield index
+        finally:
+            self._release(index)
+
+    @contextmanager
+    def admit(self, tenant: Optional[str]) -> Iterator[None]:
+        """
+            Wraps one query of a tenant (from retrieval to the end of generation), refusing it with TenantBusy
+            when the tenant already has `max_queries` in flight. Never blocks; queries of the default index
+            (tenant None) are counted but never refused.
+        """
+        if tenant is not None:
+            check_tenant(tenant)
+        with self._lock:
+            in_flight = self._queries.get(tenant, 0)
+            if tenant is not None and self.max_queries and in_flight >= self.max_queries:
+                self.rejected[tenant] = self.rejected.get(tenant, 0) + 1
+                raise TenantBusy(f"Tenant '{tenant or 'default'}' already has {in_flight} queries in flight")
+            self._queries[tenant] = in_flight + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._queries[tenant] -= 1
+                if not self._queries[tenant]:
+                    del self._queries[tenant]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            open_tenants = {tenant: {"collection": index.vector_db.collection_name, "users": index.users}
+                            for tenant, index in self._indexes.items()}
+            queries = {tenant or "(default)": count for tenant, count in self._queries.items()}
+            rejected = {tenant or "(default)": count for tenant, count in self.rejected.items()}
+        return {
+            "open": len(open_tenants),
+            "max_open": self.max_open,
+            "max_queries": self.max_queries,
+            "opened": self.opened,
+            "evicted": self.evicted,
+            "unloads": self.unloads,
+            "open_tenants": open_tenants,
+            "queries_in_flight": queries,
+            "rejected_queries": rejected
+        }
+
+    def close(self):
+        """Closes every open tenant index (the default one belongs to the ChatService)."""
+        with self._lock:
+            indexes = list(self._indexes.values())
+            self._indexes.clear()
+        self._close(indexes)
@@ -1,9 +1,105 @@
 import os
+import re
+import time
+import shutil
+import hashlib
 import logging
-import chromadb
-import pandas as pd
-from typing import List, Dict, Any
-from sentence_transformers import SentenceTransformer
+import threading
+import numpy as np
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple, TYPE_CHECKING
+from .compact_store import CompactVectorStore, SPACES
+from .embedding_batcher import EmbeddingBatcher
+from .embedding_cache import EmbeddingCache
+from .encoders import Encoder, create_encoder
+from .lexical_index import BM25Index
+from .serving import WriteLock
+from . import metrics
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Chroma database, lexical indexes, caches and ingestion state
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../data"))
+
+RETRIEVAL_MODES = ("dense", "lexical", "hybrid")
+# Where dense vectors live: in Chroma's HNSW index, or in a CompactVectorStore next to it
+# (quantized codes with exact re-scoring, or float32 for exact brute-force search)
+VECTOR_STORES = ("chroma", "compact", "exact")
+# Index settings and their Chroma HNSW names: distance space, graph degree, build and search beam widths
+HNSW_SETTINGS = {"space": "space", "M": "max_neighbors", "ef_construction": "ef_construction", "ef_search": "ef_search"}
+# Chunk metadata fields that can be used in search filters
+FILTER_FIELDS = ("source", "page", "product", "version", "section")
+
+# Chroma shares one System (and its loaded HNSW segments) between the clients of a path. Reopening the index
+# replaces the path's System and bumps its generation: the other VectorDBs on the path (tenant siblings, ...)
+# move to the new System before their next search, see refresh()
+_system_lock = threading.Lock()
+_system_generations: Dict[str, int] = {}
+
+def build_where(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+        Translates search filters into a Chroma `where` clause. Lists mean "any of":
+        {"product": "X-1000", "page": [1, 2]} -> {"$and": [{"product": "X-1000"}, {"page": {"$in": [1, 2]}}]}
+    """
+    if not filters:
+        return None
+    clauses = []
+    for field, value in filters.items():
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Unknown filter field '{field}', expected one of {FILTER_FIELDS}")
+        if isinstance(value, (list, tuple)):
+            if not value:
+                raise ValueError(f"Empty value list for filter '{field}'")
+            clauses.append({field: {"$in": list(value)}})
+        else:
+            clauses.append({field: value})
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def index_config_from_env() -> Dict[str, Any]:
+    """Index settings from VECTOR_SPACE, HNSW_M, HNSW_EF_CONSTRUCTION and HNSW_EF_SEARCH (unset ones keep Chroma's defaults)."""
+    config: Dict[str, Any] = {}
+    if os.getenv("VECTOR_SPACE"):
+        config["space"] = os.getenv("VECTOR_SPACE")
+    for key, name in (("M", "HNSW_M"), ("ef_construction", "HNSW_EF_CONSTRUCTION"), ("ef_search", "HNSW_EF_SEARCH")):
+        if os.getenv(name):
+            config[key] = int(os.getenv(name))
+    return config
+
+def check_index_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    for key, value in config.items():
+        if key not in HNSW_SETTINGS:
+            raise ValueError(f"Unknown index setting '{key}', expected one of {tuple(HNSW_SETTINGS)}")
+        if key == "space" and value not in SPACES:
+            raise ValueError(f"Unknown space '{value}', expected one of {SPACES}")
+        if key != "space" and (not isinstance(value, int) or value < 1):
+            raise ValueError(f"Index setting '{key}' must be a positive integer, got {value!r}")
+    return config
+
+def mmr_select(relevance: np.ndarray, embeddings: np.ndarray, k: int, lambda_mult: float) -> List[int]:
+    """
+        Maximal Marginal Relevance: greedily picks the candidate maximizing
+        lambda * relevance - (1 - lambda) * (highest cosine similarity to the candidates already picked).
+        lambda_mult=1 keeps the relevance order, lower values favor diversity. Returns candidate positions.
+    """
+    k = min(k, len(relevance))
+    if k <= 0:
+        return []
+    unit = embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+    similarity = unit @ unit.T
+
+    first = int(np.argmax(relevance))
+    selected = [first]
+    closest = similarity[first].copy()
+    available = np.ones(len(relevance), dtype=bool)
+    available[first] = False
+    while len(selected) < k:
+        scores = np.where(available, lambda_mult * relevance - (1 - lambda_mult) * closest, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(closest, similarity[best], out=closest)
+    return selected
 
 logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s',
@@ -12,9 +108,34 @@ logging.basicConfig(
 
 class VectorDB:
     """
-        Manages the Vector Database (ChromaDB) interactions using Local Embeddings (Sentence-Transformers)
+        Manages the Vector Database (ChromaDB) interactions using Local Embeddings (pluggable Encoder backends)
     """
-    def __init__(self, collection_name: str = "technical_manuals", verbose: bool = False):
+    def __init__(self, collection_name: str = "technical_manuals", verbose: bool = False,
+                 batch_window_ms: Optional[float] = None, max_batch_size: Optional[int] = None,
+                 retrieval_mode: Optional[str] = None, encoder: Optional[Encoder] = None,
+                 partition_field: Optional[str] = None, lexical_index: Optional[BM25Index] = None,
+                 vector_store: Optional[str] = None, index_config: Optional[Dict[str, Any]] = None,
+                 embedding_cache: Optional[EmbeddingCache] = None, query_batcher: Optional[EmbeddingBatcher] = None):
+        """
+            Args:
+                collection_name (str): ChromaDB collection to read from and write to
+                verbose (bool): Enables debug logging
+                batch_window_ms (float): Time window for coalescing concurrent query embeddings (env EMBED_BATCH_WINDOW_MS)
+                max_batch_size (int): Max queries per coalesced encode() call, 1 disables batching (env EMBED_MAX_BATCH_SIZE)
+                retrieval_mode (str): Default search mode: "dense", "lexical" or "hybrid" (env RETRIEVAL_MODE)
+                encoder (Encoder): Pre-loaded embedding backend (built from EMBEDDING_BACKEND when omitted)
+                partition_field (str): Metadata field whose values get their own collection, e.g. "product" (env PARTITION_FIELD)
+                lexical_index (BM25Index): BM25 index already loaded by preload_index() (loaded here when omitted)
+                vector_store (str): "chroma" (float32 vectors in Chroma's HNSW index), "compact" (int8/float16 vectors
+                    in a memory-mapped CompactVectorStore, see COMPACT_DTYPE) or "exact" (float32 brute force) (env VECTOR_STORE)
+                index_config (dict): Index settings over the environment's: "space" ("l2", "cosine" or "ip"), and for
+                    the chroma store HNSW's "M", "ef_construction" and "ef_search" (see index_config_from_env)
+                embedding_cache (EmbeddingCache): Cache shared with another VectorDB of the same encoder (see sibling())
+                query_batcher (EmbeddingBatcher): Query micro-batcher shared with another VectorDB (see sibling()),
+                    which keeps running when this one is closed
+            The store, space, M and ef_construction are fixed when a collection is created (rebuild_index() changes them);
+            ef_search is applied whenever the collection is opened.
+        """
         self.logger = logging.getLogger("VectorDB")
         if verbose:
             self.logger.setLevel(logging.DEBUG)
@@ -22,34 +143,597 @@ class VectorDB:
             self.logger.setLevel(logging.INFO)
 
         self.logger.debug("--- Starting VectorDB Initialization ---")
-        self.logger.info("Loading local embedding model (all-MiniLM-L6-v2)...")
-        try:
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2', device='cpu')
-        except Exception as e:
-            self.logger.warning(f"Network error({e}). Loading model from LOCAL CACHE only.")
-            self.embedding_model = SetenceTransformer('all-MiniLM-L6-v2', device='cpu', local_files_only=True)
+        if encoder is None:
+            self.logger.info("Loading local embedding model (all-MiniLM-L6-v2)...")
+            encoder = create_encoder()
+        self.encoder = encoder
+        self.model_name = encoder.name
 
-        db_path = os.path.join(os.path.dirname(__file__), "../../data/chroma_db")
+        self.collection_name = collection_name
+        self.data_dir = DATA_DIR
+        self.db_path = os.path.join(self.data_dir, "chroma_db")
 
         if not verbose:
             logging.getLogger("chromadb").setLevel(logging.ERROR)
 
-        self.client = chromadb.PersistentClient(path=db_path)
-        self.collection = self.client.get_or_create_collection(name=collection_name)
+        # Optional partitioning: one collection per value of `partition_field`, so queries filtered on it
+        # only search the matching partitions. Chunks without the field stay in the base collection.
+        self.partition_field = partition_field or os.getenv("PARTITION_FIELD") or None
+        self._partition_lock = threading.Lock()
+        self.configured_store = vector_store or os.getenv("VECTOR_STORE", "chroma")
+        if self.configured_store not in VECTOR_STORES:
+            raise ValueError(f"Unknown vector store '{self.configured_store}', expected one of {VECTOR_STORES}")
+        self.compact_dtype = os.getenv("COMPACT_DTYPE", "int8")
+        self.index_config = check_index_config({**index_config_from_env(), **(index_config or {})})
+        self._open_collections()
+        # Bumped on every write so caches built on top of search results know when to drop them
+        self.version = 0
+
+        # Multi-process serving: writes happen under a cross-process lock and are published with a stamp file
+        # on flush; readers (the other workers) reopen the index when the stamp changes, see refresh()
+        self.write_lock = WriteLock(os.path.join(self.data_dir, "locks", f"{collection_name}.lock"))
+        self.refresh_interval = float(os.getenv("INDEX_REFRESH_SECONDS", "5"))
+        self._stamp_path = os.path.join(self.data_dir, "locks", f"{collection_name}.stamp")
+        self._stamp = self._read_stamp()
+        self._stamp_checked = time.monotonic()
+        self._refresh_lock = threading.Lock()
+        self._unpublished = False
+
+        # Persistent embedding cache keyed by (model, text hash), shared by ingestion and search
+        cache_mb = int(os.getenv("EMBEDDING_CACHE_MB", "256"))
+        self.embedding_cache = embedding_cache
+        if embedding_cache is None and cache_mb > 0:
+            self.embedding_cache = EmbeddingCache(
+                os.path.join(self.data_dir, "embedding_cache"),
+                self.model_name,
+                self.encoder.dim,
+                max_bytes=cache_mb * 1024 * 1024
+            )
+
+        # BM25 inverted index for exact codes and part numbers, fused with dense results in hybrid mode
+        self.retrieval_mode = retrieval_mode or os.getenv("RETRIEVAL_MODE", "hybrid")
+        self.rrf_k = int(os.getenv("RRF_K", "60"))
+        self.lexical_weight = float(os.getenv("LEXICAL_WEIGHT", "1.0"))
+        # Maximal Marginal Relevance over MMR_CANDIDATES over-fetched results (MMR_LAMBDA empty = off by default)
+        self.mmr_lambda = float(os.getenv("MMR_LAMBDA")) if os.getenv("MMR_LAMBDA") else None
+        self.mmr_candidates = int(os.getenv("MMR_CANDIDATES", "20"))
+        self.lexical_index = lexical_index or BM25Index(self.lexical_index_path(collection_name))
+        if not len(self.lexical_index):
+            self._load_lexical_index()
+
+        # Micro-batching of query embeddings: concurrent searches share one encode() call
+        if batch_window_ms is None:
+            batch_window_ms = float(os.getenv("EMBED_BATCH_WINDOW_MS", "2"))
+        if max_batch_size is None:
+            max_batch_size = int(os.getenv("EMBED_MAX_BATCH_SIZE", "32"))
+        self.query_batcher = query_batcher
+        self._owns_batcher = query_batcher is None
+        if query_batcher is None and max_batch_size > 1:
+            self.query_batcher = EmbeddingBatcher(self._generate_query_embeddings, batch_window_ms, max_batch_size)
+
         self.logger.info("--- VectorDB Service initialized successfully! ---")
         
-    def _generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+    def _load_lexical_index(self, batch_size: int = 1000):
+        """
+            Loads the persisted BM25 index, or rebuilds it from the collection if it is missing
+            (e.g. a collection ingested before the lexical index existed).
+        """
+        if self.lexical_index.load():
+            return
+        total = self.count()
+        if not total:
+            return
+        self.logger.info(f"Building lexical index from {total} existing chunks...")
+        for collection in self._all_collections():
+            for offset in range(0, collection.count(), batch_size):
+                batch = collection.get(limit=batch_size, offset=offset, include=["documents"])
+                self.lexical_index.add(batch['ids'], batch['documents'])
+        self.lexical_index.save()
+
+    @staticmethod
+    def lexical_index_path(collection_name: str) -> str:
+        return os.path.join(DATA_DIR, "lexical", f"{collection_name}.pkl")
+
+    @staticmethod
+    def preload_index(collection_name: str = "technical_manuals") -> BM25Index:
         """
-            Generates embeddings locally.
+            The encoder-independent part of startup, which can run while the model loads: imports and opens
+            the Chroma client (cached per path, so the VectorDB built next reuses it) and loads the BM25 index.
         """
-        embeddings = self.embedding_model.encode(texts)
+        import chromadb
 
-        if len(embeddings.shape) == 1:
-            embeddings = embeddings.reshape(1, -1)
-        
-        return embeddings.tolist()
+        logging.getLogger("chromadb").setLevel(logging.ERROR)
+        chromadb.PersistentClient(path=os.path.join(DATA_DIR, "chroma_db"))
+        lexical_index = BM25Index(VectorDB.lexical_index_path(collection_name))
+        lexical_index.load()
+        return lexical_index
+
+    def sibling(self, collection_name: str, verbose: bool = False) -> "VectorDB":
+        """
+            Another collection with this one's settings, served by its encoder, embedding cache and query
+            micro-batcher: opening one (e.g. per tenant) adds no model, cache file or batching thread.
+        """
+        return VectorDB(
+            collection_name=collection_name,
+            verbose=verbose,
+            retrieval_mode=self.retrieval_mode,
+            encoder=self.encoder,
+            partition_field=self.partition_field,
+            vector_store=self.configured_store,
+            index_config=self.index_config,
+            embedding_cache=self.embedding_cache,
+            query_batcher=self.query_batcher
+        )
+
+    def warm_up(self):
+        """Runs one query per collection, so the first request doesn't pay for loading the vector index segments."""
+        if self.compact_store is not None:
+            self.compact_store.warm_up()
+            return
+        for collection in self._all_collections():
+            if collection.count():
+                collection.query(query_embeddings=[[0.0] * self.encoder.dim], n_results=1)
+
+    def _open_collections(self):
+        # Imported here so that startup can overlap Chroma's import with the model's (see preload_index)
+        import chromadb
+
+        with _system_lock:
+            self._system_generation = _system_generations.get(self.db_path, 0)
+            self.client = chromadb.PersistentClient(path=self.db_path)
+        self.collection = self.client.get_or_create_collection(
+            name=self.collection_name,
+            metadata={"vector_store": self.configured_store},
+            configuration=self._chroma_configuration(self.configured_store, self.index_config)
+        )
+        # The stores lay out a collection differently: a collection is read by the one it was built with
+        self.vector_store = (self.collection.metadata or {}).get("vector_store", "chroma")
+        if self.vector_store != self.configured_store:
+            if self.collection.count():
+                self.logger.warning(f"Collection '{self.collection_name}' was built with the {self.vector_store} vector store, "
+                                    f"not {self.configured_store}: rebuild_index.py converts it")
+            else:
+                self.collection.modify(metadata={"vector_store": self.configured_store})
+                self.vector_store = self.configured_store
+
+        self.compact_store = None
+        if self.vector_store != "chroma":
+            self.compact_store = CompactVectorStore(
+                self._compact_path(self.collection_name),
+                self.encoder.dim,
+                dtype="float32" if self.vector_store == "exact" else self.compact_dtype,
+                space=self.index_config.get("space", "l2"),
+                rescore_factor=int(os.getenv("COMPACT_RESCORE_FACTOR", "4"))
+            )
+        self.partitions: Dict[str, Any] = {}
+        self._chunk_partitions: Optional[Dict[str, Optional[str]]] = None
+        if self.partition_field:
+            for collection in self.client.list_collections():
+                value = (collection.metadata or {}).get("partition_value")
+                if value is not None and collection.name.startswith(f"{self.collection_name}__"):
+                    self.partitions[value] = collection
+        if self.vector_store == "chroma" and "ef_search" in self.index_config:
+            for collection in self._all_collections():
+                self._apply_ef_search(collection)
+
+    def _compact_path(self, collection_name: str) -> str:
+        return os.path.join(self.data_dir, "compact", collection_name)
+
+    @staticmethod
+    def _chroma_configuration(vector_store: str, index_config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """HNSW configuration of a new Chroma collection (only used by the chroma store: the others keep placeholders in it)."""
+        hnsw = {HNSW_SETTINGS[key]: value for key, value in index_config.items()}
+        return {"hnsw": hnsw} if vector_store == "chroma" and hnsw else None
+
+    def _apply_ef_search(self, collection: Any):
+        """Sets ef_search before the collection's index is loaded, which is when Chroma reads it."""
+        hnsw = (getattr(collection, "configuration", None) or {}).get("hnsw") or {}
+        if hnsw.get("ef_search") != self.index_config["ef_search"]:
+            collection.modify(configuration={"hnsw": {"ef_search": self.index_config["ef_search"]}})
+
+    def index_info(self) -> Dict[str, Any]:
+        """Vector store and index settings of the collection."""
+        if self.compact_store is not None:
+            return {"vector_store": self.vector_store, "dtype": self.compact_store.dtype, "space": self.compact_store.space}
+        hnsw = (getattr(self.collection, "configuration", None) or {}).get("hnsw") or {}
+        return {"vector_store": "chroma", **{key: hnsw.get(name, self.index_config.get(key)) for key, name in HNSW_SETTINGS.items()}}
+
+    def _reopen(self):
+        # Dropping this path's System (only) makes the new client read the segments from disk
+        with _system_lock:
+            systems = getattr(self.client, "_identifier_to_system", None)
+            identifier = getattr(self.client, "_identifier", None)
+            if systems is not None and identifier is not None:
+                systems.pop(identifier, None)
+            elif hasattr(self.client, "clear_system_cache"):
+                self.client.clear_system_cache()
+            _system_generations[self.db_path] = _system_generations.get(self.db_path, 0) + 1
+        self._open_collections()
+
+    def unload_indexes(self):
+        """
+            Unloads every HNSW index Chroma holds for this path, process-wide: Chroma keeps the index of each collection
+            queried until its System goes away, even once the VectorDB that queried it is closed. The path is reopened
+            (see _reopen()) and its VectorDBs reload their collections from disk when next used.
+        """
+        with self._refresh_lock:
+            self._reopen()
+
+    def set_ef_search(self, ef_search: int):
+        """
+            Changes HNSW's search beam width (recall vs latency) without a rebuild. The value is stored with the
+            collections, which this process reopens; other processes pick it up when they next reopen them,
+            unless their HNSW_EF_SEARCH says otherwise.
+        """
+        if self.vector_store != "chroma":
+            raise ValueError(f"ef_search only applies to the chroma vector store, not {self.vector_store}")
+        self.index_config = check_index_config({**self.index_config, "ef_search": ef_search})
+        with self._refresh_lock:
+            for collection in self._all_collections():
+                self._apply_ef_search(collection)
+            self._reopen()
+
+    def rebuild_index(self, vector_store: Optional[str] = None, index_config: Optional[Dict[str, Any]] = None,
+                      compact_dtype: Optional[str] = None, batch_size: int = 1000) -> Dict[str, Any]:
+        """
+            Offline rebuild of the collection with another vector store or index settings (by default the configured
+            ones), e.g. to change the space, M or ef_construction, which are fixed at creation. Every record (document,
+            metadata and float32 vector) is copied into staging collections built with the new settings, which then
+            replace the old ones. Runs as the single writer; the other processes reopen the index when it is published.
+            Returns {"chunks", "collections", "seconds", "index"}.
+        """
+        vector_store = vector_store or self.configured_store
+        if vector_store not in VECTOR_STORES:
+            raise ValueError(f"Unknown vector store '{vector_store}', expected one of {VECTOR_STORES}")
+        index_config = check_index_config({**self.index_config, **(index_config or {})})
+        compact_dtype = compact_dtype or self.compact_dtype
+        start = time.perf_counter()
+
+        with self.writing():
+            self.flush()
+            staging_path = self._compact_path(f"rebuild_{self.collection_name}")
+            shutil.rmtree(staging_path, ignore_errors=True)
+            staged_store = None
+            if vector_store != "chroma":
+                staged_store = CompactVectorStore(
+                    staging_path, self.encoder.dim, dtype="float32" if vector_store == "exact" else compact_dtype,
+                    space=index_config.get("space", "l2"), rescore_factor=int(os.getenv("COMPACT_RESCORE_FACTOR", "4"))
+                )
+
+            staged, copied = [], 0
+            for source in self._all_collections():
+                # Staging names don't start with "<collection>__", so they are never mistaken for partitions
+                staging_name = f"rebuild_{source.name}"
+                if staging_name in {collection.name for collection in self.client.list_collections()}:
+                    self.client.delete_collection(staging_name)    # Left over by an interrupted rebuild
+                metadata = {k: v for k, v in (source.metadata or {}).items() if not k.startswith("hnsw:")}
+                target = self.client.create_collection(
+                    name=staging_name,
+                    metadata={**metadata, "vector_store": vector_store},
+                    configuration=self._chroma_configuration(vector_store, index_config)
+                )
+                include = ["documents", "metadatas"] + ([] if self.compact_store is not None else ["embeddings"])
+                for offset in range(0, source.count(), batch_size):
+                    batch = source.get(limit=batch_size, offset=offset, include=include)
+                    if self.compact_store is not None:
+                        vectors = self.compact_store.get(batch['ids'])
+                    else:
+                        vectors = np.asarray(batch['embeddings'], dtype=np.float32)
+                    if staged_store is not None:
+                        vectors = staged_store.upsert(batch['ids'], vectors).astype(np.float32)[:, None]
+                    target.add(ids=batch['ids'], documents=batch['documents'], metadatas=batch['metadatas'], embeddings=vectors)
+                    copied += len(batch['ids'])
+                staged.append((source.name, target))
+            if staged_store is not None:
+                staged_store.flush()
+
+            # Swapping the staging collections (and vectors) in
+            with self._refresh_lock:
+                for name, target in staged:
+                    self.client.delete_collection(name)
+                    target.modify(name=name)
+                shutil.rmtree(self._compact_path(self.collection_name), ignore_errors=True)
+                if staged_store is not None:
+                    os.replace(staging_path, self._compact_path(self.collection_name))
+                self.configured_store, self.index_config, self.compact_dtype = vector_store, index_config, compact_dtype
+                self._reopen()
+                self.version += 1
+            self._publish()
+
+        return {"chunks": copied, "collections": len(staged), "seconds": time.perf_counter() - start, "index": self.index_info()}
+
+    def _read_stamp(self) -> Optional[str]:
+        try:
+            with open(self._stamp_path, "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def _publish(self):
+        """Tells the readers in other processes that the index changed."""
+        stamp = f"{time.time_ns()}:{os.getpid()}"
+        tmp_path = f"{self._stamp_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(stamp)
+        os.replace(tmp_path, self._stamp_path)
+        self._stamp = stamp
+        self._unpublished = False
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+            Picks up writes flushed by another process (the ingestion owner): when its stamp changed,
+            reopens the Chroma collections and reloads the lexical index. The stamp is read at most
+            every `refresh_interval` seconds (INDEX_REFRESH_SECONDS, 0 disables) unless `force` is set.
+            Also moves to the path's new Chroma System when another VectorDB of this process reopened it.
+            Returns True when the index was reloaded.
+        """
+        if self._system_generation != _system_generations.get(self.db_path, 0):
+            # Another VectorDB of this process reopened the path: following it onto the new System
+            with self._refresh_lock:
+                if self._system_generation != _system_generations.get(self.db_path, 0):
+                    self._open_collections()
+        now = time.monotonic()
+        if not force and (self.refresh_interval <= 0 or now - self._stamp_checked < self.refresh_interval):
+            return False
+        self._stamp_checked = now
+        stamp = self._read_stamp()
+        if stamp == self._stamp:
+            return False
+
+        with self._refresh_lock:
+            if stamp == self._stamp:
+                return False
+            self.logger.info("Index updated by another process, reloading...")
+            self._reopen()
+            lexical_index = BM25Index(self.lexical_index.path)
+            lexical_index.load()
+            self.lexical_index = lexical_index
+            self._stamp = stamp
+            self.version += 1
+        return True
+
+    @contextmanager
+    def writing(self):
+        """
+            Holds the cross-process write lock, making this process the ingestion owner until it exits.
+            The outermost acquisition first catches up with writes made by the previous owner.
+            Writes become visible to other processes on flush().
+        """
+        with self.write_lock:
+            if self.write_lock.depth == 1:
+                self.refresh(force=True)
+            yield
+
+    def _all_collections(self) -> List[Any]:
+        return [self.collection] + list(self.partitions.values())
+
+    def count(self) -> int:
+        """Number of chunks across every partition."""
+        return sum(collection.count() for collection in self._all_collections())
+
+    def _partition(self, value: Any) -> Any:
+        """Collection holding the chunks whose partition field equals `value` (created on first use)."""
+        if value is None:
+            return self.collection
+        key = str(value)
+        with self._partition_lock:
+            collection = self.partitions.get(key)
+            if collection is None:
+                slug = re.sub(r"[^a-zA-Z0-9_-]+", "-", key).strip("-_")[:40]
+                digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:8]
+                collection = self.client.get_or_create_collection(
+                    name=f"{self.collection_name}__{slug}_{digest}",
+                    metadata={"partition_field": self.partition_field, "partition_value": key, "vector_store": self.vector_store},
+                    configuration=self._chroma_configuration(self.vector_store, self.index_config)
+                )
+                self.partitions[key] = collection
+            return collection
+
+    def _target_collections(self, filters: Optional[Dict[str, Any]]) -> Tuple[List[Any], Optional[Dict[str, Any]]]:
+        """
+            Collections a search with `filters` must scan, and the filters left for the `where` clause
+            (a filter on the partition field is answered by the partition choice itself).
+        """
+        if not self.partition_field:
+            return [self.collection], filters
+        if not filters or self.partition_field not in filters:
+            return self._all_collections(), filters
+
+        values = filters[self.partition_field]
+        values = values if isinstance(values, (list, tuple)) else [values]
+        remaining = {field: value for field, value in filters.items() if field != self.partition_field}
+        return [self.partitions[str(v)] for v in values if str(v) in self.partitions], remaining
+
+    def _encode(self, texts: List[str], cache_writes: bool = True) -> np.ndarray:
+        """
+            Encodes texts, only running the model on texts missing from the embedding cache.
+        """
+        if not self.embedding_cache:
+            with metrics.stage("encode"):
+                return self.encoder.encode(texts)
+
+        embeddings, missing = self.embedding_cache.lookup(texts)
+        if missing:
+            # Boilerplate repeats inside a batch too: encoding each distinct text once
+            unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+            with metrics.stage("encode"):
+                computed = self.encoder.encode(unique_texts)
+            position = {text: row for row, text in enumerate(unique_texts)}
+            embeddings[missing] = computed[[position[texts[i]] for i in missing]]
+            if cache_writes:
+                self.embedding_cache.store(unique_texts, computed)
+        return embeddings
 
-    def add_documents(self, df: pd.DataFrame, batch_size: int = 50):
+    def _generate_query_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+            Query embeddings read the cache but never write to it: documents own the cache slots,
+            and one-off queries would only evict them.
+        """
+        return self._encode(texts, cache_writes=False).tolist()
+
+    def embed_query(self, query: str) -> List[float]:
+        """
+            Embeds a single query, through the micro-batcher when enabled.
+        """
+        with metrics.stage("embed"):
+            if self.query_batcher:
+                return self.query_batcher.encode(query)
+            return self._generate_query_embeddings([query])[0]
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+            Embeds many queries in one encoder batch (bulk callers bypass the micro-batcher).
+        """
+        with metrics.stage("embed"):
+            return self._generate_query_embeddings(queries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Runtime statistics of the retrieval layer."""
+        return {
+            "embedding_batcher": self.query_batcher.stats() if self.query_batcher else None,
+            "embedding_cache": self.embedding_cache.stats() if self.embedding_cache else None,
+            "partitions": len(self.partitions) if self.partition_field else None,
+            "compact_store": self.compact_store.stats() if self.compact_store is not None else None,
+            "index": self.index_info()
+        }
+
+    def close(self):
+        """Stops background helpers (a shared query batcher keeps running for its owner)."""
+        if self.query_batcher and self._owns_batcher:
+            self.query_batcher.close()
+        self.flush()
+
+    def flush(self):
+        """Persists the on-disk side structures (lexical index, embedding cache, compact vectors)."""
+        if self.compact_store is not None and self._unpublished:
+            self.compact_store.flush()
+        if self.lexical_index.dirty:
+            self.lexical_index.save()
+        if self.embedding_cache:
+            self.embedding_cache.flush()
+        if self._unpublished:
+            self._publish()
+
+    def add_chunks(self, chunks: List[Dict[str, Any]], embeddings: Optional[np.ndarray] = None):
+        """
+            Embeds and upserts one batch of chunk records ({"id", "text", ...metadata fields}).
+            Every other key of a record is stored as Chroma metadata.
+            Precomputed `embeddings` (one per chunk) skip the encoder.
+            The float32 matrix goes to the vector store as is, without a round trip through Python lists.
+        """
+        if not chunks:
+            return
+
+        # Preparing data for Chroma
+        ids = [c['id'] for c in chunks]
+        documents = [c['text'] for c in chunks]
+        metadatas = [
+            {k: v for k, v in c.items() if k not in ('id', 'text') and v is not None and not (isinstance(v, float) and np.isnan(v))}
+            for c in chunks
+        ]
+
+        # Generating embeddings locally
+        if embeddings is None:
+            with metrics.stage("ingest_embed"):
+                embeddings = self._encode(documents)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+
+        # Upsert (update or insert)
+        with self.writing():
+            if self.compact_store is not None:
+                with metrics.stage("ingest_compact"):
+                    rows = self.compact_store.upsert(ids, embeddings)
+                # Chroma keeps documents and metadata but needs a vector per record: a 1-d placeholder,
+                # the row in the compact store (distinct values keep its HNSW graph well-formed)
+                embeddings = rows.astype(np.float32)[:, None]
+            with metrics.stage("ingest_upsert"):
+                if not self.partition_field:
+                    self.collection.upsert(
+                        ids=ids,
+                        documents=documents,
+                        embeddings=embeddings,
+                        metadatas=metadatas
+                    )
+                else:
+                    self._upsert_partitioned(ids, documents, embeddings, metadatas)
+            with metrics.stage("ingest_lexical"):
+                self.lexical_index.add(ids, documents)
+            self.version += 1
+            self._unpublished = True
+
+    def _partition_map(self, batch_size: int = 5000) -> Dict[str, Optional[str]]:
+        """
+            Partition value (None for the base collection) of every stored chunk, keyed by chunk id.
+            Read from Chroma on the first partitioned write after the collections were (re)opened, then kept up to date by the writes.
+        """
+        if self._chunk_partitions is None:
+            chunk_partitions: Dict[str, Optional[str]] = {}
+            for key, collection in [(None, self.collection)] + list(self.partitions.items()):
+                for offset in range(0, collection.count(), batch_size):
+                    for chunk_id in collection.get(limit=batch_size, offset=offset, include=[])['ids']:
+                        chunk_partitions[chunk_id] = key
+            self._chunk_partitions = chunk_partitions
+        return self._chunk_partitions
+
+    def _upsert_partitioned(self, ids: List[str], documents: List[str], embeddings: np.ndarray, metadatas: List[Dict]):
+        chunk_partitions = self._partition_map()
+        groups: Dict[int, Tuple[Any, List[int]]] = {}
+        keys: List[Optional[str]] = []
+        for i, metadata in enumerate(metadatas):
+            value = metadata.get(self.partition_field)
+            keys.append(None if value is None else str(value))
+            collection = self._partition(value)
+            groups.setdefault(id(collection), (collection, []))[1].append(i)
+
+        for collection, rows in groups.values():
+            collection.upsert(
+                ids=[ids[i] for i in rows],
+                documents=[documents[i] for i in rows],
+                embeddings=embeddings[rows],
+                metadatas=[metadatas[i] for i in rows]
+            )
+        # A chunk whose partition value changed must not stay behind in its old partition
+        moved: Dict[Optional[str], List[str]] = {}
+        for chunk_id, key in zip(ids, keys):
+            previous = chunk_partitions.get(chunk_id, key)
+            if previous != key:
+                moved.setdefault(previous, []).append(chunk_id)
+            chunk_partitions[chunk_id] = key
+        for previous, stale in moved.items():
+            collection = self.collection if previous is None else self.partitions.get(previous)
+            if collection is not None:
+                collection.delete(ids=stale)
+
+    def delete_chunks(self, ids: List[str], batch_size: int = 500):
+        """
+            Removes chunks by ID (e.g. pages that vanished from a re-ingested manual).
+        """
+        if not ids:
+            return
+        with self.writing():
+            if not self.partition_field:
+                for i in range(0, len(ids), batch_size):
+                    self.collection.delete(ids=ids[i : i + batch_size])
+            else:
+                # Each chunk is deleted from the one partition holding it
+                chunk_partitions = self._partition_map()
+                located: Dict[Optional[str], List[str]] = {}
+                for chunk_id in ids:
+                    if chunk_id in chunk_partitions:
+                        located.setdefault(chunk_partitions.pop(chunk_id), []).append(chunk_id)
+                for key, chunk_ids in located.items():
+                    collection = self.collection if key is None else self.partitions.get(key)
+                    if collection is None:
+                        continue
+                    for i in range(0, len(chunk_ids), batch_size):
+                        collection.delete(ids=chunk_ids[i : i + batch_size])
+            if self.compact_store is not None:
+                self.compact_store.delete(ids)
+            self.lexical_index.remove(ids)
+            self.version += 1
+            self._unpublished = True
+
+    def add_documents(self, df: "pd.DataFrame", batch_size: int = 50):
         """
             Ingests a DataFrame of text chunks into the Vector Database.
         """
@@ -60,66 +744,298 @@ class VectorDB:
         total_chunks = len(df)
         self.logger.info(f"Starting ingestion of {total_chunks} chunks into ChromaDB...")
         
-        # Process in batches
-        for i in range(0, total_chunks, batch_size):
-            batch = df.iloc[i : i + batch_size]
-            
-            # Preparing data for Chroma
-            ids = batch['id'].tolist()
-            documents = batch['text'].tolist()
-            metadatas = batch[['source', 'page', 'char_count']].to_dict('records')
-            
-            # Generating embeddings locally
-            try:
-                embeddings = self._generate_embeddings(documents)
-                
-                # Upsert (update or insert)
-                self.collection.upsert(
-                    ids=ids,
-                    documents=documents,
-                    embeddings=embeddings,
-                    metadatas=metadatas
-                )
-                self.logger.debug(f"Processed batch {i} to {min(i + batch_size, total_chunks)}")
-            except Exception as e:
-                self.logger.error(f"Error processing batch {i}: {e}")
-                raise e
+        # Process in batches, as the single writer until the flush publishes them
+        with self.writing():
+            for i in range(0, total_chunks, batch_size):
+                batch = df.iloc[i : i + batch_size]
+
+                # Generating embeddings locally and upserting
+                try:
+                    self.add_chunks(batch.to_dict('records'))
+                    self.logger.debug(f"Processed batch {i} to {min(i + batch_size, total_chunks)}")
+                except Exception as e:
+                    self.logger.error(f"Error processing batch {i}: {e}")
+                    raise e
 
+            self.flush()
         self.logger.info("Ingestion completed.")
     
-    def search(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
+    def _dense_search(self, query_vector: List[float], n_results: int, filters: Optional[Dict[str, Any]] = None,
+                      embeddings: bool = False) -> List[Dict[str, Any]]:
+        return self._dense_search_many([query_vector], n_results, filters, embeddings)[0]
+
+    def _dense_search_many(self, query_vectors: List[List[float]], n_results: int,
+                           filters: Optional[Dict[str, Any]] = None, embeddings: bool = False) -> List[List[Dict[str, Any]]]:
         """
-            Performs semantic search for a user query
+            One Chroma query per target collection for all the query vectors; returns one ranking per vector.
+            With `embeddings`, every result also carries its stored "embedding" (for MMR).
         """
-        
-        # Embedding the query
-        try:
-            self.logger.debug(f"Searching for '{query}'")
-            query_embeddings = self._generate_embeddings([query])
+        if self.compact_store is not None:
+            return self._compact_search_many(query_vectors, n_results, filters, embeddings)
+        collections, filters = self._target_collections(filters)
+        where = build_where(filters)
+        include = ["documents", "metadatas", "distances"] + (["embeddings"] if embeddings else [])
 
-            query_vector = query_embeddings[0]
+        formatted_results: List[List[Dict[str, Any]]] = [[] for _ in query_vectors]
+        for collection in collections:
+            with metrics.stage("vector_query"):
+                results = collection.query(
+                    query_embeddings=query_vectors,
+                    n_results=n_results,
+                    where=where,
+                    include=include
+                )
 
-            # Querying ChromaDB
-            results = self.collection.query(
-                query_embeddings=[query_vector],
-                n_results=top_k
-            )
-            
-            # Formatting results
-            formatted_results = []
-            if results['documents']:
-                for i in range(len(results['documents'][0])):
-                    formatted_results.append({
-                        "content": results['documents'][0][i],
-                        "metadata": results['metadatas'][0][i],
-                        "distance": results['distances'][0][i] if results['distances'] else None
+            for q, documents in enumerate(results['documents'] or []):
+                for i in range(len(documents)):
+                    formatted_results[q].append({
+                        "id": results['ids'][q][i],
+                        "content": documents[i],
+                        "metadata": results['metadatas'][q][i],
+                        "distance": results['distances'][q][i] if results['distances'] else None
                     })
-            
-            return formatted_results
+                    if embeddings:
+                        formatted_results[q][-1]["embedding"] = results['embeddings'][q][i]
+
+        if len(collections) > 1:
+            # Fan-out over partitions: merging the per-partition rankings by distance
+            for ranking in formatted_results:
+                ranking.sort(key=lambda r: r['distance'])
+                del ranking[n_results:]
+        return formatted_results
+
+    def _compact_search_many(self, query_vectors: List[List[float]], n_results: int,
+                             filters: Optional[Dict[str, Any]] = None, embeddings: bool = False) -> List[List[Dict[str, Any]]]:
+        """
+            Dense search in the compact store: a filtered search first resolves the matching chunk IDs
+            with Chroma, then the results' documents and metadata are loaded with one fetch.
+        """
+        collections, filters = self._target_collections(filters)
+        allowed = None
+        if filters or len(collections) < len(self._all_collections()):
+            where = build_where(filters)
+            allowed = []
+            for collection in collections:
+                with metrics.stage("filter_ids"):
+                    allowed.extend(collection.get(where=where, include=[])['ids'])
+
+        with metrics.stage("vector_query"):
+            rankings = self.compact_store.search(np.asarray(query_vectors, dtype=np.float32), n_results, allowed)
+        found = self._fetch(list({chunk_id for ranking in rankings for chunk_id, _ in ranking}), embeddings=embeddings)
+        return [
+            [{**found[chunk_id], "distance": distance} for chunk_id, distance in ranking if chunk_id in found]
+            for ranking in rankings
+        ]
+
+    def _fetch(self, ids: List[str], filters: Optional[Dict[str, Any]] = None,
+               embeddings: bool = False) -> Dict[str, Dict[str, Any]]:
+        """Loads documents and metadata of chunks found only by the lexical index, dropping those outside `filters`."""
+        if not ids:
+            return {}
+        collections, filters = self._target_collections(filters)
+        where = build_where(filters)
+        # Chroma only holds placeholders in compact mode: the vectors come from the compact store
+        chroma_embeddings = embeddings and self.compact_store is None
+        include = ["documents", "metadatas"] + (["embeddings"] if chroma_embeddings else [])
+
+        found = {}
+        for collection in collections:
+            with metrics.stage("fetch"):
+                results = collection.get(ids=ids, where=where, include=include)
+            for i, (chunk_id, document, metadata) in enumerate(zip(results['ids'], results['documents'], results['metadatas'])):
+                found[chunk_id] = {"id": chunk_id, "content": document, "metadata": metadata, "distance": None}
+                if chroma_embeddings:
+                    found[chunk_id]["embedding"] = results['embeddings'][i]
+        if embeddings and not chroma_embeddings and found:
+            for result, vector in zip(found.values(), self.compact_store.get(list(found))):
+                result["embedding"] = vector
+        return found
+
+    def _diversify(self, candidates: List[Dict[str, Any]], top_k: int, lambda_mult: float,
+                   query_vector: Optional[List[float]] = None) -> List[Dict[str, Any]]:
+        """
+            MMR selection of top_k among over-fetched candidates. Relevance is the candidate's "score"
+            (hybrid/lexical, scaled to its maximum) or its cosine similarity to the query (dense).
+            Candidates without a stored embedding (lexical hits) are loaded with one fetch.
+        """
+        if len(candidates) <= 1:
+            return [{k: v for k, v in c.items() if k != "embedding"} for c in candidates]
+
+        missing = [c['id'] for c in candidates if c.get("embedding") is None]
+        fetched = self._fetch(missing, embeddings=True) if missing else {}
+        candidates = [c if c.get("embedding") is not None else {**c, "embedding": fetched[c['id']]["embedding"]}
+                      for c in candidates if c.get("embedding") is not None or c['id'] in fetched]
+
+        with metrics.stage("mmr"):
+            embeddings = np.asarray([c["embedding"] for c in candidates], dtype=np.float32)
+            if candidates[0].get("score") is not None:
+                relevance = np.asarray([c["score"] for c in candidates], dtype=np.float32)
+                relevance /= max(float(relevance.max()), 1e-12)
+            else:
+                query = np.asarray(query_vector, dtype=np.float32)
+                relevance = embeddings @ query / np.clip(np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query), 1e-12, None)
+            selected = mmr_select(relevance, embeddings, top_k, lambda_mult)
+        return [{k: v for k, v in candidates[i].items() if k != "embedding"} for i in selected]
+
+    def _rank(self, dense: List[Dict[str, Any]], lexical: List[Tuple[str, float]], top_k: int,
+              filters: Optional[Dict[str, Any]] = None) -> Tuple[List[str], Dict[str, float]]:
+        """
+            Weighted Reciprocal Rank Fusion: score = sum(weight / (rrf_k + rank)) over both rankings.
+            Returns the candidate IDs, best first, and their scores.
+        """
+        scores: Dict[str, float] = {}
+        for rank, result in enumerate(dense):
+            scores[result['id']] = scores.get(result['id'], 0.0) + 1.0 / (self.rrf_k + rank + 1)
+        for rank, (chunk_id, _) in enumerate(lexical):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + self.lexical_weight / (self.rrf_k + rank + 1)
+
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        # With filters, lexical hits outside them are dropped by the fetch, so every candidate is fetched
+        return (ranked if filters else ranked[:top_k]), scores
+
+    def _fuse(self, dense: List[Dict[str, Any]], lexical: List[Tuple[str, float]], top_k: int,
+              filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        best, scores = self._rank(dense, lexical, top_k, filters)
+        by_id = {r['id']: r for r in dense}
+        by_id.update(self._fetch([chunk_id for chunk_id in best if chunk_id not in by_id], filters))
+        return [{**by_id[chunk_id], "score": scores[chunk_id]} for chunk_id in best if chunk_id in by_id][:top_k]
+
+    def _mmr_lambda(self, mmr_lambda: Optional[float]) -> Optional[float]:
+        """The MMR trade-off of a search (the MMR_LAMBDA default when not given), None when MMR is off."""
+        lambda_mult = self.mmr_lambda if mmr_lambda is None else mmr_lambda
+        if lambda_mult is not None and not 0.0 <= lambda_mult <= 1.0:
+            raise ValueError(f"mmr_lambda must be between 0 and 1, got {lambda_mult}")
+        # lambda 1 is plain relevance order: no need to over-fetch
+        return lambda_mult if lambda_mult is not None and lambda_mult < 1.0 else None
+
+    def search(self, query: str, top_k: int = 3, query_vector: Optional[List[float]] = None,
+               mode: Optional[str] = None, filters: Optional[Dict[str, Any]] = None,
+               mmr_lambda: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+            Searches the collection for a user query.
+            Modes: "dense" (embeddings only), "lexical" (BM25 only) or "hybrid" (both, fused with RRF).
+            `query_vector` skips the embedding step when the caller already embedded the query.
+            `filters` ({field: value or [values]}, see FILTER_FIELDS) are pushed down into the Chroma query.
+            `mmr_lambda` (0-1, MMR_LAMBDA by default) diversifies the results with Maximal Marginal Relevance:
+            MMR_CANDIDATES results are fetched and top_k of them picked, from pure diversity (0) to pure relevance (1).
+        """
+        mode = mode or self.retrieval_mode
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}', expected one of {RETRIEVAL_MODES}")
+        build_where(filters)  # Validating filters before the catch-all below
+        lambda_mult = self._mmr_lambda(mmr_lambda)
+        self.refresh()
+
+        try:
+            self.logger.debug(f"Searching for '{query}' ({mode})")
+            if lambda_mult is None:
+                return self._search(query, top_k, query_vector, mode, filters)
+
+            if query_vector is None and mode != "lexical":
+                query_vector = self.embed_query(query)
+            candidates = self._search(query, max(top_k, self.mmr_candidates), query_vector, mode, filters, embeddings=True)
+            return self._diversify(candidates, top_k, lambda_mult, query_vector)
         except Exception as e:
             self.logger.error(f"Search error: {e}")
             return []
 
+    def _search(self, query: str, top_k: int, query_vector: Optional[List[float]], mode: str,
+                filters: Optional[Dict[str, Any]], embeddings: bool = False) -> List[Dict[str, Any]]:
+        # The BM25 index has no metadata: lexical hits are filtered on fetch, so it over-fetches
+        lexical_factor = 10 if filters else 1
+
+        if mode == "lexical":
+            with metrics.stage("lexical_query"):
+                lexical = self.lexical_index.search(query, top_k * lexical_factor)
+            by_id = self._fetch([chunk_id for chunk_id, _ in lexical], filters, embeddings)
+            return [{**by_id[chunk_id], "score": score} for chunk_id, score in lexical if chunk_id in by_id][:top_k]
+
+        # Embedding the query
+        if query_vector is None:
+            query_vector = self.embed_query(query)
+
+        if mode == "dense":
+            return self._dense_search(query_vector, top_k, filters, embeddings)
+
+        # Hybrid: both engines over-fetch, then fusion picks the final top_k
+        candidates = max(top_k * 4, 20)
+        dense = self._dense_search(query_vector, candidates, filters, embeddings)
+        with metrics.stage("lexical_query"):
+            lexical = self.lexical_index.search(query, candidates * lexical_factor)
+        if not lexical:
+            return dense[:top_k]
+        with metrics.stage("fuse"):
+            return self._fuse(dense, lexical, top_k, filters)
+
+    def search_many(self, queries: List[str], top_k: int = 3, query_vectors: Optional[List[List[float]]] = None,
+                    mode: Optional[str] = None, filters: Optional[Dict[str, Any]] = None,
+                    mmr_lambda: Optional[float] = None) -> List[List[Dict[str, Any]]]:
+        """
+            Batch version of search(), returning one result list per query: the queries are embedded
+            in one encoder batch and sent to Chroma as a single multi-query request, and the lexical-only
+            hits of every query are loaded with one fetch.
+        """
+        mode = mode or self.retrieval_mode
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}', expected one of {RETRIEVAL_MODES}")
+        build_where(filters)
+        lambda_mult = self._mmr_lambda(mmr_lambda)
+        if not queries:
+            return []
+        self.refresh()
+
+        try:
+            self.logger.debug(f"Searching for {len(queries)} queries ({mode})")
+            if mode != "lexical" and query_vectors is None:
+                query_vectors = self.embed_queries(queries)
+            if lambda_mult is None:
+                return self._search_many(queries, top_k, query_vectors, mode, filters)
+
+            candidates = self._search_many(queries, max(top_k, self.mmr_candidates), query_vectors, mode, filters, embeddings=True)
+            return [
+                self._diversify(results, top_k, lambda_mult, query_vectors[i] if query_vectors is not None else None)
+                for i, results in enumerate(candidates)
+            ]
+        except Exception as e:
+            self.logger.error(f"Search error: {e}")
+            return [[] for _ in queries]
+
+    def _search_many(self, queries: List[str], top_k: int, query_vectors: Optional[List[List[float]]], mode: str,
+                     filters: Optional[Dict[str, Any]], embeddings: bool = False) -> List[List[Dict[str, Any]]]:
+        lexical_factor = 10 if filters else 1
+
+        if mode == "lexical":
+            with metrics.stage("lexical_query"):
+                lexical = [self.lexical_index.search(query, top_k * lexical_factor) for query in queries]
+            by_id = self._fetch(list({chunk_id for hits in lexical for chunk_id, _ in hits}), filters, embeddings)
+            return [
+                [{**by_id[chunk_id], "score": score} for chunk_id, score in hits if chunk_id in by_id][:top_k]
+                for hits in lexical
+            ]
+
+        if mode == "dense":
+            return self._dense_search_many(query_vectors, top_k, filters, embeddings)
+
+        candidates = max(top_k * 4, 20)
+        dense = self._dense_search_many(query_vectors, candidates, filters, embeddings)
+        with metrics.stage("lexical_query"):
+            lexical = [self.lexical_index.search(query, candidates * lexical_factor) for query in queries]
+        with metrics.stage("fuse"):
+            ranks = [self._rank(d, l, top_k, filters) for d, l in zip(dense, lexical)]
+            missing = set()
+            for d, (best, _) in zip(dense, ranks):
+                missing.update(set(best).difference(r['id'] for r in d))
+            fetched = self._fetch(list(missing), filters, embeddings)
+
+            results = []
+            for d, l, (best, scores) in zip(dense, lexical, ranks):
+                if not l:
+                    results.append(d[:top_k])
+                    continue
+                by_id = {**fetched, **{r['id']: r for r in d}}
+                results.append([{**by_id[chunk_id], "score": scores[chunk_id]} for chunk_id in best if chunk_id in by_id][:top_k])
+            return results
+
 if __name__ == "__main__":
     # Smoke Test logic to verify imports and client initialization
     try:
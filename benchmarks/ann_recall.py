@@ -0,0 +1,112 @@
+import sys
+import os
+import json
+import time
+import argparse
+import numpy as np
+
+# AMBIENT SETUP
+# Adding backend root directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+os.environ.setdefault("EMBEDDING_CACHE_MB", "0")
+
+from src.services.vector_store import VectorDB
+from synthetic_manuals import synthetic_chunks
+from run_benchmarks import percentiles, drop_collection
+from compact_store import PrecomputedEncoder, embeddings
+
+def build(name: str, vectors: np.ndarray, vector_store: str, index_config: dict, batch_size: int = 5000) -> tuple:
+    """Ingests the vectors into a fresh collection with the given store and index settings; returns it and the build time."""
+    vdb = VectorDB(collection_name=name, max_batch_size=1, encoder=PrecomputedEncoder(vectors.shape[1]),
+                   vector_store=vector_store, index_config=index_config)
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), batch_size):
+        texts = synthetic_chunks(min(batch_size, len(vectors) - offset), seed=offset)
+        chunks = [{"id": f"bench_{offset + i}", "text": text, "source": "bench.pdf", "page": 1} for i, text in enumerate(texts)]
+        vdb.add_chunks(chunks, embeddings=vectors[offset : offset + len(chunks)])
+    vdb.flush()
+    return vdb, time.perf_counter() - start
+
+def run_queries(vdb: VectorDB, queries: np.ndarray, top_k: int) -> tuple:
+    """Answers every query once (after a warm-up); returns the result ids and the latencies."""
+    vdb.warm_up()
+    found, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results = vdb.search("", top_k, query_vector=query, mode="dense")
+        latencies.append(time.perf_counter() - start)
+        found.append({r['id'] for r in results})
+    return found, latencies
+
+def measure(vdb: VectorDB, queries: np.ndarray, truth: list, top_k: int) -> dict:
+    found, latencies = run_queries(vdb, queries, top_k)
+    recall = np.mean([len(f & t) / top_k for f, t in zip(found, truth)])
+    return {**percentiles(latencies, "search"), f"recall_at_{top_k}": float(recall)}
+
+def report(label: str, outcome: dict, top_k: int):
+    print(f"{label:<34} p50 {outcome['search.p50_ms']:>7.2f}ms | p99 {outcome['search.p99_ms']:>7.2f}ms | "
+          f"recall@{top_k} {outcome[f'recall_at_{top_k}']:.3f}")
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="ANN recall vs latency: HNSW M/ef_construction/ef_search sweep against exact search")
+    parser.add_argument("--size", type=int, default=50_000, help="Vectors in the collection")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=500, help="Topics the synthetic vectors are drawn around")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--space", default="l2", choices=["l2", "cosine", "ip"])
+    parser.add_argument("--m", type=int, nargs="+", default=[16, 32], help="HNSW graph degrees to build")
+    parser.add_argument("--ef-construction", type=int, nargs="+", default=[100, 200], help="HNSW build beam widths")
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[10, 20, 50, 100, 200], help="HNSW search beam widths to sweep")
+    parser.add_argument("--compact", action="store_true", help="Also measure the int8 compact store")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    print("--- ANN RECALL BENCHMARK ---")
+    print(f"{args.size} vectors of dim {args.dim}, {args.queries} queries, space {args.space}, recall@{args.top_k} vs exact search")
+    vectors = embeddings(args.size, args.dim, args.clusters)
+    rng = np.random.default_rng(7)
+    queries = vectors[rng.integers(0, args.size, args.queries)] + 0.5 * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    results = {}
+    collections = []
+    try:
+        # Ground truth: the exact (float32 brute force) store with the same space
+        exact, seconds = build("bench_ann_exact", vectors, "exact", {"space": args.space})
+        collections.append(exact)
+        truth, latencies = run_queries(exact, queries, args.top_k)
+        outcome = {**percentiles(latencies, "search"), f"recall_at_{args.top_k}": 1.0, "build_seconds": seconds}
+        results.update({f"ann_recall.exact.{key}": value for key, value in outcome.items()})
+        report(f"exact (build {seconds:.1f}s)", outcome, args.top_k)
+
+        if args.compact:
+            compact, seconds = build("bench_ann_compact", vectors, "compact", {"space": args.space})
+            collections.append(compact)
+            outcome = {**measure(compact, queries, truth, args.top_k), "build_seconds": seconds}
+            results.update({f"ann_recall.compact_int8.{key}": value for key, value in outcome.items()})
+            report(f"compact-int8 (build {seconds:.1f}s)", outcome, args.top_k)
+
+        for m in args.m:
+            for ef_construction in args.ef_construction:
+                config = {"space": args.space, "M": m, "ef_construction": ef_construction}
+                hnsw, seconds = build(f"bench_ann_m{m}_efc{ef_construction}", vectors, "chroma", config)
+                collections.append(hnsw)
+                print(f"chroma M={m} ef_construction={ef_construction}: built in {seconds:.1f}s")
+                results[f"ann_recall.m{m}_efc{ef_construction}.build_seconds"] = seconds
+                for ef_search in args.ef_search:
+                    hnsw.set_ef_search(ef_search)
+                    outcome = measure(hnsw, queries, truth, args.top_k)
+                    results.update({f"ann_recall.m{m}_efc{ef_construction}_ef{ef_search}.{key}": value for key, value in outcome.items()})
+                    report(f"  ef_search={ef_search}", outcome, args.top_k)
+    finally:
+        for vdb in collections:
+            drop_collection(vdb)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,96 @@
+import sys
+import os
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+
+# AMBIENT SETUP
+# Adding backend root directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+os.environ.setdefault("EMBEDDING_CACHE_MB", "0")
+os.environ.setdefault("CACHE_ENABLED", "0")
+os.environ.setdefault("LLM_RETRY_DELAY_SECONDS", "0.05")
+
+import pandas as pd
+from src.services.ingestion import PDFProcessor
+from src.services.vector_store import VectorDB
+from src.services.chat_service import ChatService
+from synthetic_manuals import generate_manuals
+from fake_llm import FakeGeminiModel
+from run_benchmarks import QUERIES, drop_collection
+
+BENCH_COLLECTION = "bench_batch_chat"
+
+def tickets(count: int) -> list:
+    """`count` distinct ticket-like queries."""
+    return [f"{QUERIES[i % len(QUERIES)]} (ticket {i})" for i in range(count)]
+
+async def one_by_one(service: ChatService, queries: list, concurrency: int) -> dict:
+    """Baseline: one aask() per query (one embedding and one Chroma query each), `concurrency` at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
+    failed = 0
+
+    async def ask(query):
+        nonlocal failed
+        async with semaphore:
+            result = await service.aask(query, 3)
+        failed += result["answer"] == "Sorry, there was an error processing your response with the AI"
+
+    start = time.perf_counter()
+    await asyncio.gather(*(ask(query) for query in queries))
+    return {"seconds": time.perf_counter() - start, "failed": failed}
+
+async def batched(service: ChatService, queries: list, concurrency: int) -> dict:
+    start = time.perf_counter()
+    first = None
+    failed = 0
+    async for result in service.aask_many(queries, 3, concurrency):
+        first = first or time.perf_counter() - start
+        failed += result["status"] == "error"
+    return {"seconds": time.perf_counter() - start, "failed": failed, "first_result_s": first}
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Batch answering (ask_many) vs one request per query")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=4, help="LLM calls in flight")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Fake Gemini latency in seconds")
+    parser.add_argument("--rate-limit", type=float, default=0.05, help="Fraction of Gemini calls failing with 429")
+    parser.add_argument("--files", type=int, default=5, help="Synthetic manuals to ingest")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per synthetic manual")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    print("--- BATCH CHAT BENCHMARK ---")
+    workdir = tempfile.mkdtemp(prefix="support_brain_batch_")
+    vdb = VectorDB(collection_name=BENCH_COLLECTION, max_batch_size=1)
+    try:
+        processor = PDFProcessor()
+        df = pd.concat([processor.process(path) for path in generate_manuals(workdir, args.files, args.pages)], ignore_index=True)
+        vdb.add_documents(df)
+        queries = tickets(args.queries)
+
+        results = {}
+        for name, run in (("one_by_one", one_by_one), ("batch", batched)):
+            model = FakeGeminiModel(latency=args.llm_latency, jitter=0.0, rate_limit=args.rate_limit)
+            service = ChatService(vector_db=vdb, model=model, reranker=None)
+            outcome = asyncio.run(run(service, queries, args.concurrency))
+            service.retrieval_pool.shutdown()
+            outcome["queries_per_sec"] = len(queries) / outcome["seconds"]
+            outcome["rate_limited_calls"] = model.rate_limited
+            results.update({f"batch_chat.{name}.{key}": value for key, value in outcome.items()})
+            print(f"{name:<12} {outcome['seconds']:>7.2f}s | {outcome['queries_per_sec']:>7.1f} queries/s | "
+                  f"{outcome['failed']} failed | {model.rate_limited} rate-limited calls")
+    finally:
+        drop_collection(vdb)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main_cli()
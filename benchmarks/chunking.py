@@ -0,0 +1,107 @@
+import sys
+import os
+import re
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+# AMBIENT SETUP
+# Adding backend root directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+os.environ.setdefault("EMBEDDING_CACHE_MB", "0")
+
+from src.services.encoders import create_encoder
+from src.services.ingestion import PDFProcessor
+from src.services.vector_store import VectorDB
+from synthetic_manuals import generate_manuals
+from run_benchmarks import drop_collection
+
+# "Erro 123: <symptom> no <component>. Solução: <action>" entries of the synthetic manuals
+ENTRY_PATTERN = re.compile(r"Erro (\d{3}): (.+?) no (.+?)\. Solução: (.+?\.)")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+def questions(pages: list) -> list:
+    """
+        One question per error-code entry of the manuals, with the text a chunk must contain to answer it:
+        the code and its whole solution (an entry cut by a chunk or page boundary doesn't count).
+    """
+    text = WHITESPACE_PATTERN.sub(" ", " ".join(page['content'] for page in pages))
+    return [
+        {"query": f"Como resolver {symptom} no {component}?", "answer": [f"Erro {code}", solution]}
+        for code, symptom, component, solution in ENTRY_PATTERN.findall(text)
+    ]
+
+def chunk_speed(processor: PDFProcessor, documents: list, repeats: int) -> dict:
+    pages = sum(len(document) for document in documents)
+    characters = sum(len(page['content']) for document in documents for page in document)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        chunks = [chunk for document in documents for page in processor.chunk_pages(document) for chunk in page]
+    elapsed = (time.perf_counter() - start) / repeats
+    return {
+        "pages_per_sec": pages / elapsed,
+        "mb_per_sec": characters / elapsed / 1e6,
+        "chunks": len(chunks),
+        "mean_chunk_chars": sum(len(c['text']) for c in chunks) / len(chunks),
+        "page_spanning_chunks": sum(c.get('page_end', c['page']) != c['page'] for c in chunks)
+    }, chunks
+
+def hit_rate(vdb: VectorDB, cases: list, top_k: int, mode: str) -> float:
+    """Share of questions with a complete answer in one of the top_k chunks."""
+    hits = 0
+    for case in cases:
+        texts = [WHITESPACE_PATTERN.sub(" ", r['content']) for r in vdb.search(case["query"], top_k, mode=mode)]
+        hits += any(all(part in text for part in case["answer"]) for text in texts)
+    return hits / len(cases)
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Structured vs sliding-window chunking: speed and retrieval hit rate")
+    parser.add_argument("--files", type=int, default=10, help="Synthetic manuals to generate")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per synthetic manual")
+    parser.add_argument("--paragraphs", type=int, default=9, help="Entries per page (more entries, more page breaks inside them)")
+    parser.add_argument("--repeats", type=int, default=5, help="Chunking passes for the speed measurement")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--modes", nargs="+", default=["dense", "hybrid"])
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    print("--- CHUNKING BENCHMARK ---")
+    workdir = tempfile.mkdtemp(prefix="support_brain_chunking_")
+    encoder = create_encoder()
+    results = {}
+    try:
+        paths = generate_manuals(workdir, args.files, args.pages, paragraphs=args.paragraphs)
+        reader = PDFProcessor()
+        documents = [reader._read_pages(Path(path)) for path in paths]
+        cases = questions([page for document in documents for page in document])
+        print(f"{sum(map(len, documents))} pages, {len(cases)} error-code questions")
+
+        for strategy in ("window", "structured"):
+            processor = PDFProcessor(strategy=strategy)
+            speed, chunks = chunk_speed(processor, documents, args.repeats)
+            vdb = VectorDB(collection_name=f"bench_chunking_{strategy}", max_batch_size=1, encoder=encoder)
+            try:
+                for start in range(0, len(chunks), 256):
+                    vdb.add_chunks(chunks[start : start + 256])
+                for mode in args.modes:
+                    speed[f"hit_rate_{mode}"] = hit_rate(vdb, cases, args.top_k, mode)
+            finally:
+                drop_collection(vdb)
+
+            results.update({f"chunking.{strategy}.{key}": value for key, value in speed.items()})
+            hits = " | ".join(f"hit@{args.top_k} {mode} {speed[f'hit_rate_{mode}']:.3f}" for mode in args.modes)
+            print(f"{strategy:<11} {speed['pages_per_sec']:>9.0f} pages/s | {speed['chunks']:>6} chunks "
+                  f"({speed['mean_chunk_chars']:.0f} chars, {speed['page_spanning_chunks']} span pages) | {hits}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main_cli()
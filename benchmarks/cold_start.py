@@ -0,0 +1,63 @@
+import sys
+import os
+import json
+import time
+import signal
+import argparse
+import statistics
+import subprocess
+import httpx
+
+# The server is started from the backend directory (its .env provides GEMINI_API_KEY)
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend'))
+
+def cold_start(port: int, timeout: float = 300) -> dict:
+    """Starts a fresh uvicorn process and times how long until it accepts connections and until /ready is 200."""
+    url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    accepting = None
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+            try:
+                r = httpx.get(f"{url}/ready", timeout=1)
+                if accepting is None:
+                    accepting = time.perf_counter() - start
+                components = r.json()["components"]
+                if r.status_code == 200:
+                    return {"accepting_s": accepting, "ready_s": time.perf_counter() - start,
+                            **{f"{name}_s": state["seconds"] for name, state in components.items()}}
+                if any(state["status"] == "failed" for state in components.values()):
+                    raise RuntimeError(f"Startup failed: {components}")
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.05)
+        raise TimeoutError("The server did not become ready")
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=60)
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Cold start: time to accept connections and to /ready, per component")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    print("--- COLD START BENCHMARK ---")
+    runs = [cold_start(args.port) for _ in range(args.runs)]
+    results = {f"cold_start.{key}": statistics.median(run[key] for run in runs) for key in runs[0]}
+    for key, value in results.items():
+        print(f"{key:<36}{value:>8.2f}s (median of {args.runs})")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,158 @@
+import sys
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+# AMBIENT SETUP
+# Adding backend root directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+os.environ.setdefault("EMBEDDING_CACHE_MB", "0")
+
+from src.services.encoders import Encoder
+from src.services.vector_store import VectorDB, DATA_DIR
+from synthetic_manuals import synthetic_chunks
+from run_benchmarks import percentiles, drop_collection
+
+# Store name -> (VECTOR_STORE, COMPACT_DTYPE)
+STORES = {"chroma": ("chroma", None), "compact-int8": ("compact", "int8"), "compact-float16": ("compact", "float16")}
+
+class PrecomputedEncoder(Encoder):
+    """The benchmark passes precomputed vectors to ingestion and search: there is no model to load."""
+
+    def __init__(self, dim: int):
+        self.name = "precomputed"
+        self.dim = dim
+
+def embeddings(size: int, dim: int, clusters: int, seed: int = 42) -> np.ndarray:
+    """Unit vectors around `clusters` topics, closer to sentence embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, size)] + 0.7 * rng.standard_normal((size, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def exact_neighbors(vectors: np.ndarray, queries: np.ndarray, k: int, block: int = 65536) -> np.ndarray:
+    """Brute-force float32 top-k by squared L2 distance: the ground truth for recall."""
+    best_d = np.full((len(queries), 0), np.inf, dtype=np.float32)
+    best_i = np.empty((len(queries), 0), dtype=np.int64)
+    for start in range(0, len(vectors), block):
+        chunk = vectors[start : start + block]
+        d = (chunk ** 2).sum(axis=1)[None, :] - 2 * queries @ chunk.T
+        d = np.concatenate([best_d, d], axis=1)
+        i = np.concatenate([best_i, np.broadcast_to(np.arange(start, start + len(chunk)), (len(queries), len(chunk)))], axis=1)
+        keep = np.argsort(d, axis=1)[:, :k]
+        best_d, best_i = np.take_along_axis(d, keep, axis=1), np.take_along_axis(i, keep, axis=1)
+    return best_i
+
+def directory_bytes(path: str) -> int:
+    """Disk space actually allocated (the compact store grows its files sparsely)."""
+    return sum(os.stat(os.path.join(root, name)).st_blocks * 512 for root, _, names in os.walk(path) for name in names)
+
+def vector_store_env(store: str) -> dict:
+    vector_store, dtype = STORES[store]
+    return {"VECTOR_STORE": vector_store, **({"COMPACT_DTYPE": dtype} if dtype else {})}
+
+def fill(store: str, vectors: np.ndarray, batch_size: int = 5000) -> dict:
+    """Ingests the vectors into a fresh collection; returns the ingestion rate and the disk growth."""
+    os.environ.update(vector_store_env(store))
+    chroma_before = directory_bytes(os.path.join(DATA_DIR, "chroma_db"))
+    vdb = VectorDB(collection_name=f"bench_compact_{store.replace('-', '_')}", max_batch_size=1,
+                   encoder=PrecomputedEncoder(vectors.shape[1]))
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), batch_size):
+        texts = synthetic_chunks(min(batch_size, len(vectors) - offset), seed=offset)
+        chunks = [{"id": f"bench_{offset + i}", "text": text, "source": "bench.pdf", "page": 1} for i, text in enumerate(texts)]
+        vdb.add_chunks(chunks, embeddings=vectors[offset : offset + len(chunks)])
+    vdb.flush()
+    elapsed = time.perf_counter() - start
+    disk = directory_bytes(os.path.join(DATA_DIR, "chroma_db")) - chroma_before
+    if vdb.compact_store is not None:
+        disk += directory_bytes(vdb.compact_store.path)
+    vdb.close()
+    return {"ingest_chunks_per_sec": len(vectors) / elapsed, "disk_mb": disk / 1e6}
+
+def rss_mb() -> float:
+    with open("/proc/self/statm", "r") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+def probe(store: str, workdir: str, top_k: int) -> dict:
+    """
+        Run in a fresh process per store, so the resident memory it adds is not hidden by pages loaded
+        earlier: opens the collection, answers every query and reports latency, recall and RSS growth.
+    """
+    queries = np.load(os.path.join(workdir, "queries.npy"))
+    truth = np.load(os.path.join(workdir, "truth.npy"))
+    vdb = VectorDB(collection_name=f"bench_compact_{store.replace('-', '_')}", max_batch_size=1,
+                   encoder=PrecomputedEncoder(queries.shape[1]))
+    rss_before = rss_mb()
+    vdb.warm_up()
+
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        results = vdb.search("", top_k, query_vector=query, mode="dense")
+        latencies.append(time.perf_counter() - start)
+        found = {int(r['id'].rsplit("_", 1)[1]) for r in results}
+        recalls.append(len(found.intersection(expected.tolist())) / top_k)
+    return {
+        **percentiles(latencies, "search"),
+        f"recall_at_{top_k}": float(np.mean(recalls)),
+        "rss_growth_mb": rss_mb() - rss_before
+    }
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Compact (int8/float16) vector store vs Chroma float32: memory, latency, recall")
+    parser.add_argument("--size", type=int, default=200_000, help="Vectors in the collection")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=500, help="Topics the synthetic vectors are drawn around")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--stores", nargs="+", default=list(STORES), choices=list(STORES))
+    parser.add_argument("--probe", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.probe:
+        print(json.dumps(probe(args.probe, args.workdir, args.top_k)))
+        return
+
+    print("--- COMPACT VECTOR STORE BENCHMARK ---")
+    print(f"{args.size} vectors of dim {args.dim}, {args.queries} queries, recall@{args.top_k} vs exact float32 search")
+    workdir = tempfile.mkdtemp(prefix="support_brain_compact_")
+    vectors = embeddings(args.size, args.dim, args.clusters)
+    rng = np.random.default_rng(7)
+    queries = vectors[rng.integers(0, args.size, args.queries)] + 0.5 * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    np.save(os.path.join(workdir, "queries.npy"), queries)
+    np.save(os.path.join(workdir, "truth.npy"), exact_neighbors(vectors, queries, args.top_k))
+
+    results = {}
+    try:
+        for store in args.stores:
+            outcome = fill(store, vectors)
+            command = [sys.executable, os.path.abspath(__file__), "--probe", store, "--workdir", workdir, "--top-k", str(args.top_k)]
+            child = subprocess.run(command, env={**os.environ, **vector_store_env(store)}, capture_output=True, text=True, check=True)
+            outcome.update(json.loads(child.stdout.strip().splitlines()[-1]))
+            results.update({f"compact_store.{store}.{key}": value for key, value in outcome.items()})
+            print(f"{store:<16} disk {outcome['disk_mb']:>8.1f}MB | RSS +{outcome['rss_growth_mb']:>7.1f}MB | "
+                  f"p50 {outcome['search.p50_ms']:>6.2f}ms | p99 {outcome['search.p99_ms']:>6.2f}ms | "
+                  f"recall@{args.top_k} {outcome[f'recall_at_{args.top_k}']:.3f} | {outcome['ingest_chunks_per_sec']:>7.0f} chunks/s ingest")
+    finally:
+        for store in args.stores:
+            os.environ.update(vector_store_env(store))
+            drop_collection(VectorDB(collection_name=f"bench_compact_{store.replace('-', '_')}", max_batch_size=1,
+                                     encoder=PrecomputedEncoder(args.dim)))
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main_cli()
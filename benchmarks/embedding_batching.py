@@ -0,0 +1,60 @@
+import sys
+import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# AMBIENT SETUP
+# Adding backend root directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from sentence_transformers import SentenceTransformer
+from src.services.embedding_batcher import EmbeddingBatcher
+
+QUERIES = [
+    "Erro 101: o sistema não liga",
+    "Error 202 overheating",
+    "How often should I clean the dust filters?",
+    "Qual a temperatura máxima de operação?",
+    "Firmware update procedure",
+    "Porta A power cable voltage",
+]
+
+def run(encode_one, clients: int, total: int) -> float:
+    """Returns queries/sec with `clients` threads issuing single-query encodes."""
+    def worker(i):
+        encode_one(QUERIES[i % len(QUERIES)] + f" #{i}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(worker, range(total)))
+    return total / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Query embedding throughput with and without micro-batching")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    print("--- QUERY EMBEDDING MICRO-BATCHING BENCHMARK ---")
+    model = SentenceTransformer('all-MiniLM-L6-v2', device='cpu')
+    encode_batch = lambda texts: model.encode(texts).tolist()
+
+    # Warm-up
+    encode_batch(QUERIES)
+
+    qps = run(lambda text: encode_batch([text])[0], args.clients, args.queries)
+    print(f"Unbatched: {qps:.0f} queries/sec")
+
+    batcher = EmbeddingBatcher(encode_batch, args.window_ms, args.max_batch_size)
+    qps = run(batcher.encode, args.clients, args.queries)
+    stats = batcher.stats()
+    batcher.close()
+    print(f"Batched (window={args.window_ms}ms, max={args.max_batch_size}): {qps:.0f} queries/sec")
+    print(f"Mean batch size: {stats['mean_batch_size']:.1f}")
+    print(f"Batch size histogram: {stats['batch_size_histogram']}")
+
+if __name__ == "__main__":
+    main()
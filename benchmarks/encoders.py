@@ -0,0 +1,106 @@
+import sys
+import os
+import json
+import time
+import argparse
+import numpy as np
+
+# AMBIENT SETUP
+# Adding backend root directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from src.services.encoders import BACKENDS, create_encoder
+from src.services.ingestion import PDFProcessor
+
+QUERIES = [
+    "O que eu faço se houver erro de temperatura?",
+    "Erro 101: o sistema não liga",
+    "Error 202 overheating",
+    "How often should the dust filters be cleaned?",
+    "Qual a voltagem correta da porta A?",
+    "Como atualizar o firmware?",
+    "Maximum operating temperature",
+    "Especificações do processador",
+]
+
+def load_corpus(directory: str, limit: int):
+    """Chunks of the PDFs in `directory`, or synthetic manual-like text if there are none."""
+    texts = []
+    if directory and os.path.isdir(directory):
+        processor = PDFProcessor()
+        for name in sorted(os.listdir(directory)):
+            if name.lower().endswith(".pdf"):
+                texts.extend(processor.process(os.path.join(directory, name))["text"].tolist())
+            if len(texts) >= limit:
+                break
+    if not texts:
+        topics = ["superaquecimento", "fonte de alimentação", "filtro de poeira", "firmware", "porta traseira", "ventilador"]
+        texts = [
+            f"Erro {100 + i}: problema de {topics[i % len(topics)]}. Solução: verifique o componente {i % 17} "
+            f"e reinicie o dispositivo X-{1000 + i % 5}. Consulte a seção {i % 9} do manual."
+            for i in range(limit)
+        ]
+    return texts[:limit]
+
+def top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ corpus.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+def bench_backend(backend: str, corpus, queries, k: int, repeats: int):
+    encoder = create_encoder(backend)
+    encoder.encode(queries[:2])  # warm-up
+
+    start = time.perf_counter()
+    corpus_vectors = encoder.encode(corpus)
+    throughput = len(corpus) / (time.perf_counter() - start)
+
+    latencies = []
+    for _ in range(repeats):
+        for query in queries:
+            start = time.perf_counter()
+            encoder.encode([query])
+            latencies.append(time.perf_counter() - start)
+    query_vectors = encoder.encode(queries)
+
+    return {
+        "backend": backend,
+        "encoder": encoder.name,
+        "docs_per_sec": throughput,
+        "query_p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "query_p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "neighbors": top_k(corpus_vectors, query_vectors, k)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding backend benchmark: throughput, latency and recall@k")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--corpus-dir", default="backend/data/manuals", help="Directory of PDFs used as corpus")
+    parser.add_argument("--corpus-size", type=int, default=2000)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    print("--- EMBEDDING BACKEND BENCHMARK ---")
+    corpus = load_corpus(args.corpus_dir, args.corpus_size)
+    print(f"Corpus: {len(corpus)} chunks | Queries: {len(QUERIES)} | k={args.k}")
+
+    results = [bench_backend(b, corpus, QUERIES, args.k, args.repeats) for b in args.backends]
+
+    # Recall@k of every backend against the first one (torch by default) as reference
+    reference = results[0]["neighbors"]
+    for r in results:
+        hits = sum(len(set(a) & set(b)) for a, b in zip(reference, r["neighbors"]))
+        r["recall_at_k"] = hits / reference.size
+        del r["neighbors"]
+
+    print(f"\n{'backend':<12}{'docs/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'recall@k':>10}")
+    for r in results:
+        print(f"{r['backend']:<12}{r['docs_per_sec']:>10.0f}{r['query_p50_ms']:>10.2f}{r['query_p99_ms']:>10.2f}{r['recall_at_k']:>10.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"corpus_size": len(corpus), "k": args.k, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
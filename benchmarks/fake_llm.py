@@ -0,0 +1,102 @@
+import time
+import asyncio
+import random
+
+class FakeResponse:
+    """Mimics the bits of a Gemini GenerateContentResponse that ChatService reads."""
+    def __init__(self, text: str):
+        self.text = text
+
+class FakeStream:
+    """Async-iterable of FakeResponse chunks, like the object returned by generate_content_async(stream=True)."""
+    def __init__(self, words, first_token_latency: float, token_interval: float):
+        self.words = words
+        self.first_token_latency = first_token_latency
+        self.token_interval = token_interval
+
+    async def __aiter__(self):
+        await asyncio.sleep(self.first_token_latency)
+        for i, word in enumerate(self.words):
+            if i:
+                await asyncio.sleep(self.token_interval)
+            yield FakeResponse(word + " ")
+
+class FakeRateLimitError(Exception):
+    """Mimics google.api_core.exceptions.ResourceExhausted (HTTP 429)."""
+    code = 429
+
+class FakeGeminiModel:
+    """
+        Local stand-in for genai.GenerativeModel. Sleeps for a configurable latency instead of calling the API,
+        so benchmarks measure our own pipeline and not Google's.
+    """
+
+    def __init__(self, latency: float = 0.5, jitter: float = 0.1, answer: str = "Fake answer based on the manuals.",
+                 rate_limit: float = 0.0):
+        """
+            Args:
+                latency (float): Mean seconds per generate call
+                jitter (float): Uniform +/- seconds added to each call
+                answer (str): Text returned by every call
+                rate_limit (float): Fraction of async calls failing with a 429 error
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.answer = answer
+        self.rate_limit = rate_limit
+        self.calls = 0
+        self.rate_limited = 0
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        time.sleep(self._delay())
+        return FakeResponse(self.answer)
+
+    async def generate_content_async(self, prompt, stream: bool = False, **kwargs):
+        self.calls += 1
+        if self.rate_limit and random.random() < self.rate_limit:
+            self.rate_limited += 1
+            raise FakeRateLimitError("429 Resource has been exhausted (e.g. check quota).")
+        if stream:
+            # Spreading the total latency over the words, with a quicker first token
+            words = self.answer.split()
+            total = self._delay()
+            return FakeStream(words, total * 0.2, total * 0.8 / max(1, len(words) - 1))
+        await asyncio.sleep(self._delay())
+        return FakeResponse(self.answer)
+
+class StubVectorDB:
+    """Stand-in for VectorDB that blocks for a fixed time, like a real encode + Chroma query would."""
+
+    def __init__(self, latency: float = 0.02):
+        self.latency = latency
+        self.version = 0
+
+    def embed_query(self, query: str):
+        # Deterministic pseudo-embedding so the semantic cache tier behaves sensibly
+        rng = random.Random(query)
+        return [rng.uniform(-1, 1) for _ in range(16)]
+
+    def embed_queries(self, queries):
+        return [self.embed_query(query) for query in queries]
+
+    def search_many(self, queries, top_k: int = 3, **kwargs):
+        # One round trip for the whole batch, like the multi-query Chroma request
+        time.sleep(self.latency)
+        return [self.search(query, top_k, wait=False) for query in queries]
+
+    def search(self, query: str, top_k: int = 3, wait: bool = True, **kwargs):
+        if wait:
+            time.sleep(self.latency)
+        return [
+            {
+                "id": f"stub_manual.pdf_pg{i + 1}_0",
+                "content": f"Stub chunk {i} for '{query}'",
+                "metadata": {"source": "stub_manual.pdf", "page": i + 1, "char_count": 20},
+                "distance": 0.1 * i
+            }
+            for i in range(top_k)
+        ]
@@ -0,0 +1,87 @@
+import json
+import time
+import random
+import asyncio
+import argparse
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Behavior of the fake model, changed at runtime through POST /admin/config (e.g. to simulate an outage)
+CONFIG = {
+    "latency": 0.3,         # Mean seconds per completion
+    "jitter": 0.05,         # Uniform +/- seconds
+    "tail_rate": 0.0,       # Fraction of calls that take tail_latency instead (slow replicas, long queues)
+    "tail_latency": 3.0,
+    "error_rate": 0.0,      # Fraction of calls failing with a 503
+    "rate_limit": 0.0,      # Fraction of calls failing with a 429
+    "answer": "Fake answer based on the manuals."
+}
+STATS = {"requests": 0, "errors": 0, "rate_limited": 0, "slow": 0}
+
+app = FastAPI(title="Fake LLM server")
+
+def _delay() -> float:
+    if random.random() < CONFIG["tail_rate"]:
+        STATS["slow"] += 1
+        return CONFIG["tail_latency"]
+    return max(0.0, CONFIG["latency"] + random.uniform(-CONFIG["jitter"], CONFIG["jitter"]))
+
+def _completion(text: str) -> dict:
+    return {"object": "chat.completion", "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}]}
+
+def _delta(text: str) -> str:
+    return "data: " + json.dumps({"object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {"content": text}}]}) + "\n\n"
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    """OpenAI-compatible endpoint (the subset HTTPChatModel uses): {"messages", "stream"}."""
+    body = await request.json()
+    STATS["requests"] += 1
+    draw = random.random()
+    if draw < CONFIG["rate_limit"]:
+        STATS["rate_limited"] += 1
+        return JSONResponse({"error": {"message": "Rate limit reached"}}, status_code=429)
+    if draw < CONFIG["rate_limit"] + CONFIG["error_rate"]:
+        STATS["errors"] += 1
+        await asyncio.sleep(CONFIG["latency"] * 0.1)
+        return JSONResponse({"error": {"message": "Model overloaded"}}, status_code=503)
+
+    total = _delay()
+    if not body.get("stream"):
+        await asyncio.sleep(total)
+        return _completion(CONFIG["answer"])
+
+    async def events():
+        # Spreading the total latency over the words, with a quicker first token
+        words = CONFIG["answer"].split()
+        await asyncio.sleep(total * 0.2)
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(total * 0.8 / max(1, len(words) - 1))
+            yield _delta(word + " ")
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.post("/admin/config")
+async def set_config(request: Request):
+    CONFIG.update(await request.json())
+    return CONFIG
+
+@app.get("/admin/stats")
+async def get_stats():
+    return {**STATS, "time": time.time()}
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible LLM server with configurable latency, tail latency and errors")
+    parser.add_argument("--port", type=int, default=8100)
+    for key, value in CONFIG.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+    CONFIG.update({key: getattr(args, key) for key in CONFIG})
+
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,82 @@
+import sys
+import os
+import json
+import time
+import argparse
+import numpy as np
+
+# AMBIENT SETUP
+# Adding backend root directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+os.environ.setdefault("EMBEDDING_CACHE_MB", "0")
+
+from src.services.encoders import create_encoder
+from src.services.vector_store import VectorDB
+from synthetic_manuals import synthetic_chunks
+from run_benchmarks import QUERIES, percentiles, drop_collection
+
+def fill(vdb: VectorDB, size: int, products: int, batch_size: int = 5000, seed: int = 42):
+    """`size` chunks spread evenly over `products` products, with random unit vectors."""
+    rng = np.random.default_rng(seed)
+    for start in range(0, size, batch_size):
+        count = min(batch_size, size - start)
+        texts = synthetic_chunks(count, seed=start)
+        chunks = [
+            {"id": f"bench_{start + i}", "text": text, "source": f"manual_{(start + i) % products:03d}.pdf",
+             "page": (start + i) // products % 500 + 1, "product": f"P-{(start + i) % products:03d}"}
+            for i, text in enumerate(texts)
+        ]
+        vectors = rng.standard_normal((count, vdb.encoder.dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        vdb.add_chunks(chunks, embeddings=vectors)
+
+def measure(vdb: VectorDB, filters, mode: str, repeats: int, top_k: int) -> list:
+    vdb.search(QUERIES[0], top_k, mode=mode, filters=filters)  # warm-up
+    latencies = []
+    for _ in range(repeats):
+        for query in QUERIES:
+            start = time.perf_counter()
+            vdb.search(query, top_k, mode=mode, filters=filters)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Filtered vs unfiltered search latency, with and without partitioning")
+    parser.add_argument("--size", type=int, default=100_000, help="Chunks in the collection")
+    parser.add_argument("--products", type=int, default=20, help="Distinct product values")
+    parser.add_argument("--modes", nargs="+", default=["dense", "hybrid"])
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    print("--- FILTERED SEARCH BENCHMARK ---")
+    print(f"{args.size} chunks over {args.products} products")
+    encoder = create_encoder()
+    one_product = {"product": "P-000"}
+    results = {}
+
+    for layout, partition_field in (("flat", None), ("partitioned", "product")):
+        vdb = VectorDB(collection_name=f"bench_filter_{layout}", max_batch_size=1, encoder=encoder,
+                       partition_field=partition_field)
+        try:
+            start = time.perf_counter()
+            fill(vdb, args.size, args.products)
+            print(f"\n[{layout}] filled in {time.perf_counter() - start:.1f}s")
+            for mode in args.modes:
+                for label, filters in (("unfiltered", None), ("filtered", one_product)):
+                    prefix = f"{layout}.{mode}.{label}"
+                    stats = percentiles(measure(vdb, filters, mode, args.repeats, 5), prefix)
+                    results.update(stats)
+                    print(f"  {mode:<7}{label:<11} p50 {stats[prefix + '.p50_ms']:.2f}ms | p99 {stats[prefix + '.p99_ms']:.2f}ms")
+        finally:
+            for partition in list(vdb.partitions.values()):
+                vdb.client.delete_collection(partition.name)
+            drop_collection(vdb)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main_cli()
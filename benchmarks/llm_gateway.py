@@ -0,0 +1,121 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+
+# AMBIENT SETUP
+# Adding backend root directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from src.services.llm_gateway import LLMGateway, CircuitBreaker, ExtractiveFallback, HTTPChatModel
+from run_benchmarks import percentiles
+
+# Fake server behavior per scenario (see fake_llm_server.CONFIG)
+SCENARIOS = {
+    "healthy": {"tail_rate": 0.0, "error_rate": 0.0, "rate_limit": 0.0},
+    "slow_tail": {"tail_rate": 0.05, "error_rate": 0.0, "rate_limit": 0.0},
+    "flaky": {"tail_rate": 0.0, "error_rate": 0.15, "rate_limit": 0.05},
+    "outage": {"tail_rate": 0.0, "error_rate": 1.0, "rate_limit": 0.0}
+}
+CONTEXT = [{"content": "Erro 101: o sistema não liga. Solução: verifique o cabo de alimentação e o disjuntor.",
+            "metadata": {"source": "bench.pdf", "page": 1}}]
+
+def build_gateway(name: str, args, model) -> LLMGateway:
+    """"direct" is the single call ChatService used to make (no timeout, retry or fallback), "gateway" the full gateway."""
+    if name == "direct":
+        return LLMGateway(model, max_concurrency=args.concurrency, timeout=60, deadline=60, retries=0,
+                          breaker=CircuitBreaker(failure_ratio=0), fallback=None)
+    # Hedges only go out through free slots: leaving headroom for them
+    return LLMGateway(model, max_concurrency=args.concurrency * 2, timeout=args.timeout, deadline=args.deadline,
+                      retries=args.retries, retry_delay=args.retry_delay, hedge=True, hedge_min_ms=args.hedge_min_ms,
+                      breaker=CircuitBreaker(reset_seconds=2.0), fallback=ExtractiveFallback())
+
+async def run(gateway: LLMGateway, requests: int, concurrency: int) -> dict:
+    """`requests` answers through the gateway, `concurrency` at a time; returns the outcome of each and their latency."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, outcomes = [], {"ok": 0, "fallback": 0, "error": 0}
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = await gateway.agenerate("Como resolver o erro 101?", "Como resolver o erro 101?", CONTEXT)
+                outcomes["fallback" if result["fallback"] else "ok"] += 1
+            except Exception:
+                outcomes["error"] += 1
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return {**percentiles(latencies, "request"), **{f"{key}_rate": value / requests for key, value in outcomes.items()}}
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 30):
+    import httpx
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("The fake LLM server exited")
+        try:
+            httpx.get(f"{url}/admin/stats", timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise TimeoutError("The fake LLM server didn't start")
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="LLM gateway vs direct calls against a local fake LLM server: success rate and latency")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--requests", type=int, default=400, help="Requests per scenario and setup")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.3, help="Mean LLM latency (seconds)")
+    parser.add_argument("--tail-latency", type=float, default=5.0, help="Latency of the slow calls of the slow_tail scenario")
+    parser.add_argument("--timeout", type=float, default=2.0, help="Gateway per-call timeout (seconds)")
+    parser.add_argument("--deadline", type=float, default=4.0, help="Gateway per-request deadline (seconds)")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--retry-delay", type=float, default=0.1)
+    parser.add_argument("--hedge-min-ms", type=float, default=300)
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    import httpx
+
+    url = f"http://127.0.0.1:{args.port}"
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_llm_server.py"),
+               "--port", str(args.port), "--latency", str(args.latency), "--tail-latency", str(args.tail_latency)]
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    print("--- LLM GATEWAY BENCHMARK ---")
+    print(f"{args.requests} requests per run, {args.concurrency} concurrent, LLM latency {args.latency}s, "
+          f"timeout {args.timeout}s, deadline {args.deadline}s")
+
+    results = {}
+    try:
+        wait_ready(url, server)
+        for scenario in args.scenarios:
+            httpx.post(f"{url}/admin/config", json=SCENARIOS[scenario])
+            for name in ("direct", "gateway"):
+                # A new client per run: each run has its own event loop
+                gateway = build_gateway(name, args, HTTPChatModel(f"{url}/v1", max_connections=args.concurrency * 2))
+                calls_before = httpx.get(f"{url}/admin/stats").json()["requests"]
+                outcome = asyncio.run(run(gateway, args.requests, args.concurrency))
+                stats = gateway.stats()
+                outcome["llm_calls_per_request"] = (httpx.get(f"{url}/admin/stats").json()["requests"] - calls_before) / args.requests
+                outcome.update({key: stats[key] for key in ("retries", "hedged", "hedge_wins", "rejected", "circuit_opened")})
+                results.update({f"llm_gateway.{scenario}.{name}.{key}": value for key, value in outcome.items()})
+                print(f"{scenario:<10} {name:<8} ok {outcome['ok_rate']:>6.1%} | fallback {outcome['fallback_rate']:>6.1%} | "
+                      f"error {outcome['error_rate']:>6.1%} | p50 {outcome['request.p50_ms']:>7.0f}ms | "
+                      f"p99 {outcome['request.p99_ms']:>7.0f}ms | {outcome['llm_calls_per_request']:.2f} calls/request")
+                gateway.close()
+    finally:
+        server.terminate()
+        server.wait()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,90 @@
+import sys
+import os
+import time
+import asyncio
+import argparse
+import statistics
+
+# AMBIENT SETUP
+# Adding backend root directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+import httpx
+import main
+from src.services.chat_service import ChatService
+from fake_llm import FakeGeminiModel, StubVectorDB
+
+# Reproduces the previous endpoint behavior (sync ask() on the event loop) for comparison
+@main.app.post("/bench/chat-sync")
+async def chat_sync_endpoint(request: main.ChatRequest):
+    return main.chat_service.ask(request.query, request.top_k)
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def run_load(path: str, clients: int, requests_per_client: int):
+    """Fires N concurrent clients at the app and probes /health in parallel."""
+    transport = httpx.ASGITransport(app=main.app)
+    chat_latencies = []
+    health_latencies = []
+    stop = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        async def chat_client(idx):
+            for j in range(requests_per_client):
+                start = time.perf_counter()
+                r = await client.post(path, json={"query": f"Erro {idx}-{j}", "top_k": 3})
+                r.raise_for_status()
+                chat_latencies.append(time.perf_counter() - start)
+
+        async def health_probe():
+            while not stop.is_set():
+                start = time.perf_counter()
+                await client.get("/health")
+                health_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.05)
+
+        probe = asyncio.create_task(health_probe())
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(chat_client(i) for i in range(clients)))
+        wall = time.perf_counter() - wall_start
+        stop.set()
+        await probe
+
+    return chat_latencies, health_latencies, wall
+
+def report(label, chat_latencies, health_latencies, wall):
+    print(f"\n--- {label} ---")
+    print(f"Requests: {len(chat_latencies)} in {wall:.2f}s ({len(chat_latencies) / wall:.1f} req/s)")
+    print(f"Chat   p50: {percentile(chat_latencies, 50) * 1000:.0f}ms | p99: {percentile(chat_latencies, 99) * 1000:.0f}ms | mean: {statistics.mean(chat_latencies) * 1000:.0f}ms")
+    if health_latencies:
+        print(f"Health p50: {percentile(health_latencies, 50) * 1000:.0f}ms | p99: {percentile(health_latencies, 99) * 1000:.0f}ms")
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Load test for /api/chat against a local stub LLM")
+    parser.add_argument("--clients", type=int, default=20, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=5, help="Requests per client")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Stub LLM latency in seconds")
+    parser.add_argument("--retrieval-latency", type=float, default=0.02, help="Stub retrieval latency in seconds")
+    parser.add_argument("--real-retrieval", action="store_true", help="Use the real VectorDB instead of the stub")
+    parser.add_argument("--compare-sync", action="store_true", help="Also run the old blocking code path")
+    args = parser.parse_args()
+
+    print("--- STARTING /api/chat LOAD TEST ---")
+    vector_db = None if args.real_retrieval else StubVectorDB(latency=args.retrieval_latency)
+    main.chat_service = ChatService(vector_db=vector_db, model=FakeGeminiModel(latency=args.llm_latency))
+
+    try:
+        results = asyncio.run(run_load("/api/chat", args.clients, args.requests))
+        report(f"async pipeline, {args.clients} clients", *results)
+
+        if args.compare_sync:
+            results = asyncio.run(run_load("/bench/chat-sync", args.clients, args.requests))
+            report(f"sync ask() on the event loop, {args.clients} clients", *results)
+    finally:
+        main.chat_service.close()
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,186 @@
+import sys
+import os
+import json
+import time
+import shutil
+import signal
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+# AMBIENT SETUP
+# Adding backend root directory to path
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend'))
+sys.path.append(BACKEND_DIR)
+
+os.environ.setdefault("EMBEDDING_CACHE_MB", "0")
+os.environ.setdefault("CACHE_ENABLED", "0")
+
+BENCH_COLLECTION = "bench_multi_worker"
+
+def create_app():
+    """
+        App factory run by gunicorn ("multi_worker:create_app()"): the regular main.app, with a fake Gemini
+        and the benchmark collection, so the run measures our serving stack and not the API.
+    """
+    import main
+    from src.services import serving
+    from src.services.vector_store import VectorDB
+    from src.services.chat_service import ChatService
+    from fake_llm import FakeGeminiModel
+
+    latency = float(os.getenv("BENCH_LLM_LATENCY", "0.2"))
+
+    def build_chat_service(readiness):
+        vector_db = readiness.run("vector_db", lambda: VectorDB(collection_name=BENCH_COLLECTION, encoder=serving.shared("encoder")))
+        return ChatService(vector_db=vector_db, model=FakeGeminiModel(latency=latency, jitter=0.0))
+
+    # The lifespan builds the service in each worker, after the fork
+    main.build_chat_service = build_chat_service
+    return main.app
+
+def ingest(files: int, pages: int):
+    """Fills the benchmark collection with the synthetic manuals (done once, by this process)."""
+    from src.services.ingestion import PDFProcessor
+    from src.services.vector_store import VectorDB
+    from synthetic_manuals import generate_manuals
+    import pandas as pd
+
+    workdir = tempfile.mkdtemp(prefix="support_brain_workers_")
+    try:
+        processor = PDFProcessor()
+        df = pd.concat([processor.process(path) for path in generate_manuals(workdir, files, pages)], ignore_index=True)
+        vdb = VectorDB(collection_name=BENCH_COLLECTION, max_batch_size=1)
+        vdb.add_documents(df)
+        vdb.close()
+        print(f"Ingested {len(df)} chunks into '{BENCH_COLLECTION}'")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def cleanup():
+    from run_benchmarks import drop_collection
+    from src.services.vector_store import VectorDB
+    drop_collection(VectorDB(collection_name=BENCH_COLLECTION, max_batch_size=1))
+
+def memory(pid: int) -> dict:
+    """Rss/Pss/shared/private kB of one process (/proc/<pid>/smaps_rollup, Linux only)."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                values[parts[0][:-1]] = int(parts[1])
+    return {
+        "rss_mb": values.get("Rss", 0) / 1024,
+        "pss_mb": values.get("Pss", 0) / 1024,
+        "shared_mb": (values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0)) / 1024,
+        "private_mb": (values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)) / 1024
+    }
+
+def children(pid: int) -> list:
+    with open(f"/proc/{pid}/task/{pid}/children", "r") as f:
+        return [int(child) for child in f.read().split()]
+
+async def _load(url: str, clients: int, requests_per_client: int):
+    import httpx
+    from run_benchmarks import QUERIES
+
+    latencies = []
+    async with httpx.AsyncClient(base_url=url, timeout=120) as client:
+        async def chat_client(idx):
+            for j in range(requests_per_client):
+                query = f"{QUERIES[(idx + j) % len(QUERIES)]} ({idx}-{j})"
+                start = time.perf_counter()
+                r = await client.post("/api/chat", json={"query": query, "top_k": 3})
+                r.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(chat_client(i) for i in range(clients)))
+        wall = time.perf_counter() - wall_start
+    return latencies, wall
+
+def wait_ready(url: str, process: subprocess.Popen, workers: int, timeout: float = 300):
+    """Waits until /ready answers and every worker has been forked and started."""
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{url}/ready", timeout=1).status_code == 200 and len(children(process.pid)) >= workers:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError("gunicorn did not become ready")
+
+def run(workers: int, preload: bool, args) -> dict:
+    """Starts gunicorn with `workers` workers, loads it with chat requests and measures every process' memory."""
+    from run_benchmarks import percentiles
+
+    port = args.port
+    url = f"http://127.0.0.1:{port}"
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)), os.getenv("PYTHONPATH")])),
+        "PRELOAD_MODELS": "1" if preload else "0",
+        "BENCH_LLM_LATENCY": str(args.llm_latency)
+    }
+    command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{port}",
+               "--workers", str(workers), "multi_worker:create_app()"]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(url, process, workers)
+        latencies, wall = asyncio.run(_load(url, args.clients, args.requests))
+        # After the load, so memory touched by inference (activations, allocator arenas) is included
+        worker_memory = [memory(pid) for pid in children(process.pid)]
+        master_memory = memory(process.pid)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=60)
+
+    prefix = f"workers.{workers}.{'preload' if preload else 'no_preload'}"
+    results = percentiles(latencies, prefix)
+    results[f"{prefix}.req_per_sec"] = len(latencies) / wall
+    for key in ("rss_mb", "pss_mb", "private_mb"):
+        results[f"{prefix}.worker_{key}"] = sum(m[key] for m in worker_memory) / len(worker_memory)
+    # Actual footprint of the deployment: shared pages are only counted once across the processes
+    results[f"{prefix}.total_pss_mb"] = master_memory["pss_mb"] + sum(m["pss_mb"] for m in worker_memory)
+    print(f"{workers} workers ({'preload' if preload else 'no preload'}): {results[f'{prefix}.req_per_sec']:.1f} req/s, "
+          f"p50 {results[f'{prefix}.p50_ms']:.0f}ms | p99 {results[f'{prefix}.p99_ms']:.0f}ms | "
+          f"per worker RSS {results[f'{prefix}.worker_rss_mb']:.0f}MB, PSS {results[f'{prefix}.worker_pss_mb']:.0f}MB | "
+          f"total PSS {results[f'{prefix}.total_pss_mb']:.0f}MB")
+    return results
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Memory per worker and throughput vs number of gunicorn workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--no-preload", action="store_true", help="Also measure workers that load their own models")
+    parser.add_argument("--files", type=int, default=5, help="Synthetic manuals to ingest")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per synthetic manual")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent HTTP clients")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Fake Gemini latency in seconds")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    print("--- MULTI-WORKER BENCHMARK ---")
+    ingest(args.files, args.pages)
+    results = {}
+    try:
+        for workers in args.workers:
+            for preload in ([True, False] if args.no_preload else [True]):
+                results.update(run(workers, preload, args))
+    finally:
+        cleanup()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main_cli()
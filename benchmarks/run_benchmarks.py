@@ -0,0 +1,269 @@
+import sys
+import os
+import json
+import time
+import shutil
+import asyncio
+import platform
+import argparse
+import tempfile
+import statistics
+import numpy as np
+
+# AMBIENT SETUP
+# Adding backend root directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+# Measuring cold paths: no embedding cache and no answer cache
+os.environ.setdefault("EMBEDDING_CACHE_MB", "0")
+os.environ.setdefault("CACHE_ENABLED", "0")
+
+import httpx
+import pandas as pd
+import main
+from src.services.ingestion import PDFProcessor
+from src.services.vector_store import VectorDB
+from src.services.chat_service import ChatService
+from src.services.reranker import CrossEncoderReranker
+from fake_llm import FakeGeminiModel
+from synthetic_manuals import generate_manuals, synthetic_chunks
+
+SUITES = ("process", "add_documents", "search", "chat")
+
+QUERIES = [
+    "Erro 101: o sistema não liga",
+    "O que fazer em caso de superaquecimento?",
+    "Como limpar o filtro de poeira?",
+    "Qual a temperatura de operação do ventilador?",
+    "Procedimento de manutenção da placa controladora",
+    "LED vermelho piscando na fonte de alimentação",
+    "Erro 457 falha de comunicação",
+    "Consumo da bateria interna",
+]
+
+def percentiles(latencies, prefix: str) -> dict:
+    """p50/p95/p99/mean in milliseconds."""
+    values = np.array(latencies) * 1000
+    return {
+        f"{prefix}.p50_ms": float(np.percentile(values, 50)),
+        f"{prefix}.p95_ms": float(np.percentile(values, 95)),
+        f"{prefix}.p99_ms": float(np.percentile(values, 99)),
+        f"{prefix}.mean_ms": float(values.mean())
+    }
+
+def drop_collection(vdb: VectorDB):
+    """Removes a benchmark collection, its lexical index and its compact vectors."""
+    vdb.close()
+    vdb.client.delete_collection(vdb.collection_name)
+    if vdb.compact_store is not None:
+        vdb.compact_store.drop()
+    if os.path.exists(vdb.lexical_index.path):
+        os.remove(vdb.lexical_index.path)
+
+def bench_process(pdf_paths) -> dict:
+    """PDFProcessor.process throughput over the synthetic manuals."""
+    processor = PDFProcessor()
+    frames = []
+    start = time.perf_counter()
+    for path in pdf_paths:
+        frames.append(processor.process(path))
+    elapsed = time.perf_counter() - start
+    df = pd.concat(frames, ignore_index=True)
+    pages = int(df.groupby("source")["page"].nunique().sum())
+    print(f"process: {pages} pages, {len(df)} chunks in {elapsed:.2f}s")
+    return {
+        "process.pages_per_sec": pages / elapsed,
+        "process.chunks_per_sec": len(df) / elapsed,
+        "_df": df
+    }
+
+def bench_add_documents(df: pd.DataFrame, encoder) -> dict:
+    """VectorDB.add_documents throughput (embedding + upsert + lexical index)."""
+    vdb = VectorDB(collection_name="bench_add_documents", max_batch_size=1, encoder=encoder)
+    try:
+        start = time.perf_counter()
+        vdb.add_documents(df)
+        elapsed = time.perf_counter() - start
+    finally:
+        drop_collection(vdb)
+    print(f"add_documents: {len(df)} chunks in {elapsed:.2f}s")
+    return {"add_documents.chunks_per_sec": len(df) / elapsed}
+
+def fill(vdb: VectorDB, target: int, real_vectors: bool, batch_size: int = 5000):
+    """
+        Grows the collection to `target` chunks. Unless `real_vectors` is set, chunks get random unit vectors:
+        search latency depends on the index size, and encoding a million chunks would dominate the run.
+    """
+    rng = np.random.default_rng(len(vdb.lexical_index))
+    current = vdb.collection.count()
+    while current < target:
+        count = min(batch_size, target - current)
+        texts = synthetic_chunks(count, seed=current)
+        ids = [f"bench_{current + i}" for i in range(count)]
+        metadatas = [{"source": f"manual_{(current + i) // 1000:04d}.pdf", "page": (current + i) % 1000 + 1} for i in range(count)]
+        if real_vectors:
+            vdb.add_chunks([{"id": i, "text": t, **m} for i, t, m in zip(ids, texts, metadatas)])
+        else:
+            vectors = rng.standard_normal((count, vdb.encoder.dim)).astype(np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            vdb.collection.upsert(ids=ids, documents=texts, embeddings=vectors.tolist(), metadatas=metadatas)
+            vdb.lexical_index.add(ids, texts)
+        current += count
+
+def bench_search(sizes, modes, repeats: int, top_k: int, real_vectors: bool, encoder) -> dict:
+    """VectorDB.search latency per retrieval mode as the collection grows."""
+    results = {}
+    vdb = VectorDB(collection_name="bench_search", max_batch_size=1, encoder=encoder)
+    try:
+        for size in sorted(sizes):
+            fill_start = time.perf_counter()
+            fill(vdb, size, real_vectors)
+            print(f"search: collection filled to {size} chunks in {time.perf_counter() - fill_start:.1f}s")
+            for mode in modes:
+                vdb.search(QUERIES[0], top_k, mode=mode)  # warm-up
+                latencies = []
+                for _ in range(repeats):
+                    for query in QUERIES:
+                        start = time.perf_counter()
+                        vdb.search(query, top_k, mode=mode)
+                        latencies.append(time.perf_counter() - start)
+                stats = percentiles(latencies, f"search.{mode}.{size}")
+                print(f"  {mode:<8} p50 {stats[f'search.{mode}.{size}.p50_ms']:.2f}ms | p99 {stats[f'search.{mode}.{size}.p99_ms']:.2f}ms")
+                results.update(stats)
+    finally:
+        drop_collection(vdb)
+    return results
+
+async def _chat_load(clients: int, requests_per_client: int):
+    transport = httpx.ASGITransport(app=main.app)
+    latencies = []
+    stage_totals = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        async def chat_client(idx):
+            for j in range(requests_per_client):
+                query = f"{QUERIES[(idx + j) % len(QUERIES)]} ({idx}-{j})"
+                start = time.perf_counter()
+                r = await client.post("/api/chat", json={"query": query, "top_k": 3, "include_timings": True})
+                r.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+                for stage, seconds in (r.json().get("timings") or {}).items():
+                    stage_totals.setdefault(stage, []).append(seconds)
+
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(chat_client(i) for i in range(clients)))
+        wall = time.perf_counter() - wall_start
+    return latencies, stage_totals, wall
+
+def bench_chat(df: pd.DataFrame, clients: int, requests_per_client: int, llm_latency: float, encoder,
+               rerank: bool = False) -> dict:
+    """End-to-end /api/chat latency over the ingested manuals, with a local fake Gemini."""
+    vdb = VectorDB(collection_name="bench_chat", encoder=encoder)
+    vdb.add_documents(df)
+    reranker = CrossEncoderReranker() if rerank else None
+    main.chat_service = ChatService(vector_db=vdb, model=FakeGeminiModel(latency=llm_latency, jitter=0.0), reranker=reranker)
+    try:
+        latencies, stage_totals, wall = asyncio.run(_chat_load(clients, requests_per_client))
+    finally:
+        main.chat_service.close()
+        main.chat_service = None
+        drop_collection(vdb)
+
+    results = percentiles(latencies, "chat")
+    results["chat.req_per_sec"] = len(latencies) / wall
+    for stage, values in stage_totals.items():
+        results[f"chat.stage.{stage}.mean_ms"] = statistics.mean(values) * 1000
+    print(f"chat: {len(latencies)} requests, {results['chat.req_per_sec']:.1f} req/s, "
+          f"p50 {results['chat.p50_ms']:.0f}ms | p99 {results['chat.p99_ms']:.0f}ms")
+    return results
+
+def higher_is_better(metric: str) -> bool:
+    return metric.endswith("_per_sec")
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """Returns the metrics that got worse than the baseline by more than `tolerance` (relative)."""
+    regressions = []
+    print(f"\n{'metric':<44}{'baseline':>12}{'current':>12}{'change':>9}")
+    for metric in sorted(set(current) & set(baseline)):
+        old, new = baseline[metric], current[metric]
+        if not old:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better(metric) else change
+        flag = "  REGRESSION" if worse > tolerance else ""
+        print(f"{metric:<44}{old:>12.2f}{new:>12.2f}{change:>+8.0%}{flag}")
+        if flag:
+            regressions.append(metric)
+    return regressions
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark suite: ingestion, retrieval and end-to-end chat")
+    parser.add_argument("--suites", nargs="+", default=list(SUITES), choices=SUITES)
+    parser.add_argument("--files", type=int, default=10, help="Synthetic manuals to generate")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per synthetic manual")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="Collection sizes for the search suite (e.g. 1000 10000 100000 1000000)")
+    parser.add_argument("--modes", nargs="+", default=["dense", "hybrid"], help="Retrieval modes for the search suite")
+    parser.add_argument("--real-vectors", action="store_true", help="Embed the search collection with the model")
+    parser.add_argument("--repeats", type=int, default=10, help="Passes over the query set per measurement")
+    parser.add_argument("--clients", type=int, default=10, help="Concurrent clients in the chat suite")
+    parser.add_argument("--requests", type=int, default=10, help="Requests per client in the chat suite")
+    parser.add_argument("--rerank", action="store_true", help="Enable cross-encoder reranking in the chat suite")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Fake Gemini latency in seconds")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    print("--- SUPPORT BRAIN BENCHMARK SUITE ---")
+    workdir = tempfile.mkdtemp(prefix="support_brain_bench_")
+    results = {}
+    try:
+        pdf_paths = generate_manuals(workdir, args.files, args.pages)
+        print(f"Generated {len(pdf_paths)} manuals x {args.pages} pages in {workdir}")
+
+        # Chunks feed the ingestion and chat suites even when the process suite isn't reported
+        processed = bench_process(pdf_paths)
+        df = processed.pop("_df")
+        if "process" in args.suites:
+            results.update(processed)
+
+        encoder = None
+        if set(args.suites) & {"add_documents", "search", "chat"}:
+            from src.services.encoders import create_encoder
+            encoder = create_encoder()
+
+        if "add_documents" in args.suites:
+            results.update(bench_add_documents(df, encoder))
+        if "search" in args.suites:
+            results.update(bench_search(args.sizes, args.modes, args.repeats, 5, args.real_vectors, encoder))
+        if "chat" in args.suites:
+            results.update(bench_chat(df, args.clients, args.requests, args.llm_latency, encoder, args.rerank))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args)
+        },
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
+
+if __name__ == "__main__":
+    main_cli()
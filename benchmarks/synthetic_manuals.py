@@ -0,0 +1,73 @@
+import os
+import random
+import argparse
+from typing import List
+from fpdf import FPDF
+
+PRODUCTS = ["X-1000", "X-2000", "Z-300", "NovaLink 5", "TermoCore T8", "PowerGrid PG-12"]
+COMPONENTS = ["fonte de alimentação", "ventilador", "filtro de poeira", "porta traseira (Porta A)", "sensor térmico",
+              "placa controladora", "módulo de memória", "bateria interna", "cabo de rede", "display frontal"]
+SYMPTOMS = ["não liga", "superaquecimento", "reinicia sozinho", "ruído excessivo", "falha de comunicação",
+            "tela apagada", "LED vermelho piscando", "desempenho reduzido"]
+ACTIONS = ["Verifique a conexão do {c}.", "Substitua o {c} por uma peça original.", "Limpe o {c} com ar comprimido.",
+           "Reinicie o dispositivo e observe o {c}.", "Atualize o firmware antes de testar o {c}.",
+           "Meça a tensão do {c} (110V/220V)."]
+SECTIONS = ["INTRODUÇÃO", "ESPECIFICAÇÕES TÉCNICAS", "INSTALAÇÃO", "RESOLUÇÃO DE PROBLEMAS", "MANUTENÇÃO PREVENTIVA"]
+
+def _page_text(rng: random.Random, product: str, page: int, paragraphs: int, version: str = "1.0") -> str:
+    """One manual page: a section title followed by error codes, procedures and specifications."""
+    lines = [f"MANUAL TÉCNICO - PRODUTO {product} - VERSÃO {version} - PÁGINA {page}", f"{page}. {rng.choice(SECTIONS)}"]
+    for _ in range(paragraphs):
+        component = rng.choice(COMPONENTS)
+        kind = rng.random()
+        if kind < 0.5:
+            code = rng.randint(100, 999)
+            action = rng.choice(ACTIONS).format(c=component)
+            lines.append(f"Erro {code}: {rng.choice(SYMPTOMS)} no {component}. Solução: {action} "
+                         f"Se o problema persistir, contate o suporte informando o código {code}.")
+        elif kind < 0.8:
+            lines.append(f"O {component} do {product} opera entre {rng.randint(0, 10)}C e {rng.randint(60, 90)}C, "
+                         f"com consumo de {rng.randint(5, 250)}W. Intervalo de manutenção: {rng.randint(1, 12)} meses.")
+        else:
+            steps = " ".join(f"Passo {i + 1}: {rng.choice(ACTIONS).format(c=rng.choice(COMPONENTS))}" for i in range(3))
+            lines.append(f"Procedimento de manutenção do {component}. {steps}")
+    return "\n".join(lines)
+
+def generate_manuals(output_dir: str, files: int = 10, pages: int = 20, paragraphs: int = 6, seed: int = 42) -> List[str]:
+    """
+        Writes `files` synthetic technical manuals of `pages` pages each into `output_dir`.
+        Content is deterministic for a given seed, so benchmark runs are comparable.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for i in range(files):
+        product = f"{rng.choice(PRODUCTS)}-{i}"
+        version = f"{rng.randint(1, 4)}.{rng.randint(0, 9)}"
+        pdf = FPDF()
+        pdf.set_font("Arial", size=10)
+        for page in range(1, pages + 1):
+            pdf.add_page()
+            text = _page_text(rng, product, page, paragraphs, version)
+            # fpdf 1.x only handles latin-1
+            pdf.multi_cell(0, 5, text.encode('latin-1', 'replace').decode('latin-1'))
+        path = os.path.join(output_dir, f"manual_{i:04d}.pdf")
+        pdf.output(path)
+        paths.append(path)
+    return paths
+
+def synthetic_chunks(count: int, seed: int = 42) -> List[str]:
+    """Chunk-sized manual texts without going through PDFs (used to fill large collections)."""
+    rng = random.Random(seed)
+    return [_page_text(rng, rng.choice(PRODUCTS), i % 500 + 1, 2) for i in range(count)]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates synthetic technical manuals (PDF)")
+    parser.add_argument("output_dir")
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    paths = generate_manuals(args.output_dir, args.files, args.pages, seed=args.seed)
+    print(f"{len(paths)} manuals with {args.pages} pages written to {args.output_dir}")
@@ -0,0 +1,145 @@
+import sys
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+
+# AMBIENT SETUP
+# Adding backend root directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+os.environ.setdefault("EMBEDDING_CACHE_MB", "0")
+os.environ.setdefault("CACHE_ENABLED", "0")
+os.environ.setdefault("CONVERSATION_ENABLED", "0")
+
+from src.services.encoders import create_encoder
+from src.services.vector_store import VectorDB
+from src.services.chat_service import ChatService
+from src.services.tenants import TenantRegistry, TenantBusy, tenant_collection
+from synthetic_manuals import synthetic_chunks
+from run_benchmarks import QUERIES, percentiles, drop_collection
+from compact_store import rss_mb
+from fake_llm import FakeGeminiModel
+
+BENCH_COLLECTION = "bench_tenants"
+
+def tenant_name(i: int) -> str:
+    return f"bench-{i}"
+
+def create_tenants(base: VectorDB, count: int, chunks: int):
+    """`count` tenants of `chunks` synthetic chunks each (every tenant gets different manuals)."""
+    registry = TenantRegistry(base, max_open=1)
+    for i in range(count):
+        with registry.use(tenant_name(i), create=True) as index:
+            texts = synthetic_chunks(chunks, seed=i)
+            index.vector_db.add_chunks([{"id": f"t{i}_{j}", "text": text, "source": f"tenant{i}.pdf", "page": 1}
+                                        for j, text in enumerate(texts)])
+            index.vector_db.flush()
+    registry.close()
+
+def bench_lru(base: VectorDB, tenants: int, max_open: int, queries: int, unload_after=None, seed: int = 7) -> dict:
+    """Searches random tenants (a few hot ones get most of the traffic) through an LRU of `max_open` open tenants."""
+    registry = TenantRegistry(base, max_open=max_open, unload_after=unload_after)
+    rng = random.Random(seed)
+    hot = max(1, tenants // 10)
+    cold_latencies, warm_latencies = [], []
+    rss_before = rss_mb()
+    for i in range(queries):
+        # 80% of the queries go to the hottest 10% of the tenants
+        tenant = rng.randrange(hot) if rng.random() < 0.8 else rng.randrange(tenants)
+        opened = registry.opened
+        start = time.perf_counter()
+        with registry.use(tenant_name(tenant)) as index:
+            index.vector_db.search(QUERIES[i % len(QUERIES)], 3)
+        (cold_latencies if registry.opened > opened else warm_latencies).append(time.perf_counter() - start)
+    outcome = {
+        **percentiles(warm_latencies or [0.0], "warm_query"),
+        **percentiles(cold_latencies or [0.0], "cold_query"),
+        "cold_rate": len(cold_latencies) / queries,
+        "open": registry.stats()["open"],
+        "unloads": registry.unloads,
+        "rss_growth_mb": rss_mb() - rss_before
+    }
+    registry.close()
+    return outcome
+
+async def noisy_neighbour(service: ChatService, flood: int, queries: int) -> dict:
+    """
+        Tenant "bench-0" floods the service with `flood` clients (backing off briefly when refused), while
+        tenant "bench-1" asks `queries` questions one at a time; returns the latency of the latter.
+    """
+    stop = asyncio.Event()
+    counts = {"noisy_answered": 0, "noisy_refused": 0}
+
+    async def noisy_client(idx: int):
+        while not stop.is_set():
+            try:
+                await service.aask(f"{QUERIES[idx % len(QUERIES)]} ({idx})", 3, tenant=tenant_name(0))
+                counts["noisy_answered"] += 1
+            except TenantBusy:
+                counts["noisy_refused"] += 1
+                await asyncio.sleep(0.05)
+
+    clients = [asyncio.create_task(noisy_client(i)) for i in range(flood)]
+    await asyncio.sleep(0.5)
+    latencies = []
+    for i in range(queries):
+        start = time.perf_counter()
+        await service.aask(QUERIES[i % len(QUERIES)], 3, tenant=tenant_name(1))
+        latencies.append(time.perf_counter() - start)
+    stop.set()
+    await asyncio.gather(*clients)
+    return {**percentiles(latencies, "quiet_tenant"), **counts}
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Multi-tenant collections: LRU of open tenants and per-tenant query quotas")
+    parser.add_argument("--tenants", type=int, default=200, help="Tenants to create")
+    parser.add_argument("--chunks", type=int, default=200, help="Chunks per tenant")
+    parser.add_argument("--max-open", type=int, nargs="+", default=[8, 32, 256], help="LRU capacities to compare")
+    parser.add_argument("--queries", type=int, default=1000, help="Searches of the LRU run")
+    parser.add_argument("--unload-after", type=int, help="TENANT_UNLOAD_AFTER of the LRU run (default: max_open, 0 = never)")
+    parser.add_argument("--flood", type=int, default=64, help="Concurrent clients of the noisy tenant")
+    parser.add_argument("--quiet-queries", type=int, default=50, help="Questions of the quiet tenant")
+    parser.add_argument("--quota", type=int, default=4, help="TENANT_MAX_QUERIES of the quota run")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Fake Gemini latency in seconds")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    print("--- MULTI-TENANT BENCHMARK ---")
+    encoder = create_encoder()
+    base = VectorDB(collection_name=BENCH_COLLECTION, max_batch_size=1, encoder=encoder)
+    results = {}
+    try:
+        start = time.perf_counter()
+        create_tenants(base, args.tenants, args.chunks)
+        print(f"{args.tenants} tenants of {args.chunks} chunks created in {time.perf_counter() - start:.1f}s")
+
+        for max_open in args.max_open:
+            outcome = bench_lru(base, args.tenants, max_open, args.queries, args.unload_after)
+            results.update({f"tenants.lru_{max_open}.{key}": value for key, value in outcome.items()})
+            print(f"max_open {max_open:<4} warm p50 {outcome['warm_query.p50_ms']:>6.1f}ms | cold p50 {outcome['cold_query.p50_ms']:>6.1f}ms | "
+                  f"cold {outcome['cold_rate']:>5.1%} | open {outcome['open']:>3} | unloads {outcome['unloads']:>3} | "
+                  f"RSS +{outcome['rss_growth_mb']:.0f}MB")
+
+        for name, quota in (("no_quota", 0), ("quota", args.quota)):
+            os.environ["TENANT_MAX_QUERIES"] = str(quota)
+            vdb = VectorDB(collection_name=BENCH_COLLECTION, max_batch_size=1, encoder=encoder)
+            service = ChatService(vector_db=vdb, model=FakeGeminiModel(latency=args.llm_latency, jitter=0.0), reranker=None)
+            outcome = asyncio.run(noisy_neighbour(service, args.flood, args.quiet_queries))
+            service.close()
+            results.update({f"tenants.{name}.{key}": value for key, value in outcome.items()})
+            print(f"{name:<9} quiet tenant p50 {outcome['quiet_tenant.p50_ms']:>7.0f}ms | p99 {outcome['quiet_tenant.p99_ms']:>7.0f}ms | "
+                  f"noisy answered {outcome['noisy_answered']} refused {outcome['noisy_refused']}")
+    finally:
+        for i in range(args.tenants):
+            drop_collection(base.sibling(tenant_collection(tenant_name(i))))
+        drop_collection(base)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main_cli()
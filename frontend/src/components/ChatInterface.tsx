@@ -1,7 +1,6 @@
 "use client";
 
 import { useState, useRef, useEffect } from "react";
-import axios from "axios";
 import ReactMarkdown from "react-markdown";
 import { Send, Bot, User, Loader2, AlertCircle } from "lucide-react";
 
@@ -17,6 +16,28 @@ type Message = {
   sources?: Source[];
 };
 
+type StreamEvent = {
+  event: string;
+  data: unknown;
+};
+
+// Parses one "event: ...\ndata: ..." block from the /api/chat/stream response
+function parseSSE(rawEvent: string): StreamEvent | null {
+  let event = "message";
+  const dataLines: string[] = [];
+
+  for (const line of rawEvent.split("\n")) {
+    if (line.startsWith("event:")) {
+      event = line.slice(6).trim();
+    } else if (line.startsWith("data:")) {
+      dataLines.push(line.slice(5).trim());
+    }
+  }
+
+  if (dataLines.length === 0) return null;
+  return { event, data: JSON.parse(dataLines.join("\n")) };
+}
+
 export default function ChatInterface() {
   const [messages, setMessages] = useState<Message[]>([
     {
@@ -43,26 +64,63 @@ export default function ChatInterface() {
 
     setMessages((prev) => [...prev, { role: "user", content: userText }]);
 
+    // Placeholder assistant message, filled in as the stream arrives
+    setMessages((prev) => [...prev, { role: "assistant", content: "" }]);
+
+    const updateLast = (update: (msg: Message) => Message) => {
+      setMessages((prev) => {
+        const next = [...prev];
+        next[next.length - 1] = update(next[next.length - 1]);
+        return next;
+      });
+    };
+
     try {
-      const response = await axios.post("http://localhost:8000/api/chat", {
-        query: userText,
-        top_k: 3,
+      const response = await fetch("http://localhost:8000/api/chat/stream", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ query: userText, top_k: 3 }),
       });
 
-      setMessages((prev) => [
-        ...prev,
-        {
-          role: "assistant",
-          content: response.data.answer,
-          sources: response.data.sources,
-        },
-      ]);
+      if (!response.ok || !response.body) {
+        throw new Error(`HTTP ${response.status}`);
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // SSE messages are separated by a blank line
+        let boundary = buffer.indexOf("\n\n");
+        while (boundary !== -1) {
+          const rawEvent = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+          boundary = buffer.indexOf("\n\n");
+
+          const event = parseSSE(rawEvent);
+          if (!event) continue;
+
+          if (event.event === "sources") {
+            updateLast((msg) => ({ ...msg, sources: event.data as Source[] }));
+          } else if (event.event === "token") {
+            const { text } = event.data as { text: string };
+            updateLast((msg) => ({ ...msg, content: msg.content + text }));
+          } else if (event.event === "error") {
+            throw new Error((event.data as { detail: string }).detail);
+          }
+        }
+      }
     } catch (error) {
       console.error("API Error:", error);
-      setMessages((prev) => [
-        ...prev,
-        { role: "assistant", content: "Error while connecting with the server. Is the backend running?"},
-      ]);
+      updateLast((msg) => ({
+        ...msg,
+        content: msg.content || "Error while connecting with the server. Is the backend running?",
+      }));
     } finally {
       setLoading(false);
     }
@@ -94,7 +152,7 @@ export default function ChatInterface() {
       </div>
     
       <div ref={scrollRef} className="flex-1 overflow-y-auto p-6 space-y-6 scroll-smooth">
-        {messages.map((msg, idx) => (
+        {messages.filter((msg) => msg.content || msg.sources).map((msg, idx) => (
           <div key={idx} className={`flex gap-4 ${msg.role == "user" ? "justify-end" : "justify-start"}`}>
             {msg.role === "assistant" && (
               <div className="w-8 h-8 rounded-full bg-slate-800 border border-slate-700 flex items-center justify-center shrink-0">
@@ -140,7 +198,7 @@ export default function ChatInterface() {
           </div>
         ))}
 
-        {loading && (
+        {loading && !messages[messages.length - 1].content && (
           <div className="flex gap-4 animate-pulse">
             <div>
               <Bot size={16} className="text-slate-500" />
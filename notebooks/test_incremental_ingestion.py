@@ -0,0 +1,96 @@
+import sys
+import os
+import tempfile
+from contextlib import contextmanager
+from fpdf import FPDF
+
+# Adding the backend root directory to path to import modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from src.services.ingestion_manifest import IngestionManifest
+from src.services.ingestion_pipeline import IngestionPipeline
+
+class MemoryCollection:
+    """Stands in for the VectorDB (no embeddings): keeps the upserted chunks by ID."""
+
+    def __init__(self):
+        self.chunks = {}
+
+    @contextmanager
+    def writing(self):
+        yield
+
+    def add_chunks(self, chunks):
+        self.chunks.update({chunk["id"]: chunk for chunk in chunks})
+
+    def delete_chunks(self, ids):
+        for chunk_id in ids:
+            self.chunks.pop(chunk_id, None)
+
+    def flush(self):
+        pass
+
+def write_manual(path: str, product: str, pages: int = 2):
+    pdf = FPDF()
+    pdf.set_font("Arial", size=12)
+    for page in range(pages):
+        pdf.add_page()
+        pdf.multi_cell(0, 10, f"PRODUTO {product} - pagina {page + 1}. Erro {100 + page}: verifique o cabo do {product}.")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pdf.output(path)
+
+def run(root: str, collection: MemoryCollection, manifest_path: str) -> dict:
+    pipeline = IngestionPipeline(collection, workers=1, manifest=IngestionManifest(manifest_path))
+    return pipeline.run(root)
+
+def test_same_named_files():
+    """Two "manual.pdf" in different subfolders keep their own chunks and manifest entries, and re-runs settle."""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, "manuals")
+        manifest_path = os.path.join(tmp, "manifest.json")
+        write_manual(os.path.join(root, "x1000", "manual.pdf"), "X-1000")
+        write_manual(os.path.join(root, "y2", "manual.pdf"), "Y-2")
+        collection = MemoryCollection()
+
+        first = run(root, collection, manifest_path)
+        sources = {chunk["source"] for chunk in collection.chunks.values()}
+        assert first["completed_files"] == 2
+        assert sources == {"x1000/manual.pdf", "y2/manual.pdf"}, sources
+        assert set(IngestionManifest(manifest_path).files) == sources
+
+        # Nothing changed: both files are skipped
+        second = run(root, collection, manifest_path)
+        assert second["skipped_files"] == 2 and second["chunks"] == 0, second
+
+        # Only the modified manual is re-ingested, the other one keeps its chunks
+        write_manual(os.path.join(root, "y2", "manual.pdf"), "Y-2 rev B")
+        third = run(root, collection, manifest_path)
+        assert third["skipped_files"] == 1 and third["completed_files"] == 1, third
+        assert {chunk["source"] for chunk in collection.chunks.values()} == sources
+        assert any("rev B" in chunk["text"] for chunk in collection.chunks.values())
+
+def test_writers_keep_each_others_entries():
+    """Two pipelines built from the same manifest file, run one after the other, don't drop each other's entries."""
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest_path = os.path.join(tmp, "manifest.json")
+        write_manual(os.path.join(tmp, "a", "x1000.pdf"), "X-1000")
+        write_manual(os.path.join(tmp, "b", "y2.pdf"), "Y-2")
+        collection = MemoryCollection()
+
+        # Both manifests are loaded before either run, as with two jobs queued at once
+        first = IngestionPipeline(collection, workers=1, manifest=IngestionManifest(manifest_path))
+        second = IngestionPipeline(collection, workers=1, manifest=IngestionManifest(manifest_path))
+        first.run(os.path.join(tmp, "a"))
+        second.run(os.path.join(tmp, "b"))
+        assert set(IngestionManifest(manifest_path).files) == {"x1000.pdf", "y2.pdf"}
+
+        # So the next run of the first directory is still incremental
+        again = run(os.path.join(tmp, "a"), collection, manifest_path)
+        assert again["skipped_files"] == 1 and again["chunks"] == 0, again
+
+if __name__ == "__main__":
+    print("--- INCREMENTAL INGESTION TEST ---")
+    test_same_named_files()
+    print("[SUCCESS] Same-named files in different subfolders are ingested and re-synced independently")
+    test_writers_keep_each_others_entries()
+    print("[SUCCESS] Successive writers keep each other's manifest entries")